@@ -0,0 +1,46 @@
+"""Configuración de gunicorn (Render la usa en ``startCommand``).
+
+Con ``preload_app`` Django se importa y se calienta una sola vez en el proceso
+maestro; los workers nacen por fork y comparten esas páginas de memoria. Antes
+de hacer fork se congelan los objetos existentes (``gc.freeze``) para que el
+recolector de basura no los toque y no fuerce copias en cada worker.
+
+``GUNICORN_PRELOAD=0`` vuelve a cargar la aplicación en cada worker (útil si
+se necesita recargar código sin reiniciar el maestro).
+"""
+import gc
+import os
+
+
+bind = f'0.0.0.0:{os.environ.get("PORT", "8000")}'
+workers = int(os.environ.get('WEB_CONCURRENCY', 3))
+timeout = 60
+loglevel = 'info'
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def when_ready(server):
+    # Corre en el maestro antes de crear los workers; con preload la aplicación ya está importada.
+    if not preload_app:
+        return
+    from taller.arranque import calentar
+
+    tiempos = calentar()
+    server.log.info('Calentamiento: %s', ', '.join(f'{k}={v * 1000:.1f}ms' for k, v in tiempos.items()))
+    gc.collect()
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Corre en cada worker antes de aceptar conexiones: abre sus conexiones a la base de datos.
+    # Una excepción aquí (antes de ``worker.booted``) detiene a todo el servidor, no solo a
+    # este worker; con la base caída el worker arranca igual y /readyz lo reporta no listo.
+    from taller.arranque import calentar, preparar_worker
+
+    if not preload_app:
+        try:
+            calentar()
+        except Exception:
+            worker.log.exception('Calentamiento fallido; el worker atiende sin cachés precargadas')
+    tiempos = preparar_worker()
+    worker.log.info('Worker listo: %s', ', '.join(f'{k}={v * 1000:.1f}ms' for k, v in tiempos.items()))
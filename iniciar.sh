@@ -0,0 +1,29 @@
+#!/usr/bin/env bash
+# Arranque del servicio web en Render (``startCommand`` en render.yaml).
+#
+# Junto a gunicorn corren los procesos de fondo: generar_documentos escribe en el
+# disco de esta instancia, que es de donde gunicorn sirve los documentos, y los
+# consumidores del outbox (documentos, notificaciones) y el envío de
+# notificaciones comparten así la base. La poda diaria (podar --seguir) corre
+# aquí y no como cron de Render: un cron no monta el disco ni ve la base SQLite
+# de esta instancia, así que no podría borrar los archivos que libera. Si cualquiera termina, se detienen todos
+# y Render reinicia el servicio; SIGTERM se reenvía a todos para que gunicorn
+# cierre con gracia.
+set -u
+
+python manage.py generar_documentos --seguir &
+python manage.py consumir_eventos --seguir &
+python manage.py enviar_notificaciones --seguir &
+python manage.py podar --seguir &
+gunicorn wraplab.wsgi:application --config gunicorn.conf.py &
+
+terminar() {
+    trap '' TERM INT
+    kill 0
+    wait
+}
+trap 'terminar; exit 0' TERM INT
+wait -n
+estado=$?
+terminar
+exit "$estado"
@@ -1,18 +1,153 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import DecimalField, ExpressionWrapper, F
+from django.utils.functional import cached_property
 
-from .models import Avance, OrdenServicio
+from .folios import resolver_folio
+from .models import TESTIGO_LABEL, Avance, CatalogoVehiculo, FotoOrden, Notificacion, OrdenServicio, Sucursal
+
+
+class ConteoEstimadoPaginator(Paginator):
+    """Paginador que, sin filtros en PostgreSQL, usa el estimado de ``pg_class``.
+
+    ``COUNT(*)`` recorre toda la tabla; con más de ``UMBRAL`` filas estimadas el
+    número exacto no aporta nada al changelist.
+    """
+
+    UMBRAL = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimado = self._estimado(self.object_list)
+            if estimado is not None and estimado > self.UMBRAL:
+                return estimado
+        return super().count
+
+    @staticmethod
+    def _estimado(qs):
+        connection = connections[qs.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [qs.model._meta.db_table])
+            fila = cursor.fetchone()
+        return fila[0] if fila else None
+
+
+class _ChangelistLigero:
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
+
+
+class _BusquedaPorFolio:
+    """Busca por folio exacto (índice) si el término es un folio emitido; si no, la búsqueda normal del admin.
+
+    ``resolver_folio`` descarta en memoria (filtro de Bloom) las palabras que no
+    son folios, así que "Ferrari" no cuesta una consulta extra. La búsqueda
+    normal es ``icontains`` sobre ``search_fields``: un recorrido completo, pero
+    encuentra un apellido o un modelo en cualquier parte del campo.
+    """
+
+    campo_folio = 'folio'
+
+    def get_search_results(self, request, queryset, search_term):
+        termino = search_term.strip().upper()
+        if termino and resolver_folio(termino) is not None:
+            return queryset.filter(**{self.campo_folio: termino}), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+class AvanceInline(admin.TabularInline):
+    model = Avance
+    extra = 0
+    fields = ('estatus', 'nota', 'creado_en')
+    readonly_fields = ('creado_en',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('orden')
+
+
+class FotoOrdenInline(admin.TabularInline):
+    model = FotoOrden
+    extra = 0
+    fields = ('numero', 'url', 'creado_en')
+    readonly_fields = ('creado_en',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('orden')
 
 
 @admin.register(OrdenServicio)
-class OrdenServicioAdmin(admin.ModelAdmin):
-    list_display = ('folio', 'cliente_nombre', 'vehiculo_marca', 'vehiculo_modelo', 'servicio', 'estatus', 'saldo_pendiente', 'actualizado_en')
+class OrdenServicioAdmin(_ChangelistLigero, _BusquedaPorFolio, admin.ModelAdmin):
+    list_display = ('folio', 'cliente_nombre', 'vehiculo_marca', 'vehiculo_modelo', 'servicio', 'estatus', 'saldo', 'actualizado_en')
     list_filter = ('servicio', 'estatus')
-    search_fields = ('folio', 'cliente_nombre', 'vehiculo_marca', 'vehiculo_modelo')
-    readonly_fields = ('folio', 'creado_en', 'actualizado_en', 'saldo_pendiente')
+    search_fields = ('folio', 'cliente_nombre', 'vehiculo_marca', 'vehiculo_modelo', 'vehiculo_matricula')
+    readonly_fields = ('folio', 'sucursal', 'creado_en', 'actualizado_en', 'saldo_pendiente', 'testigos_activos')
+    # La máscara se edita desde el formulario de la orden (casillas), no como número.
+    exclude = ('testigos_bits',)
+    inlines = (AvanceInline, FotoOrdenInline)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            saldo_anotado=ExpressionWrapper(
+                F('costo_total') - F('monto_pagado'),
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            )
+        )
+
+    @admin.display(description='Saldo pendiente', ordering='saldo_anotado')
+    def saldo(self, obj):
+        return obj.saldo_anotado
+
+    @admin.display(description='Testigos')
+    def testigos_activos(self, obj):
+        return ', '.join(TESTIGO_LABEL[code] for code in obj.testigos) or '-'
 
 
 @admin.register(Avance)
-class AvanceAdmin(admin.ModelAdmin):
+class AvanceAdmin(_ChangelistLigero, _BusquedaPorFolio, admin.ModelAdmin):
     list_display = ('orden', 'estatus', 'creado_en')
     list_filter = ('estatus',)
+    list_select_related = ('orden',)
+    search_fields = ('orden__folio', 'orden__cliente_nombre')
+    campo_folio = 'orden__folio'
+    raw_id_fields = ('orden',)
+
+
+@admin.register(FotoOrden)
+class FotoOrdenAdmin(_ChangelistLigero, _BusquedaPorFolio, admin.ModelAdmin):
+    list_display = ('__str__', 'numero', 'url', 'creado_en')
+    list_select_related = ('orden',)
     search_fields = ('orden__folio', 'orden__cliente_nombre')
+    campo_folio = 'orden__folio'
+    raw_id_fields = ('orden',)
+
+
+@admin.register(Sucursal)
+class SucursalAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'clave', 'base_datos', 'prefijo_folio', 'activa')
+    prepopulated_fields = {'clave': ('nombre',)}
+
+    def get_readonly_fields(self, request, obj=None):
+        # Mover una sucursal de base requiere migrar sus datos, no editar el campo.
+        return ('base_datos', 'prefijo_folio') if obj is not None and obj.pk else ()
+
+
+@admin.register(CatalogoVehiculo)
+class CatalogoVehiculoAdmin(admin.ModelAdmin):
+    list_display = ('marca', 'modelo', 'usos')
+    search_fields = ('marca_clave', 'modelo_clave')
+    ordering = ('marca_clave', '-usos')
+
+
+@admin.register(Notificacion)
+class NotificacionAdmin(_ChangelistLigero, _BusquedaPorFolio, admin.ModelAdmin):
+    list_display = ('orden', 'canal', 'destino', 'estatus', 'estado', 'intentos', 'enviar_despues', 'enviado_en')
+    list_filter = ('estado', 'canal')
+    list_select_related = ('orden',)
+    search_fields = ('orden__folio', 'destino')
+    campo_folio = 'orden__folio'
+    raw_id_fields = ('orden',)
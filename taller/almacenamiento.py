@@ -0,0 +1,236 @@
+"""Destinos de las fotos subidas desde el navegador.
+
+Un destino decide a dónde sube el navegador (``ticket``) y cómo se verifica y
+se publica el contenido al confirmar la subida. ``FOTOS_DESTINO`` elige la
+clase.
+
+``DestinoS3`` (S3 o compatible: R2, MinIO) entrega en el ticket un URL
+prefirmado para un ``PUT`` directo al bucket, así que los bytes no pasan por
+gunicorn. El objeto se guarda ya con su nombre definitivo (por hash) y la firma
+incluye ``x-amz-checksum-sha256``: el proveedor rechaza un contenido que no
+coincide con el hash declarado. Al confirmar, ``verificar`` consulta el objeto
+con un ``HEAD``. El bucket necesita CORS que permita ``PUT`` desde el sitio con
+esas cabeceras, y lectura pública (o un CDN en ``FOTOS_S3_URL_PUBLICA``).
+
+``DestinoLocal`` guarda en disco y recibe las partes en la vista
+``subidas.recibir_parte``; sirve para desarrollo, pruebas y para un servidor
+con disco propio.
+"""
+import base64
+import datetime
+import hashlib
+import hmac
+import os
+import urllib.error
+import urllib.request
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import DEFAULT_DB_ALIAS
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+
+SALT_TICKET = 'taller.subidas'
+
+EXTENSIONES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/heic': '.heic',
+    'image/heif': '.heif',
+}
+
+
+def _ajuste(nombre: str, default):
+    return getattr(settings, nombre, default)
+
+
+def firmar_ticket(subida) -> str:
+    # El receptor no tiene sesión ni sucursal activa: el ticket dice en qué base está la subida.
+    base = subida._state.db or DEFAULT_DB_ALIAS
+    valor = str(subida.pk) if base == DEFAULT_DB_ALIAS else [str(subida.pk), base]
+    return signing.dumps(valor, salt=SALT_TICKET, compress=False)
+
+
+def leer_ticket(token: str) -> tuple:
+    """``(pk, base)`` de la subida del ticket; lanza ``signing.BadSignature`` si es inválido o expiró."""
+    valor = signing.loads(token, salt=SALT_TICKET, max_age=_ajuste('FOTOS_TICKET_TTL', 3600))
+    return (valor, DEFAULT_DB_ALIAS) if isinstance(valor, str) else tuple(valor)
+
+
+def nombre_por_hash(sha256: str, tipo: str) -> str:
+    """Nombre definitivo del contenido: el mismo hash siempre cae en el mismo objeto."""
+    return f'{sha256[:2]}/{sha256}{EXTENSIONES.get(tipo, "")}'
+
+
+class DestinoLocal:
+    directo = False  # el navegador sube a ``recibir_parte``, que lleva la cuenta de ``recibido``
+
+    def __init__(self):
+        self.temporal = Path(_ajuste('FOTOS_SUBIDAS_DIR', settings.BASE_DIR / 'media' / 'subidas'))
+
+    @cached_property
+    def storage(self):
+        return FileSystemStorage(
+            location=_ajuste('FOTOS_DIR', settings.BASE_DIR / 'media' / 'fotos'),
+            base_url=_ajuste('FOTOS_URL', '/media/fotos/'),
+        )
+
+    def _parcial(self, subida) -> Path:
+        return self.temporal / f'{subida.pk}.part'
+
+    def ticket(self, request, subida) -> dict:
+        url = reverse('subida_parte', kwargs={'token': firmar_ticket(subida)})
+        return {
+            'url': request.build_absolute_uri(url),
+            'metodo': 'PUT',
+            'tamano_parte': _ajuste('FOTOS_TAMANO_PARTE', 4 * 1024 * 1024),
+        }
+
+    def escribir(self, subida, inicio: int, flujo) -> int:
+        """Escribe una parte desde ``inicio``; retorna cuántos bytes escribió."""
+        self.temporal.mkdir(parents=True, exist_ok=True)
+        ruta = self._parcial(subida)
+        escritos = 0
+        with open(ruta, 'r+b' if ruta.exists() else 'wb') as archivo:
+            archivo.seek(inicio)
+            for bloque in iter(lambda: flujo.read(64 * 1024), b''):
+                archivo.write(bloque)
+                escritos += len(bloque)
+            # Restos de un intento anterior que se cortó a media parte.
+            archivo.truncate()
+        return escritos
+
+    def verificar(self, subida):
+        """``(sha256, tamano)`` del contenido recibido."""
+        digest = hashlib.sha256()
+        tamano = 0
+        with open(self._parcial(subida), 'rb') as archivo:
+            for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+                digest.update(bloque)
+                tamano += len(bloque)
+        return digest.hexdigest(), tamano
+
+    def publicar(self, subida, sha256: str) -> str:
+        """Mueve el contenido a su nombre definitivo (por hash); retorna la ruta."""
+        nombre = nombre_por_hash(sha256, subida.tipo)
+        if not self.storage.exists(nombre):
+            with open(self._parcial(subida), 'rb') as archivo:
+                nombre = self.storage.save(nombre, File(archivo))
+        self.descartar(subida)
+        return nombre
+
+    def descartar(self, subida) -> None:
+        try:
+            os.remove(self._parcial(subida))
+        except FileNotFoundError:
+            pass
+
+    def eliminar(self, ruta: str) -> None:
+        """Borra contenido publicado que ya no usa ninguna foto (ver ``retencion``)."""
+        self.storage.delete(ruta)
+
+    def url(self, ruta: str) -> str:
+        return self.storage.url(ruta)
+
+
+class DestinoS3:
+    """Bucket S3 (o compatible) con subida directa por URL prefirmado (firma SigV4)."""
+
+    directo = True
+
+    def __init__(self):
+        self.base = _ajuste('FOTOS_S3_URL', '').rstrip('/')
+        self.publica = (_ajuste('FOTOS_S3_URL_PUBLICA', '') or self.base).rstrip('/')
+        self.region = _ajuste('FOTOS_S3_REGION', 'us-east-1')
+        self.clave_acceso = _ajuste('FOTOS_S3_ACCESS_KEY', '')
+        self.clave_secreta = _ajuste('FOTOS_S3_SECRET_KEY', '')
+
+    def prefirmar(self, metodo: str, ruta: str, cabeceras=None, expira: int = 3600, ahora=None) -> str:
+        """URL firmado en la consulta; ``cabeceras`` quedan firmadas y el cliente debe enviarlas iguales."""
+        ahora = ahora or datetime.datetime.now(datetime.timezone.utc)
+        fecha, momento = ahora.strftime('%Y%m%d'), ahora.strftime('%Y%m%dT%H%M%SZ')
+        url = urlsplit(f'{self.base}/{quote(ruta, safe="/~")}')
+        firmadas = {'host': url.netloc, **{k.lower(): str(v).strip() for k, v in (cabeceras or {}).items()}}
+        nombres = ';'.join(sorted(firmadas))
+        alcance = f'{fecha}/{self.region}/s3/aws4_request'
+        consulta = '&'.join(f'{quote(k, safe="-_.~")}={quote(v, safe="-_.~")}' for k, v in sorted({
+            'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+            'X-Amz-Credential': f'{self.clave_acceso}/{alcance}',
+            'X-Amz-Date': momento,
+            'X-Amz-Expires': str(expira),
+            'X-Amz-SignedHeaders': nombres,
+        }.items()))
+        canonica = '\n'.join([
+            metodo, url.path, consulta,
+            ''.join(f'{k}:{firmadas[k]}\n' for k in sorted(firmadas)),
+            nombres, 'UNSIGNED-PAYLOAD',
+        ])
+        por_firmar = '\n'.join([
+            'AWS4-HMAC-SHA256', momento, alcance, hashlib.sha256(canonica.encode()).hexdigest(),
+        ])
+        clave = f'AWS4{self.clave_secreta}'.encode()
+        for parte in (fecha, self.region, 's3', 'aws4_request'):
+            clave = hmac.new(clave, parte.encode(), hashlib.sha256).digest()
+        firma = hmac.new(clave, por_firmar.encode(), hashlib.sha256).hexdigest()
+        return f'{url.scheme}://{url.netloc}{url.path}?{consulta}&X-Amz-Signature={firma}'
+
+    def _pedir(self, metodo: str, ruta: str, cabeceras=None):
+        url = self.prefirmar(metodo, ruta, cabeceras, expira=60)
+        return urllib.request.urlopen(urllib.request.Request(url, method=metodo, headers=cabeceras or {}), timeout=10)
+
+    def ticket(self, request, subida) -> dict:
+        # El hash declarado es obligatorio para este destino (ver ``subidas.crear_subida``).
+        cabeceras = {
+            'Content-Type': subida.tipo,
+            'x-amz-checksum-sha256': base64.b64encode(bytes.fromhex(subida.sha256)).decode(),
+        }
+        expira = _ajuste('FOTOS_TICKET_TTL', 3600)
+        return {
+            'url': self.prefirmar('PUT', nombre_por_hash(subida.sha256, subida.tipo), cabeceras, expira),
+            'metodo': 'PUT',
+            'cabeceras': cabeceras,
+            'directo': True,
+        }
+
+    def verificar(self, subida):
+        """``(sha256, tamano)`` del objeto subido, o ``None`` si todavía no existe."""
+        try:
+            ruta = nombre_por_hash(subida.sha256, subida.tipo)
+            with self._pedir('HEAD', ruta, {'x-amz-checksum-mode': 'ENABLED'}) as respuesta:
+                suma = respuesta.headers.get('x-amz-checksum-sha256')
+                tamano = int(respuesta.headers['Content-Length'])
+        except urllib.error.HTTPError as exc:
+            if exc.code == 404:
+                return None
+            raise
+        # Si el proveedor no devuelve la suma, la validó al recibir el PUT firmado con ella.
+        return (base64.b64decode(suma).hex() if suma else subida.sha256), tamano
+
+    def publicar(self, subida, sha256: str) -> str:
+        return nombre_por_hash(sha256, subida.tipo)
+
+    def descartar(self, subida) -> None:
+        # El objeto tiene nombre por hash y el proveedor verificó su contenido:
+        # puede ser el mismo de un ``ArchivoFoto`` existente, así que no se borra.
+        pass
+
+    def eliminar(self, ruta: str) -> None:
+        try:
+            self._pedir('DELETE', ruta).close()
+        except urllib.error.HTTPError as exc:
+            if exc.code != 404:
+                raise
+
+    def url(self, ruta: str) -> str:
+        return f'{self.publica}/{quote(ruta, safe="/~")}'
+
+
+def destino():
+    return import_string(_ajuste('FOTOS_DESTINO', 'taller.almacenamiento.DestinoLocal'))()
@@ -0,0 +1,223 @@
+"""API JSON de solo lectura (v1) para seguimiento de órdenes.
+
+Las respuestas llevan ``ETag``; un cliente que repite ``If-None-Match`` recibe
+304 sin cuerpo. El seguimiento público se guarda serializado en la caché
+``API_CACHE`` y se invalida desde ``signals.py`` cuando cambia la orden, sus
+avances o sus fotos, así que un sondeo sin cambios no toca la base de datos.
+"""
+import base64
+import datetime
+import decimal
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import DecimalField, ExpressionWrapper, F, Q
+from django.http import Http404, HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+
+from . import sucursales
+from .folios import orden_por_folio, resolver_folio
+from .models import OrdenServicio, testigos_desde_bits
+from .presupuestos import presupuesto
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+
+# Campos seleccionables con ``?fields=``; ``None`` es una columna directa.
+CAMPOS_ORDEN = {
+    'id': None,
+    'folio': None,
+    'cliente_nombre': None,
+    'vehiculo_marca': None,
+    'vehiculo_modelo': None,
+    'vehiculo_matricula': None,
+    'vehiculo_anio': None,
+    'vehiculo_color': None,
+    'servicio': None,
+    'estatus': None,
+    'costo_total': None,
+    'monto_pagado': None,
+    'saldo_pendiente': ExpressionWrapper(
+        F('costo_total') - F('monto_pagado'),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    ),
+    'testigos': F('testigos_bits'),
+    'notas': None,
+    'creado_en': None,
+    'actualizado_en': None,
+}
+CAMPOS_ORDEN_DEFAULT = ('id', 'folio', 'cliente_nombre', 'vehiculo_marca', 'vehiculo_modelo', 'estatus', 'saldo_pendiente', 'actualizado_en')
+LIMITE_MAXIMO = 100
+
+
+def normalizar(valor):
+    if isinstance(valor, decimal.Decimal):
+        return str(valor)
+    if isinstance(valor, datetime.datetime):
+        return valor.isoformat()
+    return valor
+
+
+def serializar(datos) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(datos)
+    return json.dumps(datos, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def _cache():
+    return caches[getattr(settings, 'API_CACHE', 'default')]
+
+
+def clave_seguimiento(orden_pk: int, base: str = DEFAULT_DB_ALIAS) -> str:
+    # Con sucursales en otras bases los pk se repiten entre bases.
+    if base != DEFAULT_DB_ALIAS:
+        return f'api:v1:seguimiento:{base}:{orden_pk}'
+    return f'api:v1:seguimiento:{orden_pk}'
+
+
+def cachear_seguimiento(orden: OrdenServicio, base: str = DEFAULT_DB_ALIAS) -> tuple:
+    """Serializa el seguimiento de ``orden`` y lo deja en la caché; retorna ``(etag, cuerpo)``."""
+    cuerpo = serializar(datos_seguimiento(orden))
+    guardado = (_etag(cuerpo), cuerpo)
+    _cache().set(clave_seguimiento(orden.pk, base), guardado, getattr(settings, 'API_CACHE_TTL', 300))
+    return guardado
+
+
+def _etag(cuerpo: bytes) -> str:
+    return '"%s"' % hashlib.blake2b(cuerpo, digest_size=12).hexdigest()
+
+
+def _responder(request: HttpRequest, cuerpo: bytes, etag: str, status: int = 200) -> HttpResponse:
+    condicional = get_conditional_response(request, etag=etag)
+    if condicional is not None:
+        return condicional
+    response = HttpResponse(cuerpo, status=status, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+def _error(mensaje: str, status: int) -> HttpResponse:
+    return HttpResponse(serializar({'error': mensaje}), status=status, content_type='application/json')
+
+
+def datos_seguimiento(orden: OrdenServicio) -> dict:
+    return {
+        'folio': orden.folio,
+        'estatus': orden.estatus,
+        'estatus_label': orden.get_estatus_display(),
+        'paso': orden.indice_paso,
+        'pasos': len(OrdenServicio.Estatus.values),
+        'servicio': orden.servicio,
+        'vehiculo': {
+            'marca': orden.vehiculo_marca,
+            'modelo': orden.vehiculo_modelo,
+            'anio': orden.vehiculo_anio,
+            'color': orden.vehiculo_color,
+        },
+        'testigos': orden.testigos_info,
+        'saldo_pendiente': normalizar(orden.saldo_pendiente),
+        'actualizado_en': normalizar(orden.actualizado_en),
+        'avances': [
+            {'estatus': a.estatus, 'nota': a.nota, 'creado_en': normalizar(a.creado_en)}
+            for a in orden.avances.all()
+        ],
+        'fotos': [
+            {'numero': f.numero, 'url': f.url, 'miniatura': f.miniatura}
+            for f in orden.fotos.all()
+        ],
+    }
+
+
+@require_GET
+@gzip_page
+@presupuesto(consultas=5, ms=100)
+def seguimiento(request: HttpRequest, folio: str) -> HttpResponse:
+    pk = resolver_folio(folio)
+    if pk is None:
+        return _error('Folio no encontrado', 404)
+    base = sucursales.base_de_folio(folio.strip().upper())
+    guardado = _cache().get(clave_seguimiento(pk, base))
+    if guardado is None:
+        try:
+            orden = orden_por_folio(folio)
+        except Http404:
+            return _error('Folio no encontrado', 404)
+        guardado = cachear_seguimiento(orden, base)
+    etag, cuerpo = guardado
+    response = _responder(request, cuerpo, etag)
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'API_MAX_AGE', 10))
+    return response
+
+
+def _leer_cursor(cursor: str):
+    try:
+        instante, pk = base64.urlsafe_b64decode(cursor.encode() + b'==').decode().split('|')
+        return parse_datetime(instante), int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+def _crear_cursor(instante: datetime.datetime, pk: int) -> str:
+    return base64.urlsafe_b64encode(f'{instante.isoformat()}|{pk}'.encode()).decode().rstrip('=')
+
+
+@require_GET
+@gzip_page
+@presupuesto(consultas=4, ms=150)
+def ordenes(request: HttpRequest) -> HttpResponse:
+    """Órdenes de la sucursal activa para staff, paginadas por cursor (``actualizado_en``, ``id``)."""
+    if not (request.user.is_authenticated and request.user.is_superuser):
+        return _error('No autorizado', 403)
+
+    pedidos = request.GET.get('fields')
+    campos = [c for c in pedidos.split(',') if c] if pedidos else list(CAMPOS_ORDEN_DEFAULT)
+    desconocidos = [c for c in campos if c not in CAMPOS_ORDEN]
+    if desconocidos:
+        return _error(f'Campos desconocidos: {", ".join(desconocidos)}', 400)
+    try:
+        limite = min(max(int(request.GET.get('limit', 50)), 1), LIMITE_MAXIMO)
+    except ValueError:
+        return _error('limit inválido', 400)
+
+    qs = OrdenServicio.objects.filter(sucursal=request.sucursal).order_by('-actualizado_en', '-pk')
+    if request.GET.get('estatus'):
+        qs = qs.filter(estatus=request.GET['estatus'])
+    if request.GET.get('testigos'):
+        qs = qs.con_testigos(request.GET['testigos'].split(','), todos=request.GET.get('testigos_modo') == 'todos')
+    if request.GET.get('cursor'):
+        posicion = _leer_cursor(request.GET['cursor'])
+        if posicion is None or posicion[0] is None:
+            return _error('cursor inválido', 400)
+        instante, pk = posicion
+        qs = qs.filter(Q(actualizado_en__lt=instante) | Q(actualizado_en=instante, pk__lt=pk))
+
+    # _cursor_* se piden siempre para construir el siguiente cursor.
+    columnas = [c for c in campos if CAMPOS_ORDEN[c] is None]
+    expresiones = {c: CAMPOS_ORDEN[c] for c in campos if CAMPOS_ORDEN[c] is not None}
+    filas = list(
+        qs.values(*columnas, _cursor_fecha=F('actualizado_en'), _cursor_pk=F('pk'), **expresiones)[:limite + 1]
+    )
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = _crear_cursor(filas[-1]['_cursor_fecha'], filas[-1]['_cursor_pk'])
+    if 'testigos' in campos:
+        for fila in filas:
+            fila['testigos'] = testigos_desde_bits(fila['testigos'])
+    resultados = [{c: normalizar(fila[c]) for c in campos} for fila in filas]
+
+    cuerpo = serializar({'resultados': resultados, 'siguiente': siguiente})
+    response = _responder(request, cuerpo, _etag(cuerpo))
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TallerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'taller'
+
+    def ready(self):
+        from . import documentos, notificaciones, signals  # noqa: F401  (registra receptores y consumidores del outbox)
@@ -0,0 +1,124 @@
+"""Calentamiento del proceso antes de recibir tráfico.
+
+Con ``preload_app`` (ver ``gunicorn.conf.py``) ``calentar`` corre una sola vez
+en el proceso maestro: los workers heredan por fork el resolvedor de URLs, las
+plantillas compiladas, los índices en memoria y la caché local con el
+seguimiento de las órdenes activas ya cargado.
+
+Las conexiones a la base de datos no se heredan; cada worker abre las suyas en
+``preparar_worker`` antes de atender, y solo entonces ``/readyz`` (ver
+``taller/salud.py``) lo reporta listo.
+"""
+import logging
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.template import engines
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+
+logger = logging.getLogger(__name__)
+
+_listo = threading.Event()
+
+
+def _nombres_de_plantillas() -> list:
+    nombres = []
+    for motor in engines.all():
+        for directorio in motor.template_dirs:
+            raiz = Path(directorio)
+            nombres.extend(str(p.relative_to(raiz)) for p in sorted(raiz.rglob('*')) if p.is_file())
+    return nombres
+
+
+def calentar() -> dict:
+    """Prepara resolvedor de URLs, plantillas e índices en memoria; retorna segundos por paso."""
+    tiempos = {}
+
+    inicio = time.perf_counter()
+    resolvedor = get_resolver()
+    resolvedor.url_patterns  # importa todas las vistas
+    resolvedor.reverse_dict  # construye los índices de reverse()
+    tiempos['urls'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for nombre in _nombres_de_plantillas():
+        try:
+            get_template(nombre)
+        except Exception:
+            logger.warning('No se pudo precompilar la plantilla %s', nombre, exc_info=True)
+    tiempos['plantillas'] = time.perf_counter() - inicio
+
+    # Índices que de otro modo se construirían en la primera solicitud de cada worker.
+    from . import catalogo, folios
+
+    inicio = time.perf_counter()
+    try:
+        catalogo.cargar()
+        folios.cargar_filtro()
+        tiempos['indices'] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        precargar_seguimiento()
+        tiempos['seguimiento'] = time.perf_counter() - inicio
+    except Exception:
+        # Sin base de datos (p. ej. durante el build) se construyen en la primera consulta.
+        logger.warning('No se pudieron precargar los índices en memoria', exc_info=True)
+    finally:
+        # Las conexiones abiertas aquí no deben heredarse a los workers.
+        connections.close_all()
+    return tiempos
+
+
+def precargar_seguimiento() -> int:
+    """Deja en caché folio y respuesta de la API de las órdenes activas; retorna cuántas.
+
+    Son las que los clientes consultan justo después de un despliegue. Se toman
+    las ``ARRANQUE_ORDENES_ACTIVAS`` actualizadas más recientemente de cada base.
+    """
+    from . import api, folios, sucursales
+    from .models import OrdenServicio
+
+    limite = getattr(settings, 'ARRANQUE_ORDENES_ACTIVAS', 200)
+    total = 0
+    for base in sucursales.bases():
+        ordenes = (
+            OrdenServicio.objects.using(base)
+            .exclude(estatus=OrdenServicio.Estatus.TRABAJO_TERMINADO)
+            .order_by('-actualizado_en')
+            .prefetch_related('avances', 'fotos')[:limite]
+        )
+        for orden in ordenes:
+            folios.precargar(orden.folio, orden.pk)
+            api.cachear_seguimiento(orden, base)
+            total += 1
+    return total
+
+
+def preparar_worker() -> dict:
+    """Abre las conexiones de este proceso a cada base; retorna segundos por paso.
+
+    Nunca lanza: corre antes de que gunicorn dé al worker por iniciado, y un
+    error ahí detiene al servidor completo. Si la base principal no responde,
+    el worker arranca sin marcarse listo y ``/readyz`` lo reintenta en cada
+    sonda. Una sucursal caída solo se registra.
+    """
+    inicio = time.perf_counter()
+    fallidas = set()
+    for base in connections:
+        try:
+            connections[base].ensure_connection()
+        except DatabaseError:
+            logger.exception('No se pudo conectar a la base %s', base)
+            fallidas.add(base)
+    if DEFAULT_DB_ALIAS not in fallidas:
+        _listo.set()
+    return {'conexiones': time.perf_counter() - inicio}
+
+
+def listo() -> bool:
+    return _listo.is_set()
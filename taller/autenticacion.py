@@ -0,0 +1,34 @@
+"""Usuario de la sesión servido desde caché.
+
+``AuthenticationMiddleware`` busca al usuario en cada solicitud autenticada.
+``ModelBackendCacheado`` guarda el objeto en ``USUARIOS_CACHE``; se invalida
+al guardar o eliminar el usuario (``signals.py``), así que un cambio de
+contraseña sigue cerrando las demás sesiones.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+
+def _cache():
+    return caches[getattr(settings, 'USUARIOS_CACHE', 'default')]
+
+
+def clave_usuario(user_id) -> str:
+    return f'usuario:{user_id}'
+
+
+def invalidar_usuario(user_id) -> None:
+    _cache().delete(clave_usuario(user_id))
+
+
+class ModelBackendCacheado(ModelBackend):
+    def get_user(self, user_id):
+        clave = clave_usuario(user_id)
+        user = _cache().get(clave)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            _cache().set(clave, user, getattr(settings, 'USUARIOS_CACHE_TTL', 300))
+        return user if self.user_can_authenticate(user) else None
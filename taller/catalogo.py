@@ -0,0 +1,181 @@
+"""Catálogo de marcas y modelos con autocompletado en memoria.
+
+Cada worker carga ``CatalogoVehiculo`` completo en índices de prefijos (un
+trie para marcas y uno por marca para sus modelos). Cada nodo del trie guarda
+ya ordenadas sus mejores sugerencias, así que responder a una tecla es
+recorrer tantos nodos como letras tenga el prefijo, sin tocar la base de datos.
+
+Cuando el catálogo cambia se publica una nueva ``generacion`` en la caché
+compartida (``CATALOGO_CACHE``); los workers la revisan como mucho cada
+``CATALOGO_REVISION`` segundos y recargan si cambió. Sin caché compartida, el
+índice se recarga cada ``CATALOGO_TTL`` segundos.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.crypto import get_random_string
+
+from .models import CatalogoVehiculo
+from .normalizacion import clave_nombre, formatear_nombre
+
+
+CLAVE_GENERACION = 'catalogo:generacion'
+LIMITE_SUGERENCIAS = 10
+
+
+def _ajuste(nombre: str, default):
+    return getattr(settings, nombre, default)
+
+
+class _Nodo:
+    __slots__ = ('hijos', 'mejores')
+
+    def __init__(self):
+        self.hijos = {}
+        self.mejores = []
+
+
+class IndicePrefijos:
+    """Trie sobre claves normalizadas; cada nodo conserva sus ``limite`` textos de mayor peso."""
+
+    def __init__(self, limite: int = LIMITE_SUGERENCIAS):
+        self.limite = limite
+        self.raiz = _Nodo()
+
+    def _anotar(self, nodo: _Nodo, texto: str, peso: int) -> None:
+        mejores = [m for m in nodo.mejores if m[1] != texto]
+        mejores.append((-peso, texto))
+        mejores.sort()
+        nodo.mejores = mejores[:self.limite]
+
+    def agregar(self, clave: str, texto: str, peso: int = 0) -> None:
+        nodo = self.raiz
+        self._anotar(nodo, texto, peso)
+        for letra in clave:
+            nodo = nodo.hijos.setdefault(letra, _Nodo())
+            self._anotar(nodo, texto, peso)
+
+    def buscar(self, prefijo: str, limite: int = None) -> list:
+        nodo = self.raiz
+        for letra in prefijo:
+            nodo = nodo.hijos.get(letra)
+            if nodo is None:
+                return []
+        return [texto for _, texto in nodo.mejores[:limite or self.limite]]
+
+
+class Catalogo:
+    """Marcas y modelos en memoria: índices de prefijos y escritura canónica por clave."""
+
+    def __init__(self, entradas):
+        self.marcas = IndicePrefijos()
+        self.modelos = {}
+        self.marca_por_clave = {}
+        self.modelo_por_clave = {}
+        pesos = {}
+        for marca, modelo, marca_clave, modelo_clave, usos in entradas:
+            self.marca_por_clave.setdefault(marca_clave, marca)
+            self.modelo_por_clave.setdefault((marca_clave, modelo_clave), modelo)
+            self.modelos.setdefault(marca_clave, IndicePrefijos()).agregar(modelo_clave, modelo, usos)
+            pesos[marca_clave] = pesos.get(marca_clave, 0) + usos
+        for marca_clave, peso in pesos.items():
+            self.marcas.agregar(marca_clave, self.marca_por_clave[marca_clave], peso)
+
+    def sugerir_marcas(self, prefijo: str, limite: int = None) -> list:
+        return self.marcas.buscar(clave_nombre(prefijo), limite)
+
+    def sugerir_modelos(self, marca: str, prefijo: str, limite: int = None) -> list:
+        indice = self.modelos.get(clave_nombre(marca))
+        return indice.buscar(clave_nombre(prefijo), limite) if indice else []
+
+
+class _EstadoCatalogo:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.catalogo = None
+        self.generacion = None
+        self.cargado_en = 0.0
+        self.revisado_en = 0.0
+
+
+_estado = _EstadoCatalogo()
+
+
+def _cache_compartida():
+    alias = _ajuste('CATALOGO_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _generacion_compartida():
+    compartida = _cache_compartida()
+    return compartida.get(CLAVE_GENERACION) if compartida is not None else None
+
+
+def _cargar() -> None:
+    _estado.generacion = _generacion_compartida()
+    entradas = CatalogoVehiculo.objects.values_list('marca', 'modelo', 'marca_clave', 'modelo_clave', 'usos')
+    _estado.catalogo = Catalogo(entradas.order_by('-usos', 'pk').iterator())
+    _estado.cargado_en = _estado.revisado_en = time.monotonic()
+
+
+def cargar() -> Catalogo:
+    """Carga (o recarga) el catálogo del worker; útil para calentarlo al arrancar."""
+    with _estado.lock:
+        _cargar()
+        return _estado.catalogo
+
+
+def catalogo() -> Catalogo:
+    """Catálogo vigente del worker; lo recarga si expiró o si otro worker lo cambió."""
+    ahora = time.monotonic()
+    with _estado.lock:
+        if _estado.catalogo is None or ahora - _estado.cargado_en > _ajuste('CATALOGO_TTL', 3600):
+            _cargar()
+        elif ahora - _estado.revisado_en > _ajuste('CATALOGO_REVISION', 5):
+            _estado.revisado_en = ahora
+            if _cache_compartida() is not None and _generacion_compartida() != _estado.generacion:
+                _cargar()
+        return _estado.catalogo
+
+
+def invalidar() -> None:
+    """Publica una nueva generación y fuerza la recarga local en la siguiente consulta."""
+    compartida = _cache_compartida()
+    if compartida is not None:
+        compartida.set(CLAVE_GENERACION, get_random_string(12), None)
+    with _estado.lock:
+        _estado.cargado_en = 0.0
+
+
+def marca_canonica(marca: str) -> str:
+    """Escritura del catálogo para ``marca``; si no existe, capitalización uniforme."""
+    texto = ' '.join((marca or '').split())
+    return catalogo().marca_por_clave.get(clave_nombre(texto)) or formatear_nombre(texto)
+
+
+def modelo_canonico(marca: str, modelo: str) -> str:
+    texto = ' '.join((modelo or '').split())
+    clave = (clave_nombre(marca), clave_nombre(texto))
+    return catalogo().modelo_por_clave.get(clave) or formatear_nombre(texto)
+
+
+def registrar(marca: str, modelo: str, nuevo_uso: bool = True) -> CatalogoVehiculo:
+    """Asegura que la combinación exista en el catálogo y, si ``nuevo_uso``, suma un uso."""
+    marca_clave, modelo_clave = clave_nombre(marca), clave_nombre(modelo)
+    entrada = CatalogoVehiculo.objects.filter(marca_clave=marca_clave, modelo_clave=modelo_clave).first()
+    if entrada is None:
+        try:
+            with transaction.atomic():
+                # post_save invalida el índice de todos los workers.
+                entrada = CatalogoVehiculo.objects.create(marca=marca, modelo=modelo, usos=int(nuevo_uso))
+            return entrada
+        except IntegrityError:
+            entrada = CatalogoVehiculo.objects.get(marca_clave=marca_clave, modelo_clave=modelo_clave)
+    if nuevo_uso:
+        # Solo cambia el orden de las sugerencias: se refleja en la siguiente recarga.
+        CatalogoVehiculo.objects.filter(pk=entrada.pk).update(usos=F('usos') + 1)
+    return entrada
@@ -0,0 +1,123 @@
+"""Vinculación de órdenes y citas con ``Cliente`` y ``Vehiculo``.
+
+Para reconocer a un cliente que regresa se prueba, en este orden: la placa
+del vehículo, el teléfono y el email. Todas las búsquedas son por igualdad
+sobre columnas indexadas. El nombre solo no basta: dos "Juan Pérez" sin
+contacto en común quedan como clientes distintos y el personal los fusiona si
+son la misma persona (``fusionar_clientes``); al revés no habría cómo separarlos.
+"""
+
+from . import sucursales
+from .models import Cita, Cliente, OrdenServicio, Vehiculo
+from .normalizacion import (
+    normalizar_email,
+    normalizar_matricula,
+    normalizar_telefono,
+    separar_contacto,
+)
+
+
+def obtener_cliente(nombre: str, telefono: str = '', email: str = '', vehiculo: Vehiculo = None) -> Cliente:
+    telefono = normalizar_telefono(telefono)
+    email = normalizar_email(email)
+    cliente = None
+    if vehiculo is not None and vehiculo.cliente_id:
+        cliente = vehiculo.cliente
+    if cliente is None and telefono:
+        cliente = Cliente.objects.filter(telefono=telefono).first()
+    if cliente is None and email:
+        cliente = Cliente.objects.filter(email=email).first()
+    if cliente is None:
+        return Cliente.objects.create(nombre=nombre.strip(), telefono=telefono, email=email)
+
+    # Completar datos de contacto que no se tenían.
+    cambios = []
+    if telefono and not cliente.telefono:
+        cliente.telefono = telefono
+        cambios.append('telefono')
+    if email and not cliente.email:
+        cliente.email = email
+        cambios.append('email')
+    if cambios:
+        cliente.save(update_fields=cambios)
+    return cliente
+
+
+def obtener_vehiculo(orden: OrdenServicio):
+    """Vehículo de la orden por placa; sin placa no se puede identificar y retorna ``None``."""
+    matricula = normalizar_matricula(orden.vehiculo_matricula)
+    if not matricula:
+        return None
+    vehiculo, creado = Vehiculo.objects.get_or_create(
+        matricula_normalizada=matricula,
+        defaults={
+            'matricula': orden.vehiculo_matricula.strip(),
+            'marca': orden.vehiculo_marca,
+            'modelo': orden.vehiculo_modelo,
+            'anio': orden.vehiculo_anio,
+            'color': orden.vehiculo_color,
+        },
+    )
+    if not creado and vehiculo.color != orden.vehiculo_color:
+        # Un wrap cambia el color; el vehículo refleja el de la orden más reciente.
+        vehiculo.color = orden.vehiculo_color
+        vehiculo.save(update_fields=['color'])
+    return vehiculo
+
+
+def enlazar_orden(orden: OrdenServicio, telefono: str = '', email: str = '') -> bool:
+    """Asigna cliente y vehículo a ``orden`` sin guardarla; retorna si el enlace cambió.
+
+    Para una orden nueva, enlazar antes del primer ``save()`` deja un solo evento
+    ``orden.creado`` en el outbox en lugar de uno de creación y otro de cambio.
+    """
+    vehiculo = obtener_vehiculo(orden)
+    cliente = obtener_cliente(orden.cliente_nombre, telefono, email, vehiculo=vehiculo)
+    if vehiculo is not None and vehiculo.cliente_id is None:
+        vehiculo.cliente = cliente
+        vehiculo.save(update_fields=['cliente'])
+    if orden.cliente_id == cliente.pk and orden.vehiculo_id == (vehiculo.pk if vehiculo else None):
+        return False
+    orden.cliente = cliente
+    orden.vehiculo = vehiculo
+    return True
+
+
+@sucursales.transaccional
+def vincular_orden(orden: OrdenServicio, telefono: str = '', email: str = '') -> OrdenServicio:
+    """Enlaza una orden ya guardada; solo la vuelve a guardar si el enlace cambió."""
+    if enlazar_orden(orden, telefono, email):
+        orden.save(update_fields=['cliente', 'vehiculo'])
+    return orden
+
+
+@sucursales.transaccional
+def vincular_cita(cita: Cita) -> Cita:
+    telefono, email = separar_contacto(cita.cliente_contacto)
+    cliente = obtener_cliente(cita.cliente_nombre, telefono, email)
+    if cita.cliente_id != cliente.pk:
+        cita.cliente = cliente
+        cita.save(update_fields=['cliente'])
+    return cita
+
+
+@sucursales.transaccional
+def fusionar_clientes(destino: Cliente, duplicados) -> int:
+    """Mueve órdenes, citas y vehículos de ``duplicados`` a ``destino`` y los elimina."""
+    ids = [c.pk for c in duplicados if c.pk != destino.pk]
+    if not ids:
+        return 0
+    # Orden por orden, no con update(): cada cambio deja su evento en el outbox.
+    for orden in OrdenServicio.objects.filter(cliente_id__in=ids).iterator(chunk_size=200):
+        orden.cliente = destino
+        orden.save(update_fields=['cliente'])
+    Cita.objects.filter(cliente_id__in=ids).update(cliente=destino)
+    Vehiculo.objects.filter(cliente_id__in=ids).update(cliente=destino)
+    for duplicado in Cliente.objects.filter(pk__in=ids):
+        if duplicado.telefono and not destino.telefono:
+            destino.telefono = duplicado.telefono
+        if duplicado.email and not destino.email:
+            destino.email = duplicado.email
+    destino.save()
+    Cliente.objects.filter(pk__in=ids).delete()
+    return len(ids)
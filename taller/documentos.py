@@ -0,0 +1,241 @@
+"""Orden de trabajo y recibo imprimibles (HTML para imprimir o PDF).
+
+La solicitud nunca renderiza un documento: calcula la ``huella`` del estado de
+la orden (sus campos, avances y fotos) y, si ya hay un archivo con esa huella,
+lo sirve. Si no, registra un ``Documento`` pendiente y responde 202; el
+proceso ``python manage.py generar_documentos --seguir`` lo genera (en Render
+corre junto a gunicorn en el servicio web, que es quien tiene los archivos; ver
+``render.yaml``). Una orden que no cambia reutiliza su archivo indefinidamente;
+si el archivo desaparece, el documento vuelve a quedar pendiente.
+
+``generar_documentos --fecha AAAA-MM-DD`` genera de una vez los recibos de las
+órdenes terminadas ese día. El consumidor ``documentos`` del outbox pide el
+recibo en cuanto una orden pasa a ``TRABAJO_TERMINADO``.
+
+El PDF requiere WeasyPrint (opcional); sin él solo se ofrece HTML.
+"""
+import datetime
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.contrib.auth.decorators import user_passes_test
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Exists, OuterRef
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from . import metricas, qr, sucursales
+from .folios import url_seguimiento
+from .models import Documento, OrdenServicio
+from .outbox import consumidor
+
+logger = logging.getLogger(__name__)
+
+try:
+    import weasyprint
+except ImportError:  # pragma: no cover - weasyprint es opcional
+    weasyprint = None
+
+
+# Subir al cambiar la plantilla: cambia todas las huellas y se regeneran.
+VERSION_PLANTILLA = 3
+TIPOS_CONTENIDO = {
+    Documento.Formato.HTML: 'text/html; charset=utf-8',
+    Documento.Formato.PDF: 'application/pdf',
+}
+
+metricas.describir('wraplab_documentos_total', 'Documentos procesados por el generador, por tipo, formato y resultado.')
+
+
+def _ajuste(nombre: str, default):
+    return getattr(settings, nombre, default)
+
+
+def formatos() -> tuple:
+    if weasyprint is None:
+        return (Documento.Formato.HTML,)
+    return (Documento.Formato.HTML, Documento.Formato.PDF)
+
+
+def _almacen() -> FileSystemStorage:
+    return FileSystemStorage(location=_ajuste('DOCUMENTOS_DIR', settings.BASE_DIR / 'media' / 'documentos'))
+
+
+def cargar_orden(pk: int) -> OrdenServicio:
+    return OrdenServicio.objects.select_related('sucursal').prefetch_related('avances', 'fotos').get(pk=pk)
+
+
+def huella(orden: OrdenServicio, tipo: str) -> str:
+    """Hash del contenido impreso; ``actualizado_en`` queda fuera para que guardar sin cambios no regenere."""
+    estado = {
+        'version': VERSION_PLANTILLA,
+        'tipo': tipo,
+        # El enlace y el QR impresos dependen de ``SITIO_URL``.
+        'enlace': url_seguimiento(orden.folio),
+        'orden': {
+            f.attname: getattr(orden, f.attname)
+            for f in orden._meta.concrete_fields if f.attname != 'actualizado_en'
+        },
+        'avances': [(a.pk, a.estatus, a.nota, a.creado_en) for a in orden.avances.all()],
+        'fotos': [(f.pk, f.numero, f.url) for f in orden.fotos.all()],
+    }
+    return hashlib.sha256(json.dumps(estado, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def renderizar(orden: OrdenServicio, tipo: str, formato: str) -> bytes:
+    html = render_to_string('taller/documento_orden.html', {
+        'orden': orden,
+        'tipo': tipo,
+        'titulo': Documento.Tipo(tipo).label,
+        'avances': orden.avances.all(),
+        'fotos': orden.fotos.all(),
+        'url_seguimiento': url_seguimiento(orden.folio),
+        'qr': mark_safe(qr.svg_en_linea(orden.folio)),
+        'generado_en': timezone.now(),
+    })
+    if formato == Documento.Formato.PDF:
+        return weasyprint.HTML(string=html, base_url=_ajuste('SITIO_URL', None)).write_pdf()
+    return html.encode()
+
+
+def solicitar(orden: OrdenServicio, tipo: str, formato: str) -> Documento:
+    """El documento con el estado actual de ``orden``; lo deja pendiente si no existe."""
+    documento, creado = Documento.objects.get_or_create(
+        orden=orden, tipo=tipo, formato=formato, huella=huella(orden, tipo),
+    )
+    if not creado:
+        # La orden volvió a un estado anterior: este documento vuelve a ser el
+        # vigente y la retención poda los otros (ver ``retencion.Documentos``).
+        posterior = Documento.objects.filter(
+            orden=orden, tipo=tipo, formato=formato, solicitado_en__gt=OuterRef('solicitado_en'),
+        )
+        Documento.objects.filter(pk=documento.pk).filter(Exists(posterior)).update(solicitado_en=timezone.now())
+    return documento
+
+
+def generar(documento: Documento) -> str:
+    """Genera el archivo de un documento pendiente; retorna el resultado para la métrica."""
+    orden = cargar_orden(documento.orden_id)
+    if huella(orden, documento.tipo) != documento.huella:
+        # La orden cambió desde que se pidió; quien la vuelva a pedir obtiene la huella nueva.
+        documento.delete()
+        return 'obsoleto'
+    almacen = _almacen()
+    ruta = f'{documento.tipo}/{documento.huella}.{documento.formato}'
+    if not almacen.exists(ruta):
+        almacen.save(ruta, ContentFile(renderizar(orden, documento.tipo, documento.formato)))
+    Documento.objects.filter(pk=documento.pk).update(
+        estado=Documento.Estado.LISTO, ruta=ruta, generado_en=timezone.now(), ultimo_error='',
+    )
+    return 'generado'
+
+
+def _reservar(limite: int) -> list:
+    """Toma pendientes y los aparta ``DOCUMENTOS_RESERVA`` segundos para este proceso."""
+    ahora = timezone.now()
+    with sucursales.atomica():
+        ids = list(
+            Documento.objects.select_for_update(skip_locked=True)
+            .filter(estado=Documento.Estado.PENDIENTE, intentar_despues__lte=ahora)
+            .order_by('intentar_despues')
+            .values_list('pk', flat=True)[:limite]
+        )
+        reserva = ahora + datetime.timedelta(seconds=_ajuste('DOCUMENTOS_RESERVA', 300))
+        Documento.objects.filter(pk__in=ids).update(intentar_despues=reserva)
+    return list(Documento.objects.filter(pk__in=ids).order_by('pk'))
+
+
+def _fallo(documento: Documento, error: Exception) -> None:
+    intentos = documento.intentos + 1
+    agotado = intentos >= _ajuste('DOCUMENTOS_MAX_INTENTOS', 3)
+    Documento.objects.filter(pk=documento.pk).update(
+        intentos=intentos,
+        ultimo_error=f'{type(error).__name__}: {error}'[:1000],
+        estado=Documento.Estado.FALLIDO if agotado else Documento.Estado.PENDIENTE,
+        intentar_despues=timezone.now() + datetime.timedelta(seconds=30 * 2 ** (intentos - 1)),
+    )
+
+
+def _procesar(documento: Documento) -> bool:
+    try:
+        resultado = generar(documento)
+    except Exception as exc:
+        _fallo(documento, exc)
+        resultado = 'fallido'
+    metricas.incrementar('wraplab_documentos_total', tipo=documento.tipo, formato=documento.formato, resultado=resultado)
+    return resultado == 'generado'
+
+
+def generar_pendientes(limite: int = 20) -> int:
+    """Procesa un lote de documentos pendientes; retorna cuántos tomó."""
+    lote = _reservar(limite)
+    for documento in lote:
+        _procesar(documento)
+    return len(lote)
+
+
+def generar_del_dia(fecha: datetime.date, tipo: str = Documento.Tipo.RECIBO, formato=None) -> int:
+    """Genera en esta llamada los documentos de las órdenes terminadas en ``fecha``; retorna cuántos generó."""
+    inicio = timezone.make_aware(datetime.datetime.combine(fecha, datetime.time.min))
+    ordenes = OrdenServicio.objects.filter(
+        estatus=OrdenServicio.Estatus.TRABAJO_TERMINADO,
+        actualizado_en__gte=inicio,
+        actualizado_en__lt=inicio + datetime.timedelta(days=1),
+    ).prefetch_related('avances', 'fotos')
+    if sucursales.activa() is not None:
+        ordenes = ordenes.filter(sucursal=sucursales.activa())
+    generados = 0
+    for orden in ordenes.iterator(chunk_size=100):
+        for fmt in [formato] if formato else formatos():
+            documento = solicitar(orden, tipo, fmt)
+            if documento.estado == Documento.Estado.PENDIENTE:
+                generados += _procesar(documento)
+    return generados
+
+
+@consumidor('documentos')
+def pedir_recibos(eventos) -> None:
+    terminadas = {
+        e.objeto_id for e in eventos
+        if e.tipo == 'orden.estatus' and e.datos.get('estatus') == OrdenServicio.Estatus.TRABAJO_TERMINADO
+    }
+    for orden in OrdenServicio.objects.filter(pk__in=terminadas).prefetch_related('avances', 'fotos'):
+        for formato in formatos():
+            solicitar(orden, Documento.Tipo.RECIBO, formato)
+
+
+def _superuser_required(user) -> bool:
+    return user.is_authenticated and user.is_superuser
+
+
+@user_passes_test(_superuser_required)
+def ver_documento(request: HttpRequest, pk: int, tipo: str, formato: str) -> HttpResponse:
+    if tipo not in Documento.Tipo.values or formato not in Documento.Formato.values:
+        raise Http404
+    if formato not in formatos():
+        # Sin generador de PDF: la versión HTML se imprime desde el navegador.
+        return redirect('documento_orden', pk=pk, tipo=tipo, formato=Documento.Formato.HTML)
+    orden = get_object_or_404(
+        OrdenServicio.objects.prefetch_related('avances', 'fotos'), pk=pk, sucursal=request.sucursal,
+    )
+    documento = solicitar(orden, tipo, formato)
+    if documento.estado == Documento.Estado.LISTO and not _almacen().exists(documento.ruta):
+        # El archivo se perdió (p. ej. el disco de la instancia tras un despliegue): se vuelve a generar.
+        logger.warning('Documento %s sin archivo %s; se regenera', documento.pk, documento.ruta)
+        Documento.objects.filter(pk=documento.pk).update(
+            estado=Documento.Estado.PENDIENTE, ruta='', generado_en=None, intentar_despues=timezone.now(),
+        )
+        documento.refresh_from_db()
+    if documento.estado == Documento.Estado.LISTO:
+        respuesta = FileResponse(_almacen().open(documento.ruta), content_type=TIPOS_CONTENIDO[formato])
+        respuesta['Content-Disposition'] = f'inline; filename="{orden.folio}-{tipo}.{formato}"'
+        return respuesta
+    return render(request, 'taller/documento_pendiente.html', {
+        'orden': orden, 'documento': documento,
+    }, status=500 if documento.estado == Documento.Estado.FALLIDO else 202)
@@ -0,0 +1,264 @@
+"""Resolución de folios a pk con caché de lectura y filtro de Bloom.
+
+Orden de consulta para un folio:
+
+1. Validación de formato (sin I/O).
+2. Caché local del proceso y, si está configurada, la caché compartida
+   (``FOLIO_CACHE_COMPARTIDA``). Las entradas negativas se guardan como ``0``
+   con un TTL corto.
+3. Filtro de Bloom con todos los folios emitidos. Si el filtro dice que el
+   folio no existe se rechaza sin tocar la base de datos.
+4. Consulta a la base de datos; el resultado se guarda en caché.
+
+El filtro vive en memoria de cada worker. Cuando se crea una orden se agrega
+al filtro local y, al confirmarse la transacción, se cambia la ``generacion``
+en la caché compartida; los demás workers la comparan antes de rechazar un
+folio y se ponen al día cargando solo las órdenes nuevas. Además, el filtro se
+reconstruye completo cada ``FOLIO_BLOOM_TTL`` segundos.
+
+Si hay sucursales con base de datos propia, cada base tiene su filtro y su
+generación; el prefijo del folio indica la base (``sucursales.base_de_folio``),
+así que una consulta nunca toca más de una.
+"""
+import hashlib
+import math
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from . import sucursales
+from .models import OrdenServicio
+
+
+FORMATO_FOLIO = re.compile(r'^[A-Z0-9]{1,12}$')
+CLAVE_GENERACION = 'folios:generacion'
+
+
+def _ajuste(nombre: str, default):
+    return getattr(settings, nombre, default)
+
+
+def _clave(folio: str) -> str:
+    return f'folio:{folio}'
+
+
+class FiltroBloom:
+    """Filtro de Bloom sobre un ``bytearray`` con doble hashing (blake2b)."""
+
+    def __init__(self, capacidad: int, tasa_error: float = 0.001):
+        capacidad = max(capacidad, 1)
+        self.num_bits = max(8, math.ceil(-capacidad * math.log(tasa_error) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacidad * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _posiciones(self, valor: str):
+        digest = hashlib.blake2b(valor.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def agregar(self, valor: str) -> None:
+        for pos in self._posiciones(valor):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, valor: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._posiciones(valor))
+
+
+class _EstadoFiltro:
+    def __init__(self, base: str):
+        self.base = base
+        self.lock = threading.Lock()
+        self.filtro = None
+        self.ultimo_pk = 0
+        self.generacion = None
+        self.cargado_en = 0.0
+
+
+_estados = {}
+_estados_lock = threading.Lock()
+
+
+def _estado_de(base: str) -> _EstadoFiltro:
+    estado = _estados.get(base)
+    if estado is None:
+        with _estados_lock:
+            estado = _estados.setdefault(base, _EstadoFiltro(base))
+    return estado
+
+
+def _clave_generacion(base: str) -> str:
+    return CLAVE_GENERACION if base == DEFAULT_DB_ALIAS else f'{CLAVE_GENERACION}:{base}'
+
+
+def _cache_local():
+    return caches[_ajuste('FOLIO_CACHE_LOCAL', 'default')]
+
+
+def _cache_compartida():
+    alias = _ajuste('FOLIO_CACHE_COMPARTIDA', None)
+    return caches[alias] if alias else None
+
+
+def _leer_cache(clave: str):
+    local = _cache_local()
+    valor = local.get(clave)
+    if valor is None:
+        compartida = _cache_compartida()
+        if compartida is not None:
+            valor = compartida.get(clave)
+            if valor is not None:
+                local.set(clave, valor, _ajuste('FOLIO_CACHE_TTL', 300) if valor else _ajuste('FOLIO_CACHE_TTL_NEGATIVO', 30))
+    return valor
+
+
+def _guardar_cache(clave: str, valor: int) -> None:
+    ttl = _ajuste('FOLIO_CACHE_TTL', 300) if valor else _ajuste('FOLIO_CACHE_TTL_NEGATIVO', 30)
+    _cache_local().set(clave, valor, ttl)
+    compartida = _cache_compartida()
+    if compartida is not None:
+        compartida.set(clave, valor, ttl)
+
+
+def _generacion_compartida(base: str):
+    compartida = _cache_compartida()
+    return compartida.get(_clave_generacion(base)) if compartida is not None else None
+
+
+def _cargar_filtro(estado: _EstadoFiltro, completo: bool) -> None:
+    """Construye el filtro o agrega las órdenes con pk mayor al último visto."""
+    generacion = _generacion_compartida(estado.base)
+    ordenes = OrdenServicio.objects.using(estado.base)
+    qs = ordenes.order_by('pk').values_list('pk', 'folio')
+    if completo or estado.filtro is None:
+        total = ordenes.count()
+        estado.filtro = FiltroBloom(max(total * 2, _ajuste('FOLIO_BLOOM_CAPACIDAD', 10000)))
+        estado.ultimo_pk = 0
+    else:
+        qs = qs.filter(pk__gt=estado.ultimo_pk)
+    for pk, folio in qs.iterator():
+        estado.filtro.agregar(folio)
+        estado.ultimo_pk = max(estado.ultimo_pk, pk)
+    estado.generacion = generacion
+    estado.cargado_en = time.monotonic()
+
+
+def _filtro_contiene(base: str, folio: str) -> bool:
+    estado = _estado_de(base)
+    with estado.lock:
+        if estado.filtro is None:
+            _cargar_filtro(estado, completo=True)
+        if folio in estado.filtro:
+            return True
+        # Antes de rechazar, verificar que el filtro no se haya quedado atrás.
+        if time.monotonic() - estado.cargado_en > _ajuste('FOLIO_BLOOM_TTL', 600):
+            _cargar_filtro(estado, completo=True)
+        elif _cache_compartida() is not None and _generacion_compartida(base) != estado.generacion:
+            _cargar_filtro(estado, completo=False)
+        else:
+            return False
+        return folio in estado.filtro
+
+
+def resolver_folio(folio: str):
+    """Retorna el pk de la orden con ese folio, o ``None`` si no existe."""
+    folio = (folio or '').strip().upper()
+    if not FORMATO_FOLIO.match(folio):
+        return None
+    clave = _clave(folio)
+    valor = _leer_cache(clave)
+    if valor is not None:
+        return valor or None
+    base = sucursales.base_de_folio(folio)
+    if not _filtro_contiene(base, folio):
+        # No se cachea el negativo: evita que un barrido de folios llene la caché.
+        return None
+    pk = OrdenServicio.objects.using(base).filter(folio=folio).values_list('pk', flat=True).first()
+    _guardar_cache(clave, pk or 0)
+    return pk
+
+
+def orden_por_folio(folio: str) -> OrdenServicio:
+    """Carga la orden de un folio usando la caché; lanza ``Http404`` si no existe."""
+    folio = folio.strip().upper()
+    pk = resolver_folio(folio)
+    if pk is None:
+        raise Http404('Folio no encontrado')
+    ordenes = OrdenServicio.objects.using(sucursales.base_de_folio(folio))
+    orden = ordenes.filter(pk=pk, folio=folio).first()
+    if orden is None:
+        # Entrada de caché obsoleta (p. ej. orden eliminada): se consulta directo.
+        invalidar_folio(folio)
+        orden = get_object_or_404(ordenes, folio=folio)
+    return orden
+
+
+def url_seguimiento(folio: str) -> str:
+    """URL pública de seguimiento del folio, sobre ``SITIO_URL``."""
+    return _ajuste('SITIO_URL', '').rstrip('/') + reverse('seguimiento_detalle', kwargs={'folio': folio})
+
+
+def registrar_folio(folio: str, pk: int) -> None:
+    """Agrega un folio recién emitido al filtro y a la caché."""
+    base = sucursales.base_de_folio(folio)
+    estado = _estado_de(base)
+    with estado.lock:
+        # ``ultimo_pk`` no se mueve: otros workers pudieron emitir pks menores.
+        if estado.filtro is not None:
+            estado.filtro.agregar(folio)
+    _guardar_cache(_clave(folio), pk)
+    transaction.on_commit(lambda: _nueva_generacion(base), using=base)
+
+
+def precargar(folio: str, pk: int) -> None:
+    """Deja en caché un folio que se espera consultar pronto (ver ``arranque.precargar_seguimiento``)."""
+    _guardar_cache(_clave(folio), pk)
+
+
+def _nueva_generacion(base: str) -> None:
+    compartida = _cache_compartida()
+    if compartida is None:
+        return
+    clave = _clave_generacion(base)
+    anterior = compartida.get(clave)
+    generacion = get_random_string(12)
+    compartida.set(clave, generacion, None)
+    estado = _estado_de(base)
+    with estado.lock:
+        # Solo nos damos por enterados si ya estábamos al día con la anterior.
+        if estado.generacion == anterior:
+            estado.generacion = generacion
+
+
+def invalidar_folio(folio: str) -> None:
+    clave = _clave(folio.strip().upper())
+    _cache_local().delete(clave)
+    compartida = _cache_compartida()
+    if compartida is not None:
+        compartida.delete(clave)
+
+
+def cargar_filtro() -> None:
+    """Construye los filtros del proceso ya, en lugar de en la primera consulta."""
+    for base in sucursales.bases():
+        estado = _estado_de(base)
+        with estado.lock:
+            _cargar_filtro(estado, completo=True)
+
+
+def reiniciar_filtro() -> None:
+    """Descarta los filtros del proceso; se reconstruyen en la siguiente consulta."""
+    for estado in list(_estados.values()):
+        with estado.lock:
+            estado.filtro = None
+            estado.ultimo_pk = 0
+            estado.generacion = None
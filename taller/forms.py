@@ -1,6 +1,9 @@
 from django import forms
 
+from . import catalogo, sucursales
+from .clientes import enlazar_orden, vincular_cita
 from .models import Avance, Cita, OrdenServicio, FotoOrden
+from .normalizacion import clave_nombre
 
 
 class OrdenServicioForm(forms.ModelForm):
@@ -10,11 +13,15 @@ class OrdenServicioForm(forms.ModelForm):
         required=False,
         label="Testigos Encendidos"
     )
+    cliente_telefono = forms.CharField(max_length=20, required=False, label='Teléfono del cliente')
+    cliente_email = forms.EmailField(required=False, label='Email del cliente')
 
     class Meta:
         model = OrdenServicio
         fields = [
             'cliente_nombre',
+            'cliente_telefono',
+            'cliente_email',
             'vehiculo_marca',
             'vehiculo_modelo',
             'vehiculo_matricula',
@@ -46,12 +53,40 @@ class OrdenServicioForm(forms.ModelForm):
         # Ensure initial data for JSONField is correctly handled if it's a list
         if self.instance and self.instance.pk and self.instance.testigos:
             self.initial['testigos'] = self.instance.testigos
+        if self.instance and self.instance.cliente_id:
+            self.initial.setdefault('cliente_telefono', self.instance.cliente.telefono)
+            self.initial.setdefault('cliente_email', self.instance.cliente.email)
             
         base = 'w-full rounded-xl border border-zinc-800 bg-zinc-950 px-4 py-3 text-white placeholder-zinc-500 shadow-sm transition focus:border-indigo-500 focus:outline-none focus:ring-1 focus:ring-indigo-500'
         for name, field in self.fields.items():
             if name != 'testigos': # Skip styling for checkbox container here, handle in template or separate logic
                 field.widget.attrs['class'] = base
 
+    def clean(self):
+        cleaned_data = super().clean()
+        # Misma escritura que el catálogo: "ferrari " y "FERRARI" se guardan como "Ferrari".
+        marca = cleaned_data.get('vehiculo_marca')
+        if marca:
+            cleaned_data['vehiculo_marca'] = marca = catalogo.marca_canonica(marca)
+            if cleaned_data.get('vehiculo_modelo'):
+                cleaned_data['vehiculo_modelo'] = catalogo.modelo_canonico(marca, cleaned_data['vehiculo_modelo'])
+        return cleaned_data
+
+    def save(self, commit=True):
+        # testigos no es columna del modelo; se guarda como máscara en testigos_bits.
+        self.instance.testigos = self.cleaned_data.get('testigos', [])
+        nuevo = self.instance._state.adding
+        if not commit:
+            return super().save(commit=False)
+        with sucursales.atomica():
+            # Se enlaza antes de guardar: una sola escritura y un solo evento en el outbox.
+            enlazar_orden(self.instance, self.cleaned_data.get('cliente_telefono'), self.cleaned_data.get('cliente_email'))
+            orden = super().save()
+        anterior = (clave_nombre(self.initial.get('vehiculo_marca', '')), clave_nombre(self.initial.get('vehiculo_modelo', '')))
+        actual = (clave_nombre(orden.vehiculo_marca), clave_nombre(orden.vehiculo_modelo))
+        catalogo.registrar(orden.vehiculo_marca, orden.vehiculo_modelo, nuevo_uso=nuevo or anterior != actual)
+        return orden
+
 
 class CitaForm(forms.ModelForm):
     class Meta:
@@ -68,6 +103,12 @@ class CitaForm(forms.ModelForm):
         for field in self.fields.values():
             field.widget.attrs['class'] = base
 
+    def save(self, commit=True):
+        cita = super().save(commit=commit)
+        if commit:
+            vincular_cita(cita)
+        return cita
+
 
 class AvanceForm(forms.ModelForm):
     class Meta:
@@ -151,6 +192,7 @@ class FotoOrdenForm(forms.Form):
                 label=labels.get(i, f"Foto {i}")
             )
 
+    @sucursales.transaccional
     def save(self):
         if not self.orden:
             return
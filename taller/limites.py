@@ -0,0 +1,38 @@
+"""Limitación de tasa con cubetas de tokens guardadas en una caché de Django."""
+import threading
+import time
+
+from django.core.cache import caches
+
+
+class CubetaTokens:
+    """Cubeta de tokens: ``capacidad`` tokens que se recargan a ``tasa`` por segundo.
+
+    El estado de cada clave es ``(tokens, instante)`` en la caché indicada. Con
+    ``LocMemCache`` cada worker lleva sus propias cubetas.
+    """
+
+    def __init__(self, alias: str, prefijo: str, capacidad: float, tasa: float):
+        self.alias = alias
+        self.prefijo = prefijo
+        self.capacidad = capacidad
+        self.tasa = tasa
+        self._lock = threading.Lock()
+
+    def consumir(self, clave: str, costo: float = 1) -> float:
+        """Retorna 0 si se permite la solicitud, o los segundos a esperar si no."""
+        cache = caches[self.alias]
+        clave = f'{self.prefijo}:{clave}'
+        ahora = time.time()
+        with self._lock:
+            tokens, instante = cache.get(clave) or (self.capacidad, ahora)
+            tokens = min(self.capacidad, tokens + (ahora - instante) * self.tasa)
+            if tokens >= costo:
+                cache.set(clave, (tokens - costo, ahora), self._ttl())
+                return 0
+            cache.set(clave, (tokens, ahora), self._ttl())
+            return (costo - tokens) / self.tasa
+
+    def _ttl(self) -> int:
+        # Tiempo para llenarse de nuevo; después de eso la entrada ya no aporta nada.
+        return int(self.capacidad / self.tasa) + 1
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from taller import sucursales
+from taller.outbox import CONSUMIDORES, Consumidor
+
+
+class Command(BaseCommand):
+    help = 'Entrega los eventos pendientes del outbox a los consumidores registrados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('nombres', nargs='*', help='Consumidores a ejecutar (por defecto, todos).')
+        parser.add_argument('--seguir', action='store_true', help='Seguir esperando eventos nuevos.')
+        parser.add_argument('--intervalo', type=float, default=1.0)
+        parser.add_argument('--limite', type=int, default=500)
+        parser.add_argument(
+            '--sucursal', help='Clave de una sucursal con base propia: procesa el outbox de esa base.',
+        )
+
+    def handle(self, *args, **options):
+        nombres = options['nombres'] or sorted(CONSUMIDORES)
+        desconocidos = [n for n in nombres if n not in CONSUMIDORES]
+        if desconocidos:
+            raise CommandError(f'Consumidores desconocidos: {", ".join(desconocidos)}')
+        sucursal = None
+        if options['sucursal']:
+            sucursal = sucursales.por_clave(options['sucursal'])
+            if sucursal is None:
+                raise CommandError(f'Sucursal desconocida: {options["sucursal"]}')
+        consumidores = [Consumidor(n) for n in nombres]
+        with sucursales.activar(sucursal):
+            self._ciclo(consumidores, options)
+
+    def _ciclo(self, consumidores, options):
+        while True:
+            total = 0
+            for c in consumidores:
+                procesados = c.procesar(options['limite'])
+                total += procesados
+                if procesados:
+                    self.stdout.write(f'{c.nombre}: {procesados} eventos (posición {c.posicion()})')
+            if not options['seguir']:
+                break
+            if not total:
+                time.sleep(options['intervalo'])
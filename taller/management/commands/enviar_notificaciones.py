@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from taller import sucursales
+from taller.notificaciones import enviar_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Envía las notificaciones pendientes a los clientes, agrupadas por canal.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seguir', action='store_true', help='Seguir enviando las que vayan venciendo.')
+        parser.add_argument('--intervalo', type=float, default=5.0)
+        parser.add_argument('--limite', type=int, default=100)
+        parser.add_argument('--sucursal', help='Clave de una sucursal con base propia: envía las de esa base.')
+
+    def handle(self, *args, **options):
+        sucursal = None
+        if options['sucursal']:
+            sucursal = sucursales.por_clave(options['sucursal'])
+            if sucursal is None:
+                raise CommandError(f'Sucursal desconocida: {options["sucursal"]}')
+        with sucursales.activar(sucursal):
+            self._ciclo(options)
+
+    def _ciclo(self, options):
+        while True:
+            enviadas = enviar_pendientes(options['limite'])
+            if enviadas:
+                self.stdout.write(f'{enviadas} notificaciones procesadas')
+            if not options['seguir']:
+                break
+            if enviadas < options['limite']:
+                time.sleep(options['intervalo'])
@@ -0,0 +1,59 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from taller import sucursales
+from taller.documentos import formatos, generar_del_dia, generar_pendientes
+from taller.models import Documento
+
+
+class Command(BaseCommand):
+    help = 'Genera los documentos imprimibles pendientes, o los recibos de un día completo con --fecha.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seguir', action='store_true', help='Seguir generando los que se vayan pidiendo.')
+        parser.add_argument('--intervalo', type=float, default=2.0)
+        parser.add_argument('--limite', type=int, default=20)
+        parser.add_argument(
+            '--fecha', help='AAAA-MM-DD (u "hoy"): genera los documentos de las órdenes terminadas ese día.',
+        )
+        parser.add_argument('--tipo', choices=Documento.Tipo.values, default=Documento.Tipo.RECIBO)
+        parser.add_argument('--formato', choices=Documento.Formato.values)
+        parser.add_argument('--sucursal', help='Clave de la sucursal (con --fecha, solo sus órdenes).')
+
+    def handle(self, *args, **options):
+        sucursal = None
+        if options['sucursal']:
+            sucursal = sucursales.por_clave(options['sucursal'])
+            if sucursal is None:
+                raise CommandError(f'Sucursal desconocida: {options["sucursal"]}')
+        if options['formato'] and options['formato'] not in formatos():
+            raise CommandError(f'Formato no disponible: {options["formato"]} (¿falta WeasyPrint?)')
+        with sucursales.activar(sucursal):
+            if options['fecha']:
+                self._del_dia(options)
+            else:
+                self._ciclo(options)
+
+    def _del_dia(self, options):
+        if options['fecha'] == 'hoy':
+            fecha = timezone.localdate()
+        else:
+            try:
+                fecha = datetime.date.fromisoformat(options['fecha'])
+            except ValueError:
+                raise CommandError('--fecha debe ser AAAA-MM-DD')
+        generados = generar_del_dia(fecha, options['tipo'], options['formato'])
+        self.stdout.write(f'{generados} documentos generados para {fecha}')
+
+    def _ciclo(self, options):
+        while True:
+            procesados = generar_pendientes(options['limite'])
+            if procesados:
+                self.stdout.write(f'{procesados} documentos procesados')
+            if not options['seguir']:
+                break
+            if procesados < options['limite']:
+                time.sleep(options['intervalo'])
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from taller import retencion
+
+
+def _tamano(valor) -> str:
+    if valor is None:
+        return '?'
+    for unidad in ('B', 'KB', 'MB', 'GB'):
+        if valor < 1024 or unidad == 'GB':
+            return f'{valor:.0f} {unidad}' if unidad == 'B' else f'{valor:.1f} {unidad}'
+        valor /= 1024
+
+
+class Command(BaseCommand):
+    help = 'Borra por lotes los datos que pasaron su retención (ver RETENCION en settings).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('politicas', nargs='*', help='Políticas a aplicar (por defecto, todas las activas).')
+        parser.add_argument('--simular', action='store_true', help='Solo reportar filas y espacio que se liberarían.')
+        parser.add_argument('--lote', type=int, help='Filas por transacción (RETENCION_LOTE).')
+        parser.add_argument('--pausa', type=float, help='Segundos entre lotes (RETENCION_PAUSA).')
+        parser.add_argument('--maximo', type=int, help='Tope de filas por política y base en esta corrida.')
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help='Correr VACUUM al terminar (en SQLite reescribe el archivo y bloquea la base).',
+        )
+        parser.add_argument('--seguir', action='store_true', help='Volver a podar cada --intervalo segundos.')
+        parser.add_argument('--intervalo', type=float, default=24 * 60 * 60)
+
+    def handle(self, *args, **options):
+        desconocidas = [n for n in options['politicas'] if n not in retencion.POLITICAS]
+        if desconocidas:
+            raise CommandError(f'Políticas desconocidas: {", ".join(desconocidas)}')
+        if options['simular']:
+            for r in retencion.simular(options['politicas']):
+                archivos = f' + {_tamano(r.bytes_archivos)} en archivos' if r.bytes_archivos is not None else ''
+                self.stdout.write(f'{r.politica:<20} {r.base:<10} {r.filas:>8} filas  ~{_tamano(r.bytes)}{archivos}')
+            return
+        while True:
+            self._podar(options)
+            if not options['seguir']:
+                break
+            time.sleep(options['intervalo'])
+
+    def _podar(self, options):
+        resultados = retencion.podar(
+            options['politicas'], lote=options['lote'], pausa=options['pausa'],
+            maximo=options['maximo'], vacuum=options['vacuum'],
+        )
+        for r in resultados:
+            if r.filas:
+                self.stdout.write(f'{r.politica:<20} {r.base:<10} {r.filas:>8} filas borradas')
+        self.stdout.write(f'{sum(r.filas for r in resultados)} filas borradas en total')
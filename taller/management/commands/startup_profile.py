@@ -0,0 +1,86 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Se ejecuta en un proceso nuevo: en este los módulos ya están importados.
+SCRIPT = '''
+import json, sys, time
+inicio = time.perf_counter()
+import django
+django.setup()
+fases = {'django.setup': time.perf_counter() - inicio}
+inicio = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+fases['urls'] = time.perf_counter() - inicio
+if CALENTAR:
+    from taller.arranque import calentar
+    fases.update({'calentar.' + k: v for k, v in calentar().items()})
+print(json.dumps(fases))
+'''
+
+LINEA = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def leer_importtime(salida: str) -> dict:
+    """``{modulo: (propio_us, acumulado_us)}`` a partir de la salida de ``-X importtime``."""
+    modulos = {}
+    for linea in salida.splitlines():
+        coincidencia = LINEA.match(linea)
+        if coincidencia:
+            propio, acumulado, _, modulo = coincidencia.groups()
+            modulos[modulo] = (int(propio), int(acumulado))
+    return modulos
+
+
+class Command(BaseCommand):
+    help = 'Mide el arranque: tiempo de importación por módulo y de cada fase de inicio.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=25, help='Módulos a mostrar.')
+        parser.add_argument('--prefijo', default='', help='Solo módulos que empiezan con este prefijo (p. ej. taller).')
+        parser.add_argument(
+            '--nivel', type=int, default=0,
+            help='Agrupar por los primeros N componentes del nombre (p. ej. 3: django.contrib.admin).',
+        )
+        parser.add_argument('--calentar', action='store_true', help='Incluir taller.arranque.calentar() (usa la base de datos).')
+
+    def handle(self, *args, **options):
+        entorno = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        script = SCRIPT.replace('CALENTAR', str(options['calentar']))
+        proceso = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            capture_output=True, text=True, env=entorno, cwd=settings.BASE_DIR,
+        )
+        if proceso.returncode != 0:
+            raise CommandError(proceso.stderr[-2000:])
+        fases = json.loads(proceso.stdout.strip().splitlines()[-1])
+        modulos = leer_importtime(proceso.stderr)
+
+        self.stdout.write('Fases:')
+        for fase, segundos in fases.items():
+            self.stdout.write(f'  {fase:<24} {segundos * 1000:9.1f} ms')
+
+        if options['nivel']:
+            # Agrupado, el tiempo acumulado contaría varias veces los anidados: se suma el propio.
+            grupos = defaultdict(int)
+            for modulo, (propio, _) in modulos.items():
+                grupos['.'.join(modulo.split('.')[:options['nivel']])] += propio
+            filas = [(nombre, propio, propio) for nombre, propio in grupos.items()]
+        else:
+            filas = [(modulo, propio, acumulado) for modulo, (propio, acumulado) in modulos.items()]
+        filas = [f for f in filas if f[0].startswith(options['prefijo'])]
+        filas.sort(key=lambda f: f[2], reverse=True)
+
+        total = sum(propio for propio, _ in modulos.values())
+        self.stdout.write(f'\nImportaciones: {len(modulos)} módulos, {total / 1000:.1f} ms en total')
+        self.stdout.write(f'  {"módulo":<48} {"propio":>10} {"acumulado":>10}')
+        for nombre, propio, acumulado in filas[:options['limite']]:
+            self.stdout.write(f'  {nombre:<48} {propio / 1000:8.1f}ms {acumulado / 1000:8.1f}ms')
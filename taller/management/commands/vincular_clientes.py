@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from taller.clientes import fusionar_clientes, vincular_cita, vincular_orden
+from taller.models import Cita, Cliente, OrdenServicio
+
+
+class _Simulacion(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Crea Cliente/Vehiculo para órdenes y citas existentes y fusiona clientes duplicados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true', help='Revincular también las que ya tienen cliente.')
+        parser.add_argument('--dry-run', action='store_true', help='Reportar sin guardar cambios.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._ejecutar(options['todas'])
+                if options['dry_run']:
+                    raise _Simulacion
+        except _Simulacion:
+            self.stdout.write('Simulación: no se guardó ningún cambio.')
+
+    def _ejecutar(self, todas: bool):
+        ordenes = OrdenServicio.objects.order_by('creado_en')
+        citas = Cita.objects.order_by('creado_en')
+        if not todas:
+            ordenes = ordenes.filter(cliente__isnull=True)
+            citas = citas.filter(cliente__isnull=True)
+
+        total_ordenes = 0
+        for orden in ordenes.iterator(chunk_size=500):
+            vincular_orden(orden)
+            total_ordenes += 1
+        total_citas = 0
+        for cita in citas.iterator(chunk_size=500):
+            vincular_cita(cita)
+            total_citas += 1
+
+        fusionados = 0
+        for campo in ('telefono', 'email'):
+            repetidos = (
+                Cliente.objects.exclude(**{campo: ''})
+                .values(campo).annotate(n=Count('id')).filter(n__gt=1).values_list(campo, flat=True)
+            )
+            for valor in list(repetidos):
+                grupo = list(Cliente.objects.filter(**{campo: valor}).order_by('creado_en', 'pk'))
+                fusionados += fusionar_clientes(grupo[0], grupo[1:])
+
+        self.stdout.write(
+            f'Órdenes vinculadas: {total_ordenes}. Citas vinculadas: {total_citas}. '
+            f'Clientes fusionados: {fusionados}. Clientes totales: {Cliente.objects.count()}.'
+        )
@@ -0,0 +1,49 @@
+"""Contadores en memoria del proceso, exportados en formato de texto de Prometheus.
+
+Cada worker lleva sus propios contadores; el recolector debe sumar por
+instancia (la etiqueta ``pid`` distingue a los workers).
+"""
+import os
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_contadores: dict = defaultdict(int)
+_ayuda: dict = {}
+
+
+def describir(nombre: str, ayuda: str) -> None:
+    _ayuda[nombre] = ayuda
+
+
+def incrementar(nombre: str, valor: int = 1, **etiquetas) -> None:
+    clave = (nombre, tuple(sorted(etiquetas.items())))
+    with _lock:
+        _contadores[clave] += valor
+
+
+def valor(nombre: str, **etiquetas) -> int:
+    return _contadores.get((nombre, tuple(sorted(etiquetas.items()))), 0)
+
+
+def reiniciar() -> None:
+    with _lock:
+        _contadores.clear()
+
+
+def exportar() -> str:
+    """Retorna los contadores en formato de exposición de Prometheus."""
+    pid = str(os.getpid())
+    with _lock:
+        items = sorted(_contadores.items())
+    lineas = []
+    vistos = set()
+    for (nombre, etiquetas), total in items:
+        if nombre not in vistos:
+            vistos.add(nombre)
+            if nombre in _ayuda:
+                lineas.append(f'# HELP {nombre} {_ayuda[nombre]}')
+            lineas.append(f'# TYPE {nombre} counter')
+        pares = ','.join(f'{k}="{v}"' for k, v in etiquetas + (('pid', pid),))
+        lineas.append(f'{nombre}{{{pares}}} {total}')
+    return '\n'.join(lineas) + '\n'
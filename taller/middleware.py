@@ -0,0 +1,162 @@
+import math
+import random
+import re
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpRequest, HttpResponse
+
+from . import metricas, sucursales
+from .limites import CubetaTokens
+from .perfilador import Perfil
+
+
+metricas.describir('wraplab_seguimiento_solicitudes_total', 'Solicitudes a rutas públicas de seguimiento.')
+metricas.describir('wraplab_seguimiento_limitadas_total', 'Solicitudes de seguimiento rechazadas con 429.')
+
+
+class LimiteSeguimientoMiddleware:
+    """Rechaza con 429 el exceso de solicitudes a las rutas públicas de seguimiento.
+
+    Aplica dos cubetas de tokens: una por IP y otra por prefijo de folio, para
+    frenar tanto a un cliente insistente como a un barrido repartido en muchas
+    IPs. Se ejecuta antes de resolver la URL, así que una solicitud rechazada no
+    toca la base de datos ni renderiza plantillas.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        alias = getattr(settings, 'LIMITE_CACHE', 'default')
+        self.rutas = [re.compile(r) for r in getattr(settings, 'LIMITE_RUTAS', [r'^/seguimiento/(?:(?P<folio>[^/]+)/)?$'])]
+        self.largo_prefijo = getattr(settings, 'LIMITE_PREFIJO_FOLIO', 2)
+        self.proxies = getattr(settings, 'LIMITE_PROXIES_CONFIABLES', 0)
+        capacidad, tasa = getattr(settings, 'LIMITE_POR_IP', (30, 0.5))
+        self.por_ip = CubetaTokens(alias, 'limite:ip', capacidad, tasa)
+        capacidad, tasa = getattr(settings, 'LIMITE_POR_PREFIJO', (120, 2))
+        self.por_prefijo = CubetaTokens(alias, 'limite:prefijo', capacidad, tasa)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        folio = self._folio(request)
+        if folio is None:
+            return self.get_response(request)
+
+        metricas.incrementar('wraplab_seguimiento_solicitudes_total')
+        espera = self.por_ip.consumir(self._ip(request))
+        motivo = 'ip'
+        if not espera and folio:
+            espera = self.por_prefijo.consumir(folio[:self.largo_prefijo].upper())
+            motivo = 'prefijo'
+        if espera:
+            metricas.incrementar('wraplab_seguimiento_limitadas_total', motivo=motivo)
+            response = HttpResponse(
+                'Demasiadas solicitudes. Intenta de nuevo en unos segundos.',
+                status=429,
+                content_type='text/plain; charset=utf-8',
+            )
+            response['Retry-After'] = str(math.ceil(espera))
+            return response
+        return self.get_response(request)
+
+    def _folio(self, request: HttpRequest):
+        """Retorna el folio solicitado ('' si no trae), o ``None`` si la ruta no aplica."""
+        for ruta in self.rutas:
+            match = ruta.match(request.path_info)
+            if match:
+                return match.groupdict().get('folio') or request.GET.get('folio', '').strip()
+        return None
+
+    def _ip(self, request: HttpRequest) -> str:
+        if self.proxies:
+            saltos = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+            if len(saltos) >= self.proxies:
+                return saltos[-self.proxies]
+        return request.META.get('REMOTE_ADDR', '')
+
+
+class RenovarSesionMiddleware:
+    """Renueva la expiración de la sesión a lo más cada ``SESION_RENOVAR_CADA`` segundos.
+
+    Con ``SESSION_SAVE_EVERY_REQUEST = False`` la sesión solo se escribe si
+    cambia, pero entonces su expiración queda fija desde el login. Este
+    middleware la marca como modificada de vez en cuando para que una sesión
+    en uso no expire, sin escribir en cada solicitud. Va después de
+    ``SessionMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cada = getattr(settings, 'SESION_RENOVAR_CADA', 3600)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        response = self.get_response(request)
+        sesion = getattr(request, 'session', None)
+        if self.cada and sesion is not None and not sesion.is_empty() and not sesion.modified:
+            ahora = int(time.time())
+            if ahora - sesion.get('_renovada_en', 0) >= self.cada:
+                sesion['_renovada_en'] = ahora
+        return response
+
+
+class SucursalMiddleware:
+    """Activa la sucursal del usuario autenticado mientras se atiende la solicitud.
+
+    La sucursal elegida se guarda en la sesión (ver ``views.cambiar_sucursal``);
+    sin elección se usa la principal. Queda en ``request.sucursal`` y en
+    ``sucursales.activa()``. Las solicitudes anónimas no activan ninguna: en el
+    seguimiento público el folio indica dónde buscar. Va después de
+    ``AuthenticationMiddleware``.
+    """
+
+    CLAVE_SESION = 'sucursal'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        request.sucursal = None
+        if not request.user.is_authenticated:
+            return self.get_response(request)
+        elegida = sucursales.por_pk(request.session.get(self.CLAVE_SESION))
+        request.sucursal = elegida if elegida is not None and elegida.activa else sucursales.principal()
+        with sucursales.activar(request.sucursal):
+            return self.get_response(request)
+
+
+class PerfiladorMiddleware:
+    """Perfila por muestreo 1 de cada ``PERFILADOR_MUESTREO`` solicitudes.
+
+    Un usuario staff también puede pedirlo con el encabezado
+    ``PERFILADOR_ENCABEZADO``; la respuesta trae el nombre del perfil en
+    ``X-Perfil``. Desactivado (``PERFILADOR_ACTIVO = False``) Django lo quita de
+    la cadena y no cuesta nada. Va después de ``AuthenticationMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFILADOR_ACTIVO', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.muestreo = getattr(settings, 'PERFILADOR_MUESTREO', 100)
+        self.encabezado = getattr(settings, 'PERFILADOR_ENCABEZADO', 'X-Perfilar')
+        self.intervalo = getattr(settings, 'PERFILADOR_INTERVALO', 0.005)
+        self.directorio = getattr(settings, 'PERFILADOR_DIR', None) or f'{tempfile.gettempdir()}/wraplab-perfiles'
+        self.maximo = getattr(settings, 'PERFILADOR_MAXIMO', 200)
+
+    def _perfilar(self, request: HttpRequest) -> bool:
+        if self.muestreo and random.randrange(self.muestreo) == 0:
+            return True
+        return bool(request.headers.get(self.encabezado)) and request.user.is_staff
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not self._perfilar(request):
+            return self.get_response(request)
+        with Perfil(self.intervalo) as perfil:
+            response = self.get_response(request)
+        nombre = perfil.guardar(
+            self.directorio, self.maximo,
+            metodo=request.method, ruta=request.path, estatus=response.status_code,
+        )
+        if request.headers.get(self.encabezado):
+            response['X-Perfil'] = nombre
+        return response
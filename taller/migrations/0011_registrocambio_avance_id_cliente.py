@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0010_alter_fotoorden_options_fotoorden_numero'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroCambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('orden', 'Orden'), ('avance', 'Avance'), ('foto', 'Foto')], max_length=10)),
+                ('objeto_id', models.BigIntegerField()),
+                ('operacion', models.CharField(choices=[('guardado', 'Guardado'), ('eliminado', 'Eliminado')], max_length=10)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='avance',
+            name='id_cliente',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
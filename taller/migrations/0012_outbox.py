@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0011_registrocambio_avance_id_cliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CursorConsumidor',
+            fields=[
+                ('nombre', models.CharField(max_length=60, primary_key=True, serialize=False)),
+                ('posicion', models.BigIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='registrocambio',
+            name='datos',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='registrocambio',
+            name='tipo',
+            field=models.CharField(blank=True, help_text='Ej. orden.creado, orden.estatus, avance.eliminado', max_length=40),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations, models
+
+
+# Copia fija del orden de bits: la migración no debe depender del código actual.
+TESTIGOS = [
+    'check_engine', 'abs', 'airbag', 'battery', 'oil', 'brake',
+    'temp', 'tire', 'stability', 'bulb', 'gas', 'service',
+]
+
+
+def lista_a_bits(apps, schema_editor):
+    ordenes = apps.get_model('taller', 'OrdenServicio').objects.using(schema_editor.connection.alias)
+    for orden in ordenes.only('pk', 'testigos').iterator():
+        bits = 0
+        for code in orden.testigos or []:
+            if code in TESTIGOS:
+                bits |= 1 << TESTIGOS.index(code)
+        if bits:
+            ordenes.filter(pk=orden.pk).update(testigos_bits=bits)
+
+
+def bits_a_lista(apps, schema_editor):
+    ordenes = apps.get_model('taller', 'OrdenServicio').objects.using(schema_editor.connection.alias)
+    for orden in ordenes.exclude(testigos_bits=0).only('pk', 'testigos_bits').iterator():
+        testigos = [code for i, code in enumerate(TESTIGOS) if orden.testigos_bits & (1 << i)]
+        ordenes.filter(pk=orden.pk).update(testigos=testigos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0012_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordenservicio',
+            name='testigos_bits',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(lista_a_bits, bits_a_lista),
+        migrations.RemoveField(
+            model_name='ordenservicio',
+            name='testigos',
+        ),
+    ]
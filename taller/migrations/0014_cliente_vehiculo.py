@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0013_ordenservicio_testigos_bits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=200)),
+                ('clave_nombre', models.CharField(db_index=True, editable=False, max_length=200)),
+                ('telefono', models.CharField(blank=True, db_index=True, help_text='Solo dígitos', max_length=20)),
+                ('email', models.EmailField(blank=True, db_index=True, max_length=254)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.AddField(
+            model_name='cita',
+            name='cliente',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='citas', to='taller.cliente'),
+        ),
+        migrations.AddField(
+            model_name='ordenservicio',
+            name='cliente',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ordenes', to='taller.cliente'),
+        ),
+        migrations.CreateModel(
+            name='Vehiculo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matricula', models.CharField(blank=True, max_length=20)),
+                ('matricula_normalizada', models.CharField(blank=True, db_index=True, editable=False, max_length=20)),
+                ('marca', models.CharField(max_length=80)),
+                ('modelo', models.CharField(max_length=80)),
+                ('anio', models.PositiveIntegerField(blank=True, null=True)),
+                ('color', models.CharField(blank=True, max_length=80)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vehiculos', to='taller.cliente')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ordenservicio',
+            name='vehiculo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ordenes', to='taller.vehiculo'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenservicio',
+            index=models.Index(fields=['vehiculo', '-creado_en'], name='orden_vehiculo_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenservicio',
+            index=models.Index(fields=['cliente', '-creado_en'], name='orden_cliente_creado_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='vehiculo',
+            constraint=models.UniqueConstraint(condition=models.Q(('matricula_normalizada', ''), _negated=True), fields=('matricula_normalizada',), name='vehiculo_matricula_unica'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+import unicodedata
+from collections import Counter
+
+from django.db import migrations, models
+
+
+# Copias fijas de taller.normalizacion: la migración no debe depender del código actual.
+def clave(texto):
+    texto = ''.join(c for c in unicodedata.normalize('NFKD', texto or '') if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def formatear(texto):
+    return ' '.join(
+        p.upper() if any(c.isdigit() for c in p) or len(p) <= 3 else p.title()
+        for p in (texto or '').split()
+    )
+
+
+def sembrar_catalogo(apps, schema_editor):
+    """Una entrada por marca/modelo normalizado, con la escritura más usada."""
+    OrdenServicio = apps.get_model('taller', 'OrdenServicio')
+    CatalogoVehiculo = apps.get_model('taller', 'CatalogoVehiculo')
+    alias = schema_editor.connection.alias
+    escrituras = {}
+    for marca, modelo in OrdenServicio.objects.using(alias).values_list('vehiculo_marca', 'vehiculo_modelo').iterator():
+        llave = (clave(marca), clave(modelo))
+        if llave[0] and llave[1]:
+            escrituras.setdefault(llave, Counter())[(formatear(marca), formatear(modelo))] += 1
+    marcas = Counter()
+    for (marca_clave, _), conteo in escrituras.items():
+        for (marca, _), n in conteo.items():
+            marcas[(marca_clave, marca)] += n
+    # Todas las entradas de una marca comparten su escritura más frecuente.
+    marca_canonica = {}
+    for (marca_clave, marca), _ in marcas.most_common():
+        marca_canonica.setdefault(marca_clave, marca)
+    CatalogoVehiculo.objects.using(alias).bulk_create([
+        CatalogoVehiculo(
+            marca=marca_canonica[marca_clave],
+            modelo=conteo.most_common(1)[0][0][1],
+            marca_clave=marca_clave,
+            modelo_clave=modelo_clave,
+            usos=sum(conteo.values()),
+        )
+        for (marca_clave, modelo_clave), conteo in escrituras.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0014_cliente_vehiculo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogoVehiculo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marca', models.CharField(max_length=80)),
+                ('modelo', models.CharField(max_length=80)),
+                ('marca_clave', models.CharField(editable=False, max_length=80)),
+                ('modelo_clave', models.CharField(editable=False, max_length=80)),
+                ('usos', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'modelo de vehículo',
+                'verbose_name_plural': 'catálogo de vehículos',
+                'ordering': ['marca', 'modelo'],
+                'constraints': [models.UniqueConstraint(fields=('marca_clave', 'modelo_clave'), name='catalogo_marca_modelo_unico')],
+            },
+        ),
+        migrations.RunPython(sembrar_catalogo, migrations.RunPython.noop),
+    ]
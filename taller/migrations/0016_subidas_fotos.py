@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:00
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0015_catalogovehiculo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoFoto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('ruta', models.CharField(max_length=255)),
+                ('tamano', models.PositiveBigIntegerField()),
+                ('tipo', models.CharField(max_length=100)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='fotoorden',
+            name='archivo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fotos', to='taller.archivofoto'),
+        ),
+        migrations.CreateModel(
+            name='SubidaFoto',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('numero', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('tipo', models.CharField(max_length=100)),
+                ('tamano', models.PositiveBigIntegerField()),
+                ('sha256', models.CharField(blank=True, help_text='Hash declarado por el cliente', max_length=64)),
+                ('recibido', models.PositiveBigIntegerField(default=0)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('COMPLETA', 'Completa'), ('DESCARTADA', 'Descartada')], default='PENDIENTE', max_length=12)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('expira_en', models.DateTimeField(db_index=True)),
+                ('archivo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='taller.archivofoto')),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subidas', to='taller.ordenservicio')),
+            ],
+        ),
+    ]
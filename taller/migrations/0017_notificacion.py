@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0016_subidas_fotos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('canal', models.CharField(max_length=20)),
+                ('destino', models.CharField(max_length=200)),
+                ('estatus', models.CharField(choices=[('EN_RECEPCION', 'En Recepción'), ('EN_PREPARACION', 'En Preparación'), ('EN_PROCESO', 'En Proceso'), ('PREPARANDO_ENTREGA', 'Preparando Entrega'), ('TRABAJO_TERMINADO', 'Trabajo Terminado')], max_length=30)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIADA', 'Enviada'), ('FALLIDA', 'Fallida')], default='PENDIENTE', max_length=10)),
+                ('enviar_despues', models.DateTimeField()),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('enviado_en', models.DateTimeField(blank=True, null=True)),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones', to='taller.ordenservicio')),
+            ],
+            options={
+                'verbose_name_plural': 'notificaciones',
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['estado', 'enviar_despues'], name='notificacion_pendiente_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('estado', 'PENDIENTE')), fields=('orden', 'canal'), name='notificacion_pendiente_unica')],
+            },
+        ),
+    ]
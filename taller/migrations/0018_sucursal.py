@@ -0,0 +1,82 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def asignar_principal(apps, schema_editor):
+    """Crea la sucursal principal y le asigna todo lo existente."""
+    alias = schema_editor.connection.alias
+    Sucursal = apps.get_model('taller', 'Sucursal')
+    clave = getattr(settings, 'SUCURSAL_PRINCIPAL', 'matriz')
+    principal, _ = Sucursal.objects.using(alias).get_or_create(clave=clave, defaults={'nombre': clave.title()})
+    for nombre in ('OrdenServicio', 'Cita'):
+        apps.get_model('taller', nombre).objects.using(alias).update(sucursal=principal)
+    OrdenServicio = apps.get_model('taller', 'OrdenServicio')
+    for nombre in ('Avance', 'FotoOrden'):
+        modelo = apps.get_model('taller', nombre)
+        modelo.objects.using(alias).update(
+            sucursal_id=models.Subquery(
+                OrdenServicio.objects.using(alias).filter(pk=models.OuterRef('orden_id')).values('sucursal_id')[:1]
+            ),
+        )
+
+
+def _sucursal(related_name, null):
+    return models.ForeignKey(
+        db_index=False, editable=False, null=null, on_delete=django.db.models.deletion.PROTECT,
+        related_name=related_name, to='taller.sucursal',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0017_notificacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sucursal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.SlugField(max_length=30, unique=True)),
+                ('nombre', models.CharField(max_length=100)),
+                ('base_datos', models.CharField(default='default', help_text='Alias en DATABASES donde viven sus datos (requiere taller.routers.SucursalRouter).', max_length=50)),
+                ('prefijo_folio', models.CharField(blank=True, help_text='Inicio de sus folios; obligatorio si sus datos están en otra base.', max_length=2)),
+                ('activa', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name_plural': 'sucursales',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.AddField(model_name='ordenservicio', name='sucursal', field=_sucursal('ordenes', True)),
+        migrations.AddField(model_name='avance', name='sucursal', field=_sucursal('+', True)),
+        migrations.AddField(model_name='fotoorden', name='sucursal', field=_sucursal('+', True)),
+        migrations.AddField(model_name='cita', name='sucursal', field=_sucursal('citas', True)),
+        migrations.RunPython(asignar_principal, migrations.RunPython.noop),
+        migrations.AlterField(model_name='ordenservicio', name='sucursal', field=_sucursal('ordenes', False)),
+        migrations.AlterField(model_name='avance', name='sucursal', field=_sucursal('+', False)),
+        migrations.AlterField(model_name='fotoorden', name='sucursal', field=_sucursal('+', False)),
+        migrations.AlterField(model_name='cita', name='sucursal', field=_sucursal('citas', False)),
+        migrations.AddIndex(
+            model_name='ordenservicio',
+            index=models.Index(fields=['sucursal', 'estatus', '-actualizado_en'], name='orden_suc_estatus_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenservicio',
+            index=models.Index(fields=['sucursal', '-actualizado_en'], name='orden_suc_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='avance',
+            index=models.Index(fields=['sucursal', '-creado_en'], name='avance_suc_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fotoorden',
+            index=models.Index(fields=['sucursal', '-creado_en'], name='foto_suc_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['sucursal', 'completada', 'fecha'], name='cita_suc_pendiente_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0018_sucursal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Documento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('orden', 'Orden de trabajo'), ('recibo', 'Recibo')], max_length=10)),
+                ('formato', models.CharField(choices=[('html', 'HTML'), ('pdf', 'PDF')], max_length=4)),
+                ('huella', models.CharField(max_length=64)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('LISTO', 'Listo'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=10)),
+                ('ruta', models.CharField(blank=True, max_length=255)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('intentar_despues', models.DateTimeField(default=django.utils.timezone.now)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('generado_en', models.DateTimeField(blank=True, null=True)),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='documentos', to='taller.ordenservicio')),
+            ],
+            options={
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['estado', 'intentar_despues'], name='documento_pendiente_idx')],
+                'constraints': [models.UniqueConstraint(fields=('orden', 'tipo', 'formato', 'huella'), name='documento_huella_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0019_documento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cursorconsumidor',
+            name='huecos',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def desde_creado_en(apps, schema_editor):
+    documentos = apps.get_model('taller', 'Documento').objects.using(schema_editor.connection.alias)
+    documentos.update(solicitado_en=models.F('creado_en'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0020_cursorconsumidor_huecos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='solicitado_en',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(desde_creado_en, migrations.RunPython.noop),
+    ]
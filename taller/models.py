@@ -1,8 +1,231 @@
-from django.db import models
+import re
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, models, router, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.utils.crypto import get_random_string
 
+from .normalizacion import clave_nombre, normalizar_email, normalizar_matricula, normalizar_telefono
+
+
+TESTIGOS_CHOICES = [
+    ('check_engine', 'Check Engine'),
+    ('abs', 'ABS'),
+    ('airbag', 'Bolsa de Aire'),
+    ('battery', 'Batería'),
+    ('oil', 'Aceite'),
+    ('brake', 'Frenos'),
+    ('temp', 'Temperatura'),
+    ('tire', 'Presión de Llantas'),
+    ('stability', 'Control de Estabilidad'),
+    ('bulb', 'Foco Fundido'),
+    ('gas', 'Reserva de Gasolina'),
+    ('service', 'Servicio Programado'),
+]
+
+# Cada testigo ocupa un bit de ``OrdenServicio.testigos_bits`` según su posición
+# en TESTIGOS_CHOICES. Agregar testigos solo al final para no mover los bits.
+TESTIGO_BIT = {code: 1 << i for i, (code, _) in enumerate(TESTIGOS_CHOICES)}
+TESTIGO_LABEL = dict(TESTIGOS_CHOICES)
+_TESTIGOS_ORDENADOS = tuple((code, 1 << i) for i, (code, _) in enumerate(TESTIGOS_CHOICES))
+TESTIGOS_TODOS = (1 << len(TESTIGOS_CHOICES)) - 1
+# Con más máscaras que esto el filtro usa AND de bits: SQLite antes de 3.32 no
+# acepta más de 999 parámetros por consulta.
+_MAX_MASCARAS_IN = 512
+
+
+def bits_desde_testigos(codes) -> int:
+    """Convierte una lista de códigos en máscara; los códigos desconocidos se ignoran."""
+    bits = 0
+    for code in codes or ():
+        bits |= TESTIGO_BIT.get(code, 0)
+    return bits
+
+
+def testigos_desde_bits(bits: int) -> list:
+    return [code for code, bit in _TESTIGOS_ORDENADOS if bits & bit]
+
+
+class OrdenServicioQuerySet(models.QuerySet):
+    def con_testigos(self, codes, todos: bool = False):
+        """Órdenes con alguno (o todos, si ``todos``) de los testigos indicados.
+
+        Si caben en ``_MAX_MASCARAS_IN`` parámetros, filtra con un ``IN`` positivo
+        sobre ``testigos_bits`` con cada máscara que cumple, que la base resuelve
+        con búsquedas en su índice; si no, con un AND de bits, que recorre el
+        índice. Medido en SQLite con 50 000 órdenes (701 máscaras distintas):
+        "todos" de dos testigos 0.7 ms con ``IN`` contra 3 ms con AND; "alguno"
+        de un testigo, 3.3 ms con cualquiera de los dos. "Alguno" siempre pasa
+        del tope (al menos 2048 máscaras); "todos", solo con uno o dos testigos.
+        """
+        mascara = bits_desde_testigos(codes)
+        if not mascara:
+            return self.none() if codes else self
+        if todos:
+            candidatas = [m for m in range(TESTIGOS_TODOS + 1) if m & mascara == mascara]
+        else:
+            candidatas = [m for m in range(TESTIGOS_TODOS + 1) if m & mascara]
+        if len(candidatas) <= _MAX_MASCARAS_IN:
+            return self.filter(testigos_bits__in=candidatas)
+        qs = self.alias(testigos_comunes=F('testigos_bits').bitand(mascara))
+        return qs.filter(testigos_comunes=mascara) if todos else qs.filter(testigos_comunes__gt=0)
+
+    def sin_testigos(self):
+        return self.filter(testigos_bits=0)
+
+
+class _MutacionAtomica(models.Model):
+    """Guarda y elimina en una transacción para que el evento del outbox quede en la misma."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            return super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            return super().delete(*args, **kwargs)
 
-class OrdenServicio(models.Model):
+
+ALFABETO_FOLIO = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+
+
+class Sucursal(models.Model):
+    clave = models.SlugField(max_length=30, unique=True)
+    nombre = models.CharField(max_length=100)
+    base_datos = models.CharField(
+        max_length=50, default=DEFAULT_DB_ALIAS,
+        help_text='Alias en DATABASES donde viven sus datos (requiere taller.routers.SucursalRouter).',
+    )
+    prefijo_folio = models.CharField(
+        max_length=2, blank=True,
+        help_text='Inicio de sus folios; obligatorio si sus datos están en otra base.',
+    )
+    activa = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['nombre']
+        verbose_name_plural = 'sucursales'
+
+    def __str__(self) -> str:
+        return self.nombre
+
+    def clean(self):
+        self.prefijo_folio = self.prefijo_folio.upper()
+        if self.base_datos not in settings.DATABASES:
+            raise ValidationError({'base_datos': f'No existe la base "{self.base_datos}" en DATABASES.'})
+        if any(c not in ALFABETO_FOLIO for c in self.prefijo_folio):
+            raise ValidationError({'prefijo_folio': f'Solo caracteres de {ALFABETO_FOLIO}.'})
+        if self.base_datos != DEFAULT_DB_ALIAS and not self.prefijo_folio:
+            raise ValidationError({'prefijo_folio': 'Las sucursales con base propia necesitan prefijo de folio.'})
+        if self.prefijo_folio:
+            otras = Sucursal.objects.using(DEFAULT_DB_ALIAS).exclude(pk=self.pk).exclude(prefijo_folio='')
+            if any(p.startswith(self.prefijo_folio) or self.prefijo_folio.startswith(p)
+                   for p in otras.values_list('prefijo_folio', flat=True)):
+                raise ValidationError({'prefijo_folio': 'Se empalma con el prefijo de otra sucursal.'})
+            # Los folios ya emitidos en default no deben parecer de esta sucursal.
+            if self.base_datos != DEFAULT_DB_ALIAS and (
+                OrdenServicio.objects.using(DEFAULT_DB_ALIAS).filter(folio__startswith=self.prefijo_folio).exists()
+            ):
+                raise ValidationError({'prefijo_folio': 'Hay folios existentes que empiezan con ese prefijo.'})
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.base_datos != DEFAULT_DB_ALIAS and self._state.db == DEFAULT_DB_ALIAS:
+            # Copia en su base para las llaves foráneas de sus órdenes y citas.
+            campos = {f.attname: getattr(self, f.attname) for f in self._meta.concrete_fields if not f.primary_key}
+            Sucursal.objects.using(self.base_datos).update_or_create(pk=self.pk, defaults=campos)
+
+
+def _sucursal_por_omision():
+    from . import sucursales
+
+    return sucursales.activa() or sucursales.principal()
+
+
+class Cliente(models.Model):
+    nombre = models.CharField(max_length=200)
+    clave_nombre = models.CharField(max_length=200, db_index=True, editable=False)
+    telefono = models.CharField(max_length=20, blank=True, db_index=True, help_text='Solo dígitos')
+    email = models.EmailField(blank=True, db_index=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['nombre']
+
+    def __str__(self) -> str:
+        return self.nombre
+
+    def save(self, *args, **kwargs):
+        self.clave_nombre = clave_nombre(self.nombre)
+        self.telefono = normalizar_telefono(self.telefono)
+        self.email = normalizar_email(self.email)
+        return super().save(*args, **kwargs)
+
+
+class Vehiculo(models.Model):
+    cliente = models.ForeignKey(Cliente, on_delete=models.SET_NULL, null=True, blank=True, related_name='vehiculos')
+    matricula = models.CharField(max_length=20, blank=True)
+    matricula_normalizada = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
+    marca = models.CharField(max_length=80)
+    modelo = models.CharField(max_length=80)
+    anio = models.PositiveIntegerField(null=True, blank=True)
+    color = models.CharField(max_length=80, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['matricula_normalizada'],
+                condition=~models.Q(matricula_normalizada=''),
+                name='vehiculo_matricula_unica',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.marca} {self.modelo} {self.matricula}'.strip()
+
+    def save(self, *args, **kwargs):
+        self.matricula_normalizada = normalizar_matricula(self.matricula)
+        return super().save(*args, **kwargs)
+
+    def historial(self):
+        """Órdenes del vehículo, más recientes primero (índice vehiculo + creado_en)."""
+        return self.ordenes.order_by('-creado_en')
+
+
+class CatalogoVehiculo(models.Model):
+    """Marca y modelo con su escritura canónica; alimenta el autocompletado."""
+
+    marca = models.CharField(max_length=80)
+    modelo = models.CharField(max_length=80)
+    marca_clave = models.CharField(max_length=80, editable=False)
+    modelo_clave = models.CharField(max_length=80, editable=False)
+    usos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['marca', 'modelo']
+        constraints = [
+            models.UniqueConstraint(fields=['marca_clave', 'modelo_clave'], name='catalogo_marca_modelo_unico'),
+        ]
+        verbose_name = 'modelo de vehículo'
+        verbose_name_plural = 'catálogo de vehículos'
+
+    def __str__(self) -> str:
+        return f'{self.marca} {self.modelo}'
+
+    def save(self, *args, **kwargs):
+        self.marca_clave = clave_nombre(self.marca)
+        self.modelo_clave = clave_nombre(self.modelo)
+        return super().save(*args, **kwargs)
+
+
+class OrdenServicio(_MutacionAtomica):
     class Servicio(models.TextChoices):
         WRAP = 'WRAP', 'Wrap'
         PPF = 'PPF', 'PPF'
@@ -15,22 +238,15 @@ class OrdenServicio(models.Model):
         PREPARANDO_ENTREGA = 'PREPARANDO_ENTREGA', 'Preparando Entrega'
         TRABAJO_TERMINADO = 'TRABAJO_TERMINADO', 'Trabajo Terminado'
 
-    TESTIGOS_CHOICES = [
-        ('check_engine', 'Check Engine'),
-        ('abs', 'ABS'),
-        ('airbag', 'Bolsa de Aire'),
-        ('battery', 'Batería'),
-        ('oil', 'Aceite'),
-        ('brake', 'Frenos'),
-        ('temp', 'Temperatura'),
-        ('tire', 'Presión de Llantas'),
-        ('stability', 'Control de Estabilidad'),
-        ('bulb', 'Foco Fundido'),
-        ('gas', 'Reserva de Gasolina'),
-        ('service', 'Servicio Programado'),
-    ]
+    TESTIGOS_CHOICES = TESTIGOS_CHOICES
 
     folio = models.CharField(max_length=12, unique=True, blank=True, db_index=True)
+    # Sin índice propio: los índices compuestos empiezan con sucursal.
+    sucursal = models.ForeignKey(
+        Sucursal, on_delete=models.PROTECT, related_name='ordenes', db_index=False, editable=False,
+    )
+    cliente = models.ForeignKey(Cliente, on_delete=models.SET_NULL, null=True, blank=True, related_name='ordenes')
+    vehiculo = models.ForeignKey(Vehiculo, on_delete=models.SET_NULL, null=True, blank=True, related_name='ordenes')
     cliente_nombre = models.CharField(max_length=200)
     vehiculo_marca = models.CharField(max_length=80)
     vehiculo_modelo = models.CharField(max_length=80)
@@ -41,73 +257,192 @@ class OrdenServicio(models.Model):
     estatus = models.CharField(max_length=20, choices=Estatus.choices, default=Estatus.EN_RECEPCION)
     costo_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     monto_pagado = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    testigos = models.JSONField(default=list, blank=True)
+    testigos_bits = models.PositiveIntegerField(default=0, db_index=True)
     notas = models.TextField(blank=True)
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    objects = OrdenServicioQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vehiculo', '-creado_en'], name='orden_vehiculo_creado_idx'),
+            models.Index(fields=['cliente', '-creado_en'], name='orden_cliente_creado_idx'),
+            models.Index(fields=['sucursal', 'estatus', '-actualizado_en'], name='orden_suc_estatus_idx'),
+            models.Index(fields=['sucursal', '-actualizado_en'], name='orden_suc_actualizado_idx'),
+        ]
+
     def __str__(self) -> str:
         return f'{self.folio} - {self.vehiculo_marca} {self.vehiculo_modelo}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Estatus leído de la BD; el outbox lo usa para reportar el estatus anterior.
+        instancia._estatus_guardado = instancia.__dict__.get('estatus')
+        return instancia
+
     @property
     def saldo_pendiente(self):
         return self.costo_total - self.monto_pagado
 
+    @property
+    def indice_paso(self) -> int:
+        """Posición del estatus actual en el tracker de seguimiento."""
+        try:
+            return self.Estatus.values.index(self.estatus)
+        except ValueError:
+            return 0
+
+    @property
+    def testigos(self):
+        """Lista de códigos de testigos encendidos, en el orden de TESTIGOS_CHOICES."""
+        return testigos_desde_bits(self.testigos_bits)
+
+    @testigos.setter
+    def testigos(self, codes):
+        self.testigos_bits = bits_desde_testigos(codes)
+
     @property
     def testigos_labels(self):
         """Retorna una lista con las etiquetas de los testigos seleccionados."""
-        choices_dict = dict(self.TESTIGOS_CHOICES)
-        return [choices_dict.get(t, t) for t in self.testigos]
+        return [TESTIGO_LABEL[t] for t in self.testigos]
 
     @property
     def testigos_info(self):
         """Retorna una lista de diccionarios con código y etiqueta de los testigos."""
-        choices_dict = dict(self.TESTIGOS_CHOICES)
-        return [{'code': t, 'label': choices_dict.get(t, t)} for t in self.testigos]
+        return [{'code': t, 'label': TESTIGO_LABEL[t]} for t in self.testigos]
+
+    def registrar_avance(self, avance: 'Avance') -> 'Avance':
+        """Guarda el avance y mueve la orden a su estatus."""
+        with transaction.atomic(using=router.db_for_write(OrdenServicio, instance=self)):
+            avance.orden = self
+            avance.save()
+            self.estatus = avance.estatus
+            self.save(update_fields=['estatus', 'actualizado_en'])
+        return avance
 
     def _generar_folio_unico(self) -> str:
+        from . import sucursales
+
+        prefijo = (sucursales.por_pk(self.sucursal_id) or self.sucursal).prefijo_folio
+        # Sin prefijo propio, se evitan los de otras sucursales.
+        ajenos = () if prefijo else tuple(sucursales.prefijos())
         while True:
-            candidato = get_random_string(10, allowed_chars='ABCDEFGHJKLMNPQRSTUVWXYZ23456789')
+            candidato = prefijo + get_random_string(10 - len(prefijo), allowed_chars=ALFABETO_FOLIO)
+            if candidato.startswith(ajenos):
+                continue
             if not OrdenServicio.objects.filter(folio=candidato).exists():
                 return candidato
 
     def save(self, *args, **kwargs):
+        if self.sucursal_id is None:
+            self.sucursal = _sucursal_por_omision()
         if not self.folio:
             self.folio = self._generar_folio_unico()
         return super().save(*args, **kwargs)
 
 
-class Avance(models.Model):
+class Avance(_MutacionAtomica):
     orden = models.ForeignKey(OrdenServicio, on_delete=models.CASCADE, related_name='avances')
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.PROTECT, related_name='+', db_index=False, editable=False)
     estatus = models.CharField(max_length=20, choices=OrdenServicio.Estatus.choices)
     nota = models.TextField(blank=True)
+    id_cliente = models.UUIDField(null=True, blank=True, unique=True, editable=False)
     creado_en = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['sucursal', '-creado_en'], name='avance_suc_creado_idx'),
+        ]
 
     def __str__(self) -> str:
         return f'{self.orden.folio} - {self.estatus}'
 
+    def save(self, *args, **kwargs):
+        if self.sucursal_id is None:
+            self.sucursal_id = self.orden.sucursal_id
+        return super().save(*args, **kwargs)
+
+
+_CLOUDINARY_UPLOAD = re.compile(r'^(https://res\.cloudinary\.com/[^/]+/image/upload/)')
+
+
+class ArchivoFoto(models.Model):
+    """Contenido de una foto subida, único por hash: subir dos veces la misma imagen la reutiliza."""
 
-class FotoOrden(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)
+    ruta = models.CharField(max_length=255)
+    tamano = models.PositiveBigIntegerField()
+    tipo = models.CharField(max_length=100)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return self.ruta
+
+
+class FotoOrden(_MutacionAtomica):
     orden = models.ForeignKey(OrdenServicio, on_delete=models.CASCADE, related_name='fotos')
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.PROTECT, related_name='+', db_index=False, editable=False)
     url = models.URLField()
+    archivo = models.ForeignKey(ArchivoFoto, on_delete=models.SET_NULL, null=True, blank=True, related_name='fotos')
     numero = models.PositiveSmallIntegerField(null=True, blank=True)
     creado_en = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['numero', '-creado_en']
+        indexes = [
+            models.Index(fields=['sucursal', '-creado_en'], name='foto_suc_creado_idx'),
+        ]
 
     def __str__(self) -> str:
         return f'Foto {self.numero or "?"} - {self.orden.folio}'
 
+    def save(self, *args, **kwargs):
+        if self.sucursal_id is None:
+            self.sucursal_id = self.orden.sucursal_id
+        return super().save(*args, **kwargs)
+
+    @property
+    def miniatura(self) -> str:
+        """URL de una versión reducida; en Cloudinary se pide la transformación al vuelo."""
+        return _CLOUDINARY_UPLOAD.sub(r'\1c_fill,w_320,h_240,f_auto,q_auto/', self.url, count=1)
+
+
+class SubidaFoto(models.Model):
+    """Subida en curso autorizada por un ticket; la ``FotoOrden`` se crea solo al confirmarla."""
+
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        COMPLETA = 'COMPLETA', 'Completa'
+        DESCARTADA = 'DESCARTADA', 'Descartada'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    orden = models.ForeignKey(OrdenServicio, on_delete=models.CASCADE, related_name='subidas')
+    numero = models.PositiveSmallIntegerField(null=True, blank=True)
+    tipo = models.CharField(max_length=100)
+    tamano = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True, help_text='Hash declarado por el cliente')
+    recibido = models.PositiveBigIntegerField(default=0)
+    estado = models.CharField(max_length=12, choices=Estado.choices, default=Estado.PENDIENTE)
+    archivo = models.ForeignKey(ArchivoFoto, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    creado_en = models.DateTimeField(auto_now_add=True)
+    expira_en = models.DateTimeField(db_index=True)
+
+    def __str__(self) -> str:
+        return f'Subida {self.id} ({self.recibido}/{self.tamano})'
+
 
 class Cita(models.Model):
     class Tipo(models.TextChoices):
         SERVICIO = 'SERVICIO', 'Nuevo servicio'
         PROSPECTO = 'PROSPECTO', 'Prospecto'
 
+    sucursal = models.ForeignKey(
+        Sucursal, on_delete=models.PROTECT, related_name='citas', db_index=False, editable=False,
+    )
+    cliente = models.ForeignKey(Cliente, on_delete=models.SET_NULL, null=True, blank=True, related_name='citas')
     cliente_nombre = models.CharField(max_length=200)
     cliente_contacto = models.CharField(max_length=100, blank=True, help_text='Teléfono o email')
     fecha = models.DateTimeField()
@@ -118,6 +453,145 @@ class Cita(models.Model):
 
     class Meta:
         ordering = ['fecha']
+        indexes = [
+            models.Index(fields=['sucursal', 'completada', 'fecha'], name='cita_suc_pendiente_idx'),
+        ]
 
     def __str__(self) -> str:
         return f'{self.fecha} - {self.cliente_nombre}'
+
+    def save(self, *args, **kwargs):
+        if self.sucursal_id is None:
+            self.sucursal = _sucursal_por_omision()
+        return super().save(*args, **kwargs)
+
+
+class Notificacion(models.Model):
+    """Aviso al cliente pendiente de envío, uno por orden y canal.
+
+    Los cambios de estatus que llegan mientras sigue pendiente solo actualizan
+    ``estatus``: varios avances seguidos producen un solo mensaje.
+    """
+
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        ENVIADA = 'ENVIADA', 'Enviada'
+        FALLIDA = 'FALLIDA', 'Fallida'
+
+    orden = models.ForeignKey(OrdenServicio, on_delete=models.CASCADE, related_name='notificaciones')
+    canal = models.CharField(max_length=20)
+    destino = models.CharField(max_length=200)
+    estatus = models.CharField(max_length=30, choices=OrdenServicio.Estatus.choices)
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PENDIENTE)
+    enviar_despues = models.DateTimeField()
+    intentos = models.PositiveSmallIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    enviado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['estado', 'enviar_despues'], name='notificacion_pendiente_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['orden', 'canal'],
+                condition=models.Q(estado='PENDIENTE'),
+                name='notificacion_pendiente_unica',
+            ),
+        ]
+        verbose_name_plural = 'notificaciones'
+
+    def __str__(self) -> str:
+        return f'{self.canal} {self.destino} ({self.get_estado_display()})'
+
+
+class Documento(models.Model):
+    """Orden de trabajo o recibo imprimible, generado fuera de la solicitud.
+
+    ``huella`` es el hash del estado de la orden que se imprimió: mientras la
+    orden no cambie se reutiliza el archivo; si cambia, se genera otro.
+    """
+
+    class Tipo(models.TextChoices):
+        ORDEN = 'orden', 'Orden de trabajo'
+        RECIBO = 'recibo', 'Recibo'
+
+    class Formato(models.TextChoices):
+        HTML = 'html', 'HTML'
+        PDF = 'pdf', 'PDF'
+
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        LISTO = 'LISTO', 'Listo'
+        FALLIDO = 'FALLIDO', 'Fallido'
+
+    orden = models.ForeignKey(OrdenServicio, on_delete=models.CASCADE, related_name='documentos')
+    tipo = models.CharField(max_length=10, choices=Tipo.choices)
+    formato = models.CharField(max_length=4, choices=Formato.choices)
+    huella = models.CharField(max_length=64)
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PENDIENTE)
+    ruta = models.CharField(max_length=255, blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True)
+    intentar_despues = models.DateTimeField(default=timezone.now)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    # Última vez que fue la versión vigente; una orden que vuelve a un estado anterior reutiliza su documento.
+    solicitado_en = models.DateTimeField(default=timezone.now)
+    generado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['estado', 'intentar_despues'], name='documento_pendiente_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['orden', 'tipo', 'formato', 'huella'], name='documento_huella_unica'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.get_tipo_display()} {self.formato} {self.orden_id} ({self.get_estado_display()})'
+
+
+class RegistroCambio(models.Model):
+    """Outbox de solo anexado con cada mutación de órdenes, avances y fotos.
+
+    Se escribe en la misma transacción que la mutación (ver ``signals.py``). El
+    ``id`` creciente es el cursor de los consumidores y el token de sincronización.
+    """
+
+    class Modelo(models.TextChoices):
+        ORDEN = 'orden', 'Orden'
+        AVANCE = 'avance', 'Avance'
+        FOTO = 'foto', 'Foto'
+
+    class Operacion(models.TextChoices):
+        GUARDADO = 'guardado', 'Guardado'
+        ELIMINADO = 'eliminado', 'Eliminado'
+
+    modelo = models.CharField(max_length=10, choices=Modelo.choices)
+    objeto_id = models.BigIntegerField()
+    operacion = models.CharField(max_length=10, choices=Operacion.choices)
+    tipo = models.CharField(max_length=40, blank=True, help_text='Ej. orden.creado, orden.estatus, avance.eliminado')
+    datos = models.JSONField(default=dict, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self) -> str:
+        return f'{self.id} {self.tipo or self.operacion} {self.modelo}#{self.objeto_id}'
+
+
+class CursorConsumidor(models.Model):
+    """Último evento del outbox procesado por cada consumidor."""
+
+    nombre = models.CharField(max_length=60, primary_key=True)
+    posicion = models.BigIntegerField(default=0)
+    # Ids debajo de ``posicion`` que faltaban al leer: {id: timestamp en que se notó}.
+    huecos = models.JSONField(default=dict, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f'{self.nombre} @ {self.posicion}'
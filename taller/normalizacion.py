@@ -0,0 +1,51 @@
+"""Normalización de textos capturados a mano (nombres, placas, contactos)."""
+import re
+import unicodedata
+
+
+def sin_acentos(texto: str) -> str:
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+
+
+def clave_nombre(nombre: str) -> str:
+    """Clave de comparación: minúsculas, sin acentos y con espacios colapsados."""
+    return ' '.join(sin_acentos(nombre or '').lower().split())
+
+
+def normalizar_matricula(matricula: str) -> str:
+    return re.sub(r'[^A-Z0-9]', '', sin_acentos(matricula or '').upper())
+
+
+def normalizar_telefono(telefono: str) -> str:
+    """Solo dígitos; se conservan los últimos 10 (quita lada de país 52/521)."""
+    digitos = re.sub(r'\D', '', telefono or '')
+    return digitos[-10:]
+
+
+def normalizar_email(email: str) -> str:
+    return (email or '').strip().lower()
+
+
+def separar_contacto(contacto: str):
+    """Divide un campo libre "teléfono o email" en ``(telefono, email)`` normalizados."""
+    contacto = (contacto or '').strip()
+    email = re.search(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+', contacto)
+    if email:
+        return '', normalizar_email(email.group(0))
+    telefono = normalizar_telefono(contacto)
+    return (telefono if len(telefono) >= 7 else ''), ''
+
+
+def formatear_nombre(texto: str) -> str:
+    """Capitalización uniforme para marcas y modelos capturados a mano.
+
+    Las palabras con dígitos o de hasta 3 letras se dejan en mayúsculas
+    (``BMW``, ``CX-5``, ``911``); las demás en forma de título.
+    """
+    palabras = []
+    for palabra in (texto or '').split():
+        if any(c.isdigit() for c in palabra) or len(palabra) <= 3:
+            palabras.append(palabra.upper())
+        else:
+            palabras.append(palabra.title())
+    return ' '.join(palabras)
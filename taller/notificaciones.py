@@ -0,0 +1,200 @@
+"""Avisos al cliente cuando cambia el estatus de su orden.
+
+El camino de la solicitud no envía nada: el cambio de estatus ya queda en el
+outbox (``orden.estatus``) y el consumidor ``notificaciones`` lo convierte en
+una ``Notificacion`` pendiente por canal. Si ya había una pendiente para la
+orden y el canal, solo se actualiza su estatus; se envía cuando pasan
+``NOTIFICACIONES_VENTANA`` segundos desde el primer cambio.
+
+``python manage.py enviar_notificaciones --seguir`` toma las pendientes
+vencidas, las agrupa por canal y las envía con una sola conexión por lote.
+Un fallo se reintenta con espera exponencial hasta
+``NOTIFICACIONES_MAX_INTENTOS``.
+
+Los canales se configuran en ``NOTIFICACIONES_BACKENDS`` (canal -> clase).
+"""
+import abc
+import datetime
+import sys
+import threading
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metricas, sucursales
+from .folios import url_seguimiento
+from .models import Notificacion, OrdenServicio
+from .outbox import consumidor
+
+
+metricas.describir('wraplab_notificaciones_enviadas_total', 'Notificaciones entregadas al backend del canal.')
+metricas.describir('wraplab_notificaciones_fallidas_total', 'Intentos de envío de notificaciones que fallaron.')
+
+
+def _ajuste(nombre: str, default):
+    return getattr(settings, nombre, default)
+
+
+class Backend(abc.ABC):
+    """Interfaz de un canal. ``abrir``/``cerrar`` envuelven un lote para reutilizar la conexión."""
+
+    def abrir(self) -> None:
+        pass
+
+    def cerrar(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def enviar(self, destino: str, asunto: str, mensaje: str) -> None:
+        """Entrega un mensaje; una excepción cuenta como intento fallido."""
+
+
+class BackendCorreo(Backend):
+    """Correo por el ``EMAIL_BACKEND`` de Django; una conexión SMTP por lote."""
+
+    def abrir(self) -> None:
+        self.conexion = get_connection()
+        self.conexion.open()
+
+    def cerrar(self) -> None:
+        self.conexion.close()
+
+    def enviar(self, destino: str, asunto: str, mensaje: str) -> None:
+        EmailMessage(asunto, mensaje, to=[destino], connection=self.conexion).send()
+
+
+class BackendArchivo(Backend):
+    """Escribe los mensajes en ``NOTIFICACIONES_ARCHIVO`` (o en la consola); para desarrollo y pruebas."""
+
+    _lock = threading.Lock()
+
+    def abrir(self) -> None:
+        ruta = _ajuste('NOTIFICACIONES_ARCHIVO', None)
+        self.salida = open(ruta, 'a', encoding='utf-8') if ruta else sys.stdout
+
+    def cerrar(self) -> None:
+        if self.salida is not sys.stdout:
+            self.salida.close()
+
+    def enviar(self, destino: str, asunto: str, mensaje: str) -> None:
+        with self._lock:
+            self.salida.write(f'Para: {destino}\nAsunto: {asunto}\n\n{mensaje}\n---\n')
+            self.salida.flush()
+
+
+def backend(canal: str) -> Backend:
+    return import_string(_ajuste('NOTIFICACIONES_BACKENDS', {})[canal])()
+
+
+def destinos(cliente) -> list:
+    """``(canal, destino)`` del cliente para cada canal configurado con el dato necesario."""
+    canales = _ajuste('NOTIFICACIONES_BACKENDS', {})
+    resultado = []
+    if 'email' in canales and cliente.email:
+        resultado.append(('email', cliente.email))
+    for canal in ('sms', 'whatsapp'):
+        if canal in canales and cliente.telefono:
+            resultado.append((canal, cliente.telefono))
+    return resultado
+
+
+@consumidor('notificaciones')
+def encolar_cambios_de_estatus(eventos) -> None:
+    eventos = [e for e in eventos if e.tipo == 'orden.estatus']
+    if not eventos:
+        return
+    ordenes = OrdenServicio.objects.select_related('cliente').in_bulk({e.objeto_id for e in eventos})
+    ventana = datetime.timedelta(seconds=_ajuste('NOTIFICACIONES_VENTANA', 120))
+    for evento in eventos:
+        orden = ordenes.get(evento.objeto_id)
+        if orden is None or orden.cliente is None:
+            continue
+        for canal, destino in destinos(orden.cliente):
+            pendientes = Notificacion.objects.filter(orden=orden, canal=canal, estado=Notificacion.Estado.PENDIENTE)
+            if not pendientes.update(estatus=evento.datos['estatus'], destino=destino):
+                Notificacion.objects.create(
+                    orden=orden,
+                    canal=canal,
+                    destino=destino,
+                    estatus=evento.datos['estatus'],
+                    enviar_despues=evento.creado_en + ventana,
+                )
+
+
+def redactar(notificacion: Notificacion):
+    """``(asunto, mensaje)`` de una notificación."""
+    orden = notificacion.orden
+    contexto = {
+        'orden': orden,
+        'estatus': OrdenServicio.Estatus(notificacion.estatus).label,
+        'url': url_seguimiento(orden.folio),
+    }
+    asunto = f'{orden.vehiculo_marca} {orden.vehiculo_modelo}: {contexto["estatus"]}'
+    return asunto, render_to_string('taller/notificacion_estatus.txt', contexto).strip()
+
+
+def _reservar(limite: int) -> list:
+    """Toma las pendientes vencidas y las aparta ``NOTIFICACIONES_RESERVA`` segundos para este proceso."""
+    ahora = timezone.now()
+    with sucursales.atomica():
+        ids = list(
+            Notificacion.objects.select_for_update(skip_locked=True)
+            .filter(estado=Notificacion.Estado.PENDIENTE, enviar_despues__lte=ahora)
+            .order_by('enviar_despues')
+            .values_list('pk', flat=True)[:limite]
+        )
+        reserva = ahora + datetime.timedelta(seconds=_ajuste('NOTIFICACIONES_RESERVA', 300))
+        Notificacion.objects.filter(pk__in=ids).update(enviar_despues=reserva)
+    return list(Notificacion.objects.filter(pk__in=ids).select_related('orden').order_by('canal', 'pk'))
+
+
+def _fallo(notificacion: Notificacion, error: Exception) -> None:
+    intentos = notificacion.intentos + 1
+    espera = min(_ajuste('NOTIFICACIONES_REINTENTO_BASE', 30) * 2 ** (intentos - 1), 3600)
+    agotada = intentos >= _ajuste('NOTIFICACIONES_MAX_INTENTOS', 6)
+    Notificacion.objects.filter(pk=notificacion.pk).update(
+        intentos=intentos,
+        ultimo_error=f'{type(error).__name__}: {error}'[:1000],
+        estado=Notificacion.Estado.FALLIDA if agotada else Notificacion.Estado.PENDIENTE,
+        enviar_despues=timezone.now() + datetime.timedelta(seconds=espera),
+    )
+    metricas.incrementar('wraplab_notificaciones_fallidas_total', canal=notificacion.canal)
+
+
+def _enviada(notificacion: Notificacion) -> None:
+    actualizadas = Notificacion.objects.filter(pk=notificacion.pk, estatus=notificacion.estatus).update(
+        estado=Notificacion.Estado.ENVIADA, enviado_en=timezone.now(), ultimo_error='',
+    )
+    if not actualizadas:
+        # El estatus cambió durante el envío: queda pendiente para avisar el nuevo.
+        Notificacion.objects.filter(pk=notificacion.pk).update(enviar_despues=timezone.now())
+    metricas.incrementar('wraplab_notificaciones_enviadas_total', canal=notificacion.canal)
+
+
+def enviar_pendientes(limite: int = 100) -> int:
+    """Envía un lote de notificaciones vencidas; retorna cuántas intentó."""
+    lote = _reservar(limite)
+    for canal, grupo in groupby(lote, key=lambda n: n.canal):
+        grupo = list(grupo)
+        try:
+            conexion = backend(canal)
+            conexion.abrir()
+        except Exception as exc:
+            for notificacion in grupo:
+                _fallo(notificacion, exc)
+            continue
+        try:
+            for notificacion in grupo:
+                try:
+                    conexion.enviar(notificacion.destino, *redactar(notificacion))
+                except Exception as exc:
+                    _fallo(notificacion, exc)
+                else:
+                    _enviada(notificacion)
+        finally:
+            conexion.cerrar()
+    return len(lote)
@@ -0,0 +1,122 @@
+"""Lectura del outbox (``RegistroCambio``) por cursor.
+
+Un consumidor es una función que recibe una lista de eventos en orden de
+``id``. ``Consumidor.procesar`` la llama con los eventos nuevos y avanza su
+cursor solo si termina sin error, así que un fallo reintenta el mismo lote::
+
+    @consumidor('indice_busqueda')
+    def actualizar_indice(eventos):
+        ...
+
+``python manage.py consumir_eventos --seguir`` ejecuta los consumidores
+registrados de forma continua.
+
+El ``id`` se asigna al insertar, no al confirmar: una transacción larga (una
+fusión de clientes, un lote de ``podar``) puede confirmar un id menor después de
+que un cursor lo rebasó. Por eso cada consumidor guarda los ids faltantes debajo
+de su posición (``CursorConsumidor.huecos``) y los vuelve a buscar hasta que
+aparecen o pasan ``OUTBOX_ESPERA_HUECOS`` segundos (una transacción revertida
+deja el hueco para siempre). El token de las tabletas no guarda huecos: la
+sincronización se detiene antes del primer hueco vigente (``hasta_hueco``).
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import sucursales
+from .models import CursorConsumidor, RegistroCambio
+
+
+CONSUMIDORES: dict = {}
+
+
+def consumidor(nombre: str):
+    """Registra una función como consumidor del outbox."""
+    def decorador(funcion):
+        CONSUMIDORES[nombre] = funcion
+        return funcion
+    return decorador
+
+
+def leer(desde: int, limite: int = 500, tipos=None, huecos=()) -> list:
+    """Eventos con ``id`` mayor a ``desde`` (más los de ``huecos``), en orden."""
+    filtro = Q(id__gt=desde)
+    if huecos:
+        filtro |= Q(id__in=huecos)
+    qs = RegistroCambio.objects.filter(filtro).order_by('id')
+    if tipos:
+        qs = qs.filter(tipo__in=tipos)
+    return list(qs[:limite])
+
+
+def _espera_huecos() -> datetime.timedelta:
+    return datetime.timedelta(seconds=getattr(settings, 'OUTBOX_ESPERA_HUECOS', 600))
+
+
+def faltantes(desde: int, eventos) -> list:
+    """Ids entre ``desde`` y el último de ``eventos`` que no están en ``eventos``."""
+    if not eventos:
+        return []
+    presentes = {evento.id for evento in eventos}
+    return [i for i in range(desde + 1, eventos[-1].id) if i not in presentes]
+
+
+def hasta_hueco(desde: int, eventos) -> list:
+    """Recorta ``eventos`` antes del primer hueco que todavía puede llenarse.
+
+    Para quien solo guarda un entero (el token de las tabletas): el evento que
+    sigue al hueco se insertó después de que se reservó el id faltante, así que
+    si es más viejo que ``OUTBOX_ESPERA_HUECOS`` la transacción que lo reservó ya
+    se revirtió y el hueco no se llenará.
+    """
+    vigente = timezone.now() - _espera_huecos()
+    esperado = desde + 1
+    for i, evento in enumerate(eventos):
+        if evento.id != esperado and evento.creado_en > vigente:
+            return eventos[:i]
+        esperado = evento.id + 1
+    return eventos
+
+
+class Consumidor:
+    def __init__(self, nombre: str, funcion=None, tipos=None):
+        self.nombre = nombre
+        self.funcion = funcion or CONSUMIDORES[nombre]
+        self.tipos = tipos
+
+    def posicion(self) -> int:
+        cursor = CursorConsumidor.objects.filter(nombre=self.nombre).first()
+        return cursor.posicion if cursor else 0
+
+    def procesar(self, limite: int = 500) -> int:
+        """Procesa un lote de eventos pendientes; retorna cuántos leyó."""
+        with sucursales.atomica():
+            cursor, _ = CursorConsumidor.objects.select_for_update().get_or_create(nombre=self.nombre)
+            pendientes = cursor.huecos
+            eventos = leer(cursor.posicion, limite, huecos=[int(i) for i in pendientes])
+            ahora = timezone.now()
+            vencidos = (ahora - _espera_huecos()).timestamp()
+            leidos = {evento.id for evento in eventos}
+            huecos = {i: t for i, t in pendientes.items() if int(i) not in leidos and t > vencidos}
+            nuevos = [evento for evento in eventos if evento.id > cursor.posicion]
+            huecos.update((str(i), ahora.timestamp()) for i in faltantes(cursor.posicion, nuevos))
+            if not eventos and huecos == pendientes:
+                return 0
+            if nuevos:
+                cursor.posicion = nuevos[-1].id
+            cursor.huecos = huecos
+            if self.tipos:
+                eventos = [e for e in eventos if e.tipo in self.tipos]
+            if eventos:
+                self.funcion(eventos)
+            cursor.save(update_fields=['posicion', 'huecos', 'actualizado_en'])
+        return len(leidos)
+
+    def seguir(self, intervalo: float = 1.0, limite: int = 500, detener=None):
+        """Procesa en bucle; duerme ``intervalo`` segundos cuando no hay eventos."""
+        while not (detener and detener()):
+            if not self.procesar(limite):
+                time.sleep(intervalo)
@@ -0,0 +1,116 @@
+"""Perfilado por muestreo de solicitudes individuales.
+
+``Perfil`` arranca un hilo que cada ``intervalo`` segundos lee la pila del
+hilo de la solicitud (``sys._current_frames``) y cuenta cuántas veces aparece
+cada pila; además envuelve las consultas de todas las conexiones (la principal
+y las de sucursales) para medir cada SQL.
+Al terminar se escriben dos archivos con el mismo nombre base:
+
+* ``.folded``: pilas colapsadas (``modulo:funcion;...;modulo:funcion N``), el
+  formato que leen ``flamegraph.pl``, speedscope o inferno.
+* ``.json``: método, ruta, estatus, duración y las consultas con su tiempo.
+
+El middleware que decide qué solicitudes se perfilan está en
+``middleware.PerfiladorMiddleware``.
+"""
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.db import connections
+
+
+def _nombre_frame(frame) -> str:
+    return f'{frame.f_globals.get("__name__", "?")}:{frame.f_code.co_name}'
+
+
+def pila(frame) -> str:
+    """Pila colapsada de ``frame``, de la raíz a la hoja."""
+    nombres = []
+    while frame is not None:
+        nombres.append(_nombre_frame(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(nombres))
+
+
+class Perfil:
+    def __init__(self, intervalo: float = 0.005):
+        self.intervalo = intervalo
+        self.muestras = Counter()
+        self.consultas = []
+        self._hilo_objetivo = threading.get_ident()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, name='perfilador', daemon=True)
+        self._envolturas = None
+
+    def _muestrear(self) -> None:
+        while True:
+            frame = sys._current_frames().get(self._hilo_objetivo)
+            if frame is not None:
+                self.muestras[pila(frame)] += 1
+            if self._detener.wait(self.intervalo):
+                return
+
+    def _medir_consulta(self, base, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append({
+                'sql': sql, 'ms': round((time.perf_counter() - inicio) * 1000, 3), 'many': many, 'base': base,
+            })
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        self._envolturas = ExitStack()
+        for alias in connections:
+            self._envolturas.enter_context(
+                connections[alias].execute_wrapper(functools.partial(self._medir_consulta, alias)),
+            )
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._detener.set()
+        self._hilo.join()
+        self._envolturas.__exit__(*exc_info)
+        self.duracion = time.perf_counter() - self.inicio
+
+    def colapsado(self) -> str:
+        return ''.join(f'{p} {n}\n' for p, n in self.muestras.most_common())
+
+    def guardar(self, directorio, maximo: int, **datos) -> str:
+        """Escribe ``.folded`` y ``.json`` y conserva solo los ``maximo`` perfiles más recientes."""
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        ruta = re.sub(r'[^A-Za-z0-9]+', '_', datos.get('ruta', '')).strip('_')[:60] or 'raiz'
+        nombre = f'{time.strftime("%Y%m%d-%H%M%S")}-{time.time_ns() % 10**9:09d}-{os.getpid()}-{ruta}'
+        (directorio / f'{nombre}.folded').write_text(self.colapsado())
+        resumen = {
+            **datos,
+            'duracion_ms': round(self.duracion * 1000, 3),
+            'intervalo_ms': self.intervalo * 1000,
+            'muestras': sum(self.muestras.values()),
+            'sql_ms': round(sum(c['ms'] for c in self.consultas), 3),
+            'consultas': self.consultas,
+        }
+        (directorio / f'{nombre}.json').write_text(json.dumps(resumen, indent=1))
+        _rotar(directorio, maximo)
+        return nombre
+
+
+def _rotar(directorio: Path, maximo: int) -> None:
+    perfiles = sorted(directorio.glob('*.json'))
+    for viejo in perfiles[:max(len(perfiles) - maximo, 0)]:
+        for ruta in (viejo, viejo.with_suffix('.folded')):
+            try:
+                ruta.unlink()
+            except FileNotFoundError:
+                pass
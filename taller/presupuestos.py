@@ -0,0 +1,130 @@
+"""Presupuesto de consultas y de tiempo por vista.
+
+Una vista declara cuántas consultas SQL y cuántos milisegundos puede gastar::
+
+    @user_passes_test(_superuser_required)
+    @presupuesto(consultas=8, ms=200)
+    def dashboard(request):
+        ...
+
+El presupuesto cubre solo la vista (el decorador va debajo de los de acceso):
+el middleware y la autenticación quedan fuera. Lo que hace al excederse
+depende de ``PRESUPUESTOS_MODO``:
+
+- ``None`` (por omisión): nada; el decorador solo lee el ajuste.
+- ``'registro'``: escribe una advertencia con las consultas agrupadas por
+  huella (la SQL sin parámetros) y su número de repeticiones, que es como se
+  ve un N+1, y suma ``wraplab_presupuesto_excedido_total``.
+- ``'error'``: además lanza ``PresupuestoExcedido``. Lo activa el ejecutor de
+  pruebas (``taller.pruebas.EjecutorPresupuestos``) para toda la suite; el
+  tiempo solo se registra ahí, porque la máquina de pruebas no es la de
+  producción.
+"""
+import functools
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metricas
+
+
+logger = logging.getLogger(__name__)
+
+PRESUPUESTOS: dict = {}
+
+metricas.describir('wraplab_presupuesto_excedido_total', 'Solicitudes que excedieron el presupuesto de su vista.')
+
+
+class PresupuestoExcedido(AssertionError):
+    pass
+
+
+_LISTA = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_ESPACIOS = re.compile(r'\s+')
+
+
+def huella_sql(sql: str) -> str:
+    """La consulta sin lo que cambia entre repeticiones: ``IN (%s, %s, ...)`` se reduce a ``IN (...)``."""
+    return _ESPACIOS.sub(' ', _LISTA.sub('(...)', sql)).strip()
+
+
+class _Contador:
+    """``execute_wrapper`` que cuenta las consultas por huella."""
+
+    def __init__(self):
+        self.huellas = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.huellas[huella_sql(sql)] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def total(self) -> int:
+        return sum(self.huellas.values())
+
+
+class Presupuesto:
+    def __init__(self, nombre: str, consultas: int, ms=None):
+        self.nombre = nombre
+        self.consultas = consultas
+        self.ms = ms
+        self.maximo_consultas = 0
+        self.maximo_ms = 0.0
+
+    def revisar(self, contador: _Contador, ms: float, modo: str) -> None:
+        self.maximo_consultas = max(self.maximo_consultas, contador.total)
+        self.maximo_ms = max(self.maximo_ms, ms)
+        excede_consultas = contador.total > self.consultas
+        excede_tiempo = self.ms is not None and ms > self.ms
+        if not (excede_consultas or excede_tiempo):
+            return
+        mensaje = (
+            f'{self.nombre}: {contador.total} consultas (presupuesto {self.consultas}), '
+            f'{ms:.0f} ms (presupuesto {self.ms if self.ms is not None else "-"})\n'
+            + '\n'.join(f'  {veces}× {sql}' for sql, veces in contador.huellas.most_common(10))
+        )
+        metricas.incrementar('wraplab_presupuesto_excedido_total', vista=self.nombre)
+        logger.warning('Presupuesto excedido en %s', mensaje)
+        if modo == 'error' and excede_consultas:
+            raise PresupuestoExcedido(mensaje)
+
+
+def presupuesto(consultas: int, ms=None, nombre=None):
+    """Declara el presupuesto de una vista y lo registra en ``PRESUPUESTOS``."""
+    def decorador(vista):
+        limite = Presupuesto(nombre or f'{vista.__module__.rsplit(".", 1)[-1]}.{vista.__name__}', consultas, ms)
+        PRESUPUESTOS[limite.nombre] = limite
+
+        @functools.wraps(vista)
+        def envuelta(request, *args, **kwargs):
+            modo = getattr(settings, 'PRESUPUESTOS_MODO', None)
+            if not modo:
+                return vista(request, *args, **kwargs)
+            contador = _Contador()
+            inicio = time.perf_counter()
+            with ExitStack() as pila:
+                for alias in connections:
+                    pila.enter_context(connections[alias].execute_wrapper(contador))
+                respuesta = vista(request, *args, **kwargs)
+            limite.revisar(contador, (time.perf_counter() - inicio) * 1000, modo)
+            return respuesta
+        envuelta.presupuesto = limite
+        return envuelta
+    return decorador
+
+
+def reporte() -> str:
+    """Máximo observado contra presupuesto de cada vista que se ejecutó en este proceso."""
+    lineas = []
+    for limite in sorted(PRESUPUESTOS.values(), key=lambda p: p.nombre):
+        if limite.maximo_consultas or limite.maximo_ms:
+            lineas.append(
+                f'{limite.nombre:<28} {limite.maximo_consultas:>3}/{limite.consultas} consultas'
+                f'  {limite.maximo_ms:>6.1f}/{limite.ms if limite.ms is not None else "-"} ms'
+            )
+    return '\n'.join(lineas)
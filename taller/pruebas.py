@@ -0,0 +1,26 @@
+"""Ejecutor de pruebas con los presupuestos por vista activos (ver ``taller/presupuestos.py``).
+
+Se configura en ``TEST_RUNNER``. Durante toda la suite una vista que haga más
+consultas de las presupuestadas lanza ``PresupuestoExcedido`` y la prueba que
+la llamó falla. Al terminar reporta (``DiscoverRunner.log``) el máximo
+observado de cada vista.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+from . import presupuestos
+
+
+class EjecutorPresupuestos(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # Como DEBUG y ALLOWED_HOSTS en Django: override_settings ocultaría SETTINGS_MODULE.
+        self._modo_anterior = getattr(settings, 'PRESUPUESTOS_MODO', None)
+        settings.PRESUPUESTOS_MODO = 'error'
+
+    def teardown_test_environment(self, **kwargs):
+        settings.PRESUPUESTOS_MODO = self._modo_anterior
+        super().teardown_test_environment(**kwargs)
+        reporte = presupuestos.reporte()
+        if reporte and self.verbosity >= 1:
+            self.log(f'\nPresupuestos (máximo observado / presupuesto):\n{reporte}')
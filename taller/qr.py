@@ -0,0 +1,109 @@
+"""Códigos QR del enlace de seguimiento de cada orden.
+
+El código de un folio se genera una sola vez (con ``segno``) y se guarda en
+``QR_DIR`` con un nombre que incluye la huella de la URL codificada; si
+``SITIO_URL`` cambia, la huella cambia y se genera de nuevo.
+
+La huella también va en la URL pública (``/seguimiento/<folio>/qr-<huella>.svg``,
+ver ``url``): esa dirección nunca cambia de contenido y se sirve con caché
+pública de un año e ``immutable``. La dirección sin huella
+(``/seguimiento/<folio>/qr.svg``), y una huella que ya no es la vigente, se
+sirven con ``QR_MAX_AGE_ESTABLE`` y ETag, así que un código equivocado no se
+queda en los navegadores. La orden de trabajo impresa incrusta el SVG
+directamente.
+"""
+import hashlib
+import io
+
+import segno
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_GET
+
+from . import metricas
+from .folios import resolver_folio, url_seguimiento
+
+
+# Subir al cambiar el dibujo: cambia el nombre de todos los archivos.
+VERSION = 2
+FORMATOS = {
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+}
+MARGEN = 4  # módulos de zona silenciosa que exige el estándar
+
+metricas.describir('wraplab_qr_generados_total', 'Códigos QR generados (no servidos desde disco), por formato.')
+
+
+def _ajuste(nombre: str, default):
+    return getattr(settings, nombre, default)
+
+
+def generar(texto: str, formato: str) -> bytes:
+    """El QR de ``texto`` (corrección de errores nivel M o mejor) en ``formato``."""
+    codigo = segno.make(texto, error='m', micro=False)
+    salida = io.BytesIO()
+    if formato == 'svg':
+        # Sin tamaño fijo y con viewBox, para escalarlo con CSS.
+        codigo.save(salida, kind='svg', border=MARGEN, light='#fff', xmldecl=False, omitsize=True, nl=False)
+    else:
+        codigo.save(salida, kind='png', border=MARGEN, scale=8)
+    return salida.getvalue()
+
+
+# --- Archivos ---
+
+def _almacen() -> FileSystemStorage:
+    return FileSystemStorage(location=_ajuste('QR_DIR', settings.BASE_DIR / 'media' / 'qr'))
+
+
+def huella(folio: str) -> str:
+    """Identifica el contenido del código: cambia con la URL codificada o con ``VERSION``."""
+    return hashlib.sha256(f'{VERSION}|{url_seguimiento(folio)}'.encode()).hexdigest()[:16]
+
+
+def archivo(folio: str, formato: str):
+    """``(ruta, huella)`` del código de ``folio``, generándolo si todavía no está en disco."""
+    firma = huella(folio)
+    ruta = f'{formato}/{folio}-{firma}.{formato}'
+    almacen = _almacen()
+    if not almacen.exists(ruta):
+        almacen.save(ruta, ContentFile(generar(url_seguimiento(folio), formato)))
+        metricas.incrementar('wraplab_qr_generados_total', formato=formato)
+    return ruta, firma
+
+
+def svg_en_linea(folio: str) -> str:
+    """El SVG del folio como texto, para incrustarlo en un documento."""
+    ruta, _ = archivo(folio, 'svg')
+    with _almacen().open(ruta) as contenido:
+        return contenido.read().decode()
+
+
+def url(folio: str, formato: str) -> str:
+    """Dirección del código vigente de ``folio``, con su huella: se puede cachear para siempre."""
+    return reverse('seguimiento_qr', kwargs={'folio': folio, 'firma': huella(folio), 'formato': formato})
+
+
+@require_GET
+def codigo_qr(request: HttpRequest, folio: str, formato: str, firma: str = '') -> HttpResponse:
+    folio = folio.strip().upper()
+    if formato not in FORMATOS or resolver_folio(folio) is None:
+        raise Http404('Folio no encontrado')
+    vigente = huella(folio)
+    etag = f'"{vigente}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        ruta, _ = archivo(folio, formato)
+        response = FileResponse(_almacen().open(ruta), content_type=FORMATOS[formato])
+        response['ETag'] = etag
+    if firma == vigente:
+        # La huella cubre la URL codificada y ``VERSION``: esta dirección no cambia de contenido.
+        patch_cache_control(response, public=True, max_age=_ajuste('QR_MAX_AGE', 31536000), immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=_ajuste('QR_MAX_AGE_ESTABLE', 300))
+    return response
@@ -0,0 +1,319 @@
+"""Retención de datos: borrado por lotes de lo que ya no se usa.
+
+Cada política elige las filas de un modelo que llevan más de ``RETENCION[nombre]``
+días sin usarse (``None`` la desactiva). ``python manage.py podar`` (una vez al
+día con ``podar --seguir``, ver iniciar.sh) las aplica en lotes de
+``RETENCION_LOTE`` filas, cada lote en una transacción corta seguida de una
+pausa, así que nunca retiene bloqueos largos. El criterio no depende de estado
+guardado: si una corrida se interrumpe, la siguiente sigue donde se quedó.
+``podar --simular`` solo reporta cuántas filas y cuántos bytes aproximados se
+liberarían.
+
+Después de borrar se corre ``ANALYZE`` en las tablas tocadas (y ``VACUUM`` con
+``--vacuum``; en SQLite reescribe el archivo completo y bloquea la base).
+
+Los borrados pasan por ``QuerySet.delete()`` y sus señales: los avances y las
+fotos podados llegan al outbox como cualquier eliminación, para que una
+tableta que sincronizó la orden los quite, y se invalida la caché del
+seguimiento.
+"""
+import abc
+import datetime
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.models import Exists, OuterRef, Q, Sum
+from django.utils import timezone
+
+from . import documentos, outbox, sucursales
+from .almacenamiento import destino
+from .models import (
+    ArchivoFoto,
+    Avance,
+    CursorConsumidor,
+    Documento,
+    FotoOrden,
+    Notificacion,
+    OrdenServicio,
+    RegistroCambio,
+    SubidaFoto,
+)
+
+
+POLITICAS: dict = {}
+
+
+def _ajuste(nombre: str, default):
+    return getattr(settings, nombre, default)
+
+
+class Politica(abc.ABC):
+    """Qué filas de ``modelo`` sobran (``candidatos``) y cómo se borran."""
+
+    nombre = ''
+    modelo = None
+    solo_default = False  # modelos que no se reparten por sucursal
+
+    @abc.abstractmethod
+    def candidatos(self, filas, limite):
+        """Las filas de ``filas`` que no se usan desde antes de ``limite``."""
+
+    def dias(self):
+        return _ajuste('RETENCION', {}).get(self.nombre)
+
+    def bases(self) -> list:
+        return [DEFAULT_DB_ALIAS] if self.solo_default else sucursales.bases()
+
+    def pendientes(self, base: str):
+        """Filas que ya pasaron su retención en ``base``."""
+        limite = timezone.now() - datetime.timedelta(days=self.dias())
+        return self.candidatos(self.modelo.objects.using(base), limite).order_by('pk')
+
+    def borrar(self, filas, base: str) -> None:
+        filas.delete()
+
+    def bytes_archivos(self, filas):
+        """Bytes fuera de la base (archivos) que se liberan con ``filas``; ``None`` si no aplica."""
+        return None
+
+
+def registrar(clase):
+    POLITICAS[clase.nombre] = clase()
+    return clase
+
+
+@registrar
+class Sesiones(Politica):
+    nombre = 'sesiones'
+    modelo = Session
+    solo_default = True
+
+    def candidatos(self, filas, limite):
+        return filas.filter(expire_date__lt=limite)
+
+
+@registrar
+class FotosReemplazadas(Politica):
+    """La galería muestra la foto más reciente de cada posición; las anteriores quedaron huérfanas."""
+
+    nombre = 'fotos_reemplazadas'
+    modelo = FotoOrden
+
+    def candidatos(self, filas, limite):
+        posterior = FotoOrden.objects.filter(orden=OuterRef('orden'), numero=OuterRef('numero'), pk__gt=OuterRef('pk'))
+        return filas.filter(numero__isnull=False, creado_en__lt=limite).filter(Exists(posterior))
+
+
+@registrar
+class Avances(Politica):
+    """Historia de órdenes terminadas; se conserva el último avance de cada una."""
+
+    nombre = 'avances'
+    modelo = Avance
+
+    def candidatos(self, filas, limite):
+        posterior = Avance.objects.filter(orden=OuterRef('orden'), creado_en__gt=OuterRef('creado_en'))
+        return filas.filter(
+            orden__estatus=OrdenServicio.Estatus.TRABAJO_TERMINADO, orden__actualizado_en__lt=limite,
+        ).filter(Exists(posterior))
+
+
+@registrar
+class Subidas(Politica):
+    """Subidas cuyo ticket expiró, con lo que se haya recibido de ellas."""
+
+    nombre = 'subidas'
+    modelo = SubidaFoto
+
+    def candidatos(self, filas, limite):
+        return filas.filter(expira_en__lt=limite)
+
+    def borrar(self, filas, base):
+        almacen = destino()
+        for subida in filas.filter(estado=SubidaFoto.Estado.PENDIENTE):
+            almacen.descartar(subida)
+        filas.delete()
+
+    def bytes_archivos(self, filas):
+        return filas.filter(estado=SubidaFoto.Estado.PENDIENTE).aggregate(total=Sum('recibido'))['total'] or 0
+
+
+@registrar
+class ArchivosHuerfanos(Politica):
+    """Contenido de fotos que ya no usa ninguna foto ni subida."""
+
+    nombre = 'archivos_huerfanos'
+    modelo = ArchivoFoto
+
+    def candidatos(self, filas, limite):
+        return filas.filter(creado_en__lt=limite).exclude(
+            Exists(FotoOrden.objects.filter(archivo=OuterRef('pk'))),
+        ).exclude(
+            Exists(SubidaFoto.objects.filter(archivo=OuterRef('pk'))),
+        )
+
+    def borrar(self, filas, base):
+        rutas = list(filas.values_list('ruta', flat=True))
+        filas.delete()
+        eliminar = getattr(destino(), 'eliminar', None)
+        if eliminar is not None:
+            # Al confirmar: si la transacción se revierte, el archivo sigue haciendo falta.
+            transaction.on_commit(lambda: [eliminar(ruta) for ruta in rutas], using=base)
+
+    def bytes_archivos(self, filas):
+        return filas.aggregate(total=Sum('tamano'))['total'] or 0
+
+
+@registrar
+class Notificaciones(Politica):
+    nombre = 'notificaciones'
+    modelo = Notificacion
+
+    def candidatos(self, filas, limite):
+        return filas.filter(creado_en__lt=limite).exclude(estado=Notificacion.Estado.PENDIENTE)
+
+
+@registrar
+class Documentos(Politica):
+    """Versiones anteriores de cada documento, y los que fallaron.
+
+    La vigente es la que se pidió más recientemente (``solicitado_en``), no la
+    más nueva: si la orden vuelve a un estado anterior se reutiliza su documento.
+    """
+
+    nombre = 'documentos'
+    modelo = Documento
+
+    def candidatos(self, filas, limite):
+        posterior = Documento.objects.filter(
+            orden=OuterRef('orden'), tipo=OuterRef('tipo'), formato=OuterRef('formato'),
+            solicitado_en__gt=OuterRef('solicitado_en'),
+        )
+        return filas.filter(solicitado_en__lt=limite).filter(Exists(posterior) | Q(estado=Documento.Estado.FALLIDO))
+
+    def borrar(self, filas, base):
+        rutas = [ruta for ruta in filas.values_list('ruta', flat=True) if ruta]
+        filas.delete()
+        almacen = documentos._almacen()
+        transaction.on_commit(lambda: [almacen.delete(ruta) for ruta in rutas], using=base)
+
+
+@registrar
+class Outbox(Politica):
+    """Eventos que ya leyeron todos los consumidores registrados.
+
+    Se conserva el evento de la posición mínima; una tableta cuyo token quedó
+    antes del primer evento conservado recibe una instantánea completa en lugar
+    de un delta (ver ``sync.cambios``).
+    """
+
+    nombre = 'outbox'
+    modelo = RegistroCambio
+
+    def candidatos(self, filas, limite):
+        posiciones = {
+            nombre: min([posicion, *(int(i) - 1 for i in huecos)])
+            for nombre, posicion, huecos in CursorConsumidor.objects.using(filas.db)
+            .filter(nombre__in=outbox.CONSUMIDORES).values_list('nombre', 'posicion', 'huecos')
+        }
+        # Un consumidor sin cursor todavía no ha leído nada; tampoco lo que le falta.
+        minimo = min((posiciones.get(nombre, 0) for nombre in outbox.CONSUMIDORES), default=0)
+        return filas.filter(creado_en__lt=limite, id__lt=minimo)
+
+
+def bytes_por_fila(modelo, base: str):
+    """Tamaño promedio en disco (con índices) de una fila de ``modelo``, o ``None`` si la base no lo informa."""
+    conexion = connections[base]
+    tabla = modelo._meta.db_table
+    try:
+        with conexion.cursor() as cursor:
+            if conexion.vendor == 'postgresql':
+                cursor.execute('SELECT pg_total_relation_size(%s)', [tabla])
+            elif conexion.vendor == 'sqlite':
+                cursor.execute(
+                    'SELECT SUM(pgsize) FROM dbstat WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name = %s)',
+                    [tabla],
+                )
+            else:
+                return None
+            tamano = cursor.fetchone()[0] or 0
+    except OperationalError:
+        # SQLite compilado sin la tabla virtual dbstat.
+        return None
+    filas = modelo.objects.using(base).count()
+    return tamano / filas if filas else 0
+
+
+class Resultado:
+    def __init__(self, politica: str, base: str):
+        self.politica = politica
+        self.base = base
+        self.filas = 0
+        self.bytes = None
+        self.bytes_archivos = None
+
+
+def simular(nombres=None) -> list:
+    """Lo que borraría ``podar`` sin borrar nada: filas y bytes estimados por política y base."""
+    resultados = []
+    for politica in _elegidas(nombres):
+        for base in politica.bases():
+            resultado = Resultado(politica.nombre, base)
+            filas = politica.pendientes(base)
+            resultado.filas = filas.count()
+            promedio = bytes_por_fila(politica.modelo, base)
+            if promedio is not None:
+                resultado.bytes = round(promedio * resultado.filas)
+            resultado.bytes_archivos = politica.bytes_archivos(filas)
+            resultados.append(resultado)
+    return resultados
+
+
+def podar(nombres=None, lote=None, pausa=None, maximo=None, vacuum=False) -> list:
+    """Aplica las políticas en lotes; retorna un ``Resultado`` por política y base."""
+    lote = lote or _ajuste('RETENCION_LOTE', 500)
+    pausa = _ajuste('RETENCION_PAUSA', 0.1) if pausa is None else pausa
+    resultados = []
+    tocadas = {}
+    for politica in _elegidas(nombres):
+        for base in politica.bases():
+            resultado = Resultado(politica.nombre, base)
+            while maximo is None or resultado.filas < maximo:
+                tamano = lote if maximo is None else min(lote, maximo - resultado.filas)
+                with transaction.atomic(using=base):
+                    ids = list(politica.pendientes(base).values_list('pk', flat=True)[:tamano])
+                    if ids:
+                        politica.borrar(politica.modelo.objects.using(base).filter(pk__in=ids), base)
+                resultado.filas += len(ids)
+                if len(ids) < tamano:
+                    break
+                time.sleep(pausa)
+            if resultado.filas:
+                tocadas.setdefault(base, set()).add(politica.modelo._meta.db_table)
+            resultados.append(resultado)
+    for base, tablas in tocadas.items():
+        mantenimiento(base, sorted(tablas), vacuum)
+    return resultados
+
+
+def mantenimiento(base: str, tablas: list, vacuum: bool = False) -> None:
+    """Actualiza estadísticas del planificador y, con ``vacuum``, devuelve el espacio libre."""
+    conexion = connections[base]
+    with conexion.cursor() as cursor:
+        for tabla in tablas:
+            nombre = conexion.ops.quote_name(tabla)
+            if vacuum and conexion.vendor == 'postgresql':
+                cursor.execute(f'VACUUM (ANALYZE) {nombre}')
+            else:
+                cursor.execute(f'ANALYZE {nombre}')
+        if vacuum and conexion.vendor == 'sqlite':
+            cursor.execute('VACUUM')
+
+
+def _elegidas(nombres) -> list:
+    return [
+        p for nombre, p in POLITICAS.items()
+        if (not nombres or nombre in nombres) and p.dias() is not None
+    ]
@@ -0,0 +1,40 @@
+"""Enrutamiento opcional de los datos de cada sucursal a su propia base.
+
+Se activa agregando ``taller.routers.SucursalRouter`` a ``DATABASE_ROUTERS``.
+Todas las bases tienen el esquema completo (``migrate --database=<alias>``);
+``Sucursal`` y ``CatalogoVehiculo`` se leen y escriben siempre en ``default``
+(cada sucursal se copia a su base para que sus llaves foráneas sean válidas).
+"""
+from django.db import DEFAULT_DB_ALIAS
+
+from . import sucursales
+
+
+GLOBALES = {'sucursal', 'catalogovehiculo'}
+
+
+def _global(model) -> bool:
+    return model._meta.model_name in GLOBALES
+
+
+class SucursalRouter:
+    def _base(self, model, **hints):
+        if model._meta.app_label != 'taller':
+            return None
+        if _global(model):
+            return DEFAULT_DB_ALIAS
+        instancia = hints.get('instance')
+        if instancia is not None:
+            if type(instancia)._meta.model_name == 'sucursal':
+                return instancia.base_datos  # p. ej. sucursal.ordenes.all()
+            if instancia._state.db:
+                return instancia._state.db
+        return sucursales.base_activa()
+
+    db_for_read = _base
+    db_for_write = _base
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if _global(type(obj1)) or _global(type(obj2)):
+            return True
+        return None
@@ -0,0 +1,133 @@
+"""Sondas de vida y de disponibilidad para el balanceador.
+
+``/healthz`` solo confirma que el proceso atiende solicitudes: no toca la base
+de datos ni la caché, para que una falla externa no haga reiniciar workers
+sanos. ``/readyz`` responde 200 solo si el worker ya abrió su conexión a la
+base principal (``arranque.preparar_worker``; si falló al arrancar, la sonda
+lo reintenta), esa base responde, no le quedan migraciones pendientes y la
+caché ``default`` guarda y devuelve un valor; si no, 503 con el detalle de
+cada revisión. Render la usa como único ``healthCheckPath`` y no manda tráfico
+a la instancia nueva hasta que pasa.
+
+Las bases de las sucursales y las demás cachés se revisan igual, pero solo se
+reportan en ``informativas``: como la sonda de Render marca o desmarca todas
+las instancias a la vez, que una sucursal caída bloqueara ``/readyz`` dejaría
+sin servicio también al resto. Sus fallas se ven en el registro y en la
+respuesta.
+"""
+import logging
+import os
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpRequest, JsonResponse
+from django.utils.crypto import get_random_string
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+
+from . import arranque
+
+
+logger = logging.getLogger(__name__)
+
+# Bases ya vistas sin migraciones pendientes; no se vuelven a revisar en este proceso.
+_migradas = set()
+
+
+def _revisar_worker() -> None:
+    if not arranque.listo():
+        # Fuera de gunicorn (runserver) nadie llamó a preparar_worker, o falló al arrancar.
+        arranque.preparar_worker()
+    if not arranque.listo():
+        raise RuntimeError('el worker no pudo conectarse a la base principal')
+
+
+def _revisar_bases(bases) -> None:
+    for base in bases:
+        with connections[base].cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
+def _revisar_migraciones(bases) -> None:
+    for base in bases:
+        if base in _migradas:
+            continue
+        executor = MigrationExecutor(connections[base])
+        pendientes = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if pendientes:
+            raise RuntimeError(f'{base}: {len(pendientes)} migraciones pendientes')
+        _migradas.add(base)
+
+
+def _revisar_caches(aliases) -> None:
+    clave = f'salud:{os.getpid()}'
+    for alias in aliases:
+        valor = get_random_string(8)
+        cache = caches[alias]
+        cache.set(clave, valor, 30)
+        if cache.get(clave) != valor:
+            raise RuntimeError(f'{alias}: no devolvió el valor guardado')
+        cache.delete(clave)
+
+
+def _revisar_otras_bases() -> None:
+    otras = [base for base in connections if base != DEFAULT_DB_ALIAS]
+    _revisar_bases(otras)
+    _revisar_migraciones(otras)
+
+
+def _revisar_otras_caches() -> None:
+    _revisar_caches([alias for alias in settings.CACHES if alias != DEFAULT_CACHE_ALIAS])
+
+
+# Deciden el 200/503.
+REVISIONES = {
+    'worker': _revisar_worker,
+    'bases': partial(_revisar_bases, [DEFAULT_DB_ALIAS]),
+    'migraciones': partial(_revisar_migraciones, [DEFAULT_DB_ALIAS]),
+    'caches': partial(_revisar_caches, [DEFAULT_CACHE_ALIAS]),
+}
+
+# Solo se reportan.
+INFORMATIVAS = {
+    'otras_bases': _revisar_otras_bases,
+    'otras_caches': _revisar_otras_caches,
+}
+
+
+def _correr(revisiones: dict) -> dict:
+    resultados = {}
+    for nombre, revisar in revisiones.items():
+        try:
+            revisar()
+        except Exception as exc:
+            resultados[nombre] = f'{type(exc).__name__}: {exc}'
+        else:
+            resultados[nombre] = 'ok'
+    return resultados
+
+
+@require_GET
+@never_cache
+def healthz(request: HttpRequest) -> JsonResponse:
+    return JsonResponse({'estado': 'vivo'})
+
+
+@require_GET
+@never_cache
+def readyz(request: HttpRequest) -> JsonResponse:
+    revisiones = _correr(REVISIONES)
+    informativas = _correr(INFORMATIVAS)
+    listo = all(resultado == 'ok' for resultado in revisiones.values())
+    if not listo:
+        logger.warning('Worker no disponible: %s', revisiones)
+    fallas = {nombre: resultado for nombre, resultado in informativas.items() if resultado != 'ok'}
+    if fallas:
+        logger.warning('Revisiones informativas con fallas: %s', fallas)
+    return JsonResponse(
+        {'estado': 'listo' if listo else 'no_disponible', 'revisiones': revisiones, 'informativas': informativas},
+        status=200 if listo else 503,
+    )
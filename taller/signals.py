@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import catalogo, sucursales
+from .autenticacion import invalidar_usuario
+from .api import clave_seguimiento
+from .folios import registrar_folio
+from .models import Avance, CatalogoVehiculo, FotoOrden, OrdenServicio, RegistroCambio, Sucursal
+
+
+@receiver(post_save, sender=OrdenServicio)
+def orden_creada(sender, instance: OrdenServicio, created: bool, **kwargs):
+    if created:
+        registrar_folio(instance.folio, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=OrdenServicio)
+@receiver([post_save, post_delete], sender=Avance)
+@receiver([post_save, post_delete], sender=FotoOrden)
+def invalidar_api_seguimiento(sender, instance, **kwargs):
+    orden_pk = instance.pk if isinstance(instance, OrdenServicio) else instance.orden_id
+    caches[getattr(settings, 'API_CACHE', 'default')].delete(clave_seguimiento(orden_pk, kwargs.get('using')))
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidar_usuario_cacheado(sender, instance, **kwargs):
+    invalidar_usuario(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=CatalogoVehiculo)
+def invalidar_catalogo(sender, instance, **kwargs):
+    transaction.on_commit(catalogo.invalidar, using=kwargs.get('using'))
+
+
+@receiver([post_save, post_delete], sender=Sucursal)
+def invalidar_sucursales(sender, instance, **kwargs):
+    transaction.on_commit(sucursales.invalidar, using=kwargs.get('using'))
+
+
+_MODELOS_OUTBOX = {
+    OrdenServicio: RegistroCambio.Modelo.ORDEN,
+    Avance: RegistroCambio.Modelo.AVANCE,
+    FotoOrden: RegistroCambio.Modelo.FOTO,
+}
+
+
+def _datos_evento(instance) -> dict:
+    if isinstance(instance, OrdenServicio):
+        return {'folio': instance.folio, 'estatus': instance.estatus}
+    if isinstance(instance, Avance):
+        return {'orden': instance.orden_id, 'estatus': instance.estatus}
+    return {'orden': instance.orden_id, 'numero': instance.numero, 'url': instance.url}
+
+
+@receiver(post_save, sender=OrdenServicio)
+@receiver(post_save, sender=Avance)
+@receiver(post_save, sender=FotoOrden)
+def registrar_guardado(sender, instance, created: bool, **kwargs):
+    modelo = _MODELOS_OUTBOX[sender]
+    datos = _datos_evento(instance)
+    tipo = f'{modelo}.creado' if created else f'{modelo}.actualizado'
+    if sender is OrdenServicio:
+        anterior = getattr(instance, '_estatus_guardado', None)
+        if not created and anterior != instance.estatus:
+            tipo = 'orden.estatus'
+            datos['estatus_anterior'] = anterior
+        instance._estatus_guardado = instance.estatus
+    RegistroCambio.objects.using(kwargs.get('using')).create(
+        modelo=modelo, objeto_id=instance.pk, operacion=RegistroCambio.Operacion.GUARDADO, tipo=tipo, datos=datos,
+    )
+
+
+@receiver(post_delete, sender=OrdenServicio)
+@receiver(post_delete, sender=Avance)
+@receiver(post_delete, sender=FotoOrden)
+def registrar_eliminado(sender, instance, **kwargs):
+    modelo = _MODELOS_OUTBOX[sender]
+    RegistroCambio.objects.using(kwargs.get('using')).create(
+        modelo=modelo, objeto_id=instance.pk, operacion=RegistroCambio.Operacion.ELIMINADO,
+        tipo=f'{modelo}.eliminado', datos=_datos_evento(instance),
+    )
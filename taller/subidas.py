@@ -0,0 +1,246 @@
+"""Subida de fotos en partes con tickets firmados y deduplicación por hash.
+
+1. ``POST /dashboard/<pk>/fotos/subidas/`` con ``{"tamano", "tipo", "sha256",
+   "numero"}``. Si ya hay un archivo con ese hash, la foto se registra sin
+   subir nada (``"estado": "duplicado"``); si no, se responde un ticket del
+   destino configurado (ver ``taller/almacenamiento.py``).
+2. El navegador sube el contenido al URL del ticket. Con un destino directo
+   (``"directo": true``, p. ej. ``DestinoS3``) es un solo ``PUT`` al bucket con
+   las ``cabeceras`` del ticket; el hash es obligatorio. Con ``DestinoLocal``
+   son partes de a lo más ``tamano_parte`` bytes, con ``Content-Range: bytes
+   inicio-fin/total``, y un ``GET`` al mismo URL dice cuántos bytes se han
+   recibido, para reanudar.
+3. ``POST /dashboard/subidas/<id>/confirmar/`` verifica tamaño y hash. Solo
+   entonces se crea la ``FotoOrden``.
+
+Con ``DestinoLocal`` el contenido publicado se sirve desde ``FOTOS_URL`` con
+``ver_foto``, también en producción: el nombre es el hash, así que se cachea
+como inmutable.
+"""
+import datetime
+import json
+import mimetypes
+import re
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+
+from . import metricas, sucursales
+from .almacenamiento import EXTENSIONES, destino, leer_ticket
+from .models import ArchivoFoto, FotoOrden, OrdenServicio, SubidaFoto
+
+
+metricas.describir('wraplab_fotos_subidas_total', 'Subidas de fotos confirmadas, por resultado.')
+
+FORMATO_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+def _ajuste(nombre: str, default):
+    return getattr(settings, nombre, default)
+
+
+def _autorizado(request: HttpRequest) -> bool:
+    return request.user.is_authenticated and request.user.is_superuser
+
+
+def _error(mensaje: str, status: int, **extra) -> JsonResponse:
+    return JsonResponse({'error': mensaje, **extra}, status=status)
+
+
+def registrar_foto(orden: OrdenServicio, archivo: ArchivoFoto, url: str, numero=None) -> FotoOrden:
+    """Asocia el archivo a la orden: reemplaza la foto de la posición ``numero`` o agrega una sin posición."""
+    if numero:
+        foto = orden.fotos.filter(numero=numero).first()
+        if foto is None:
+            return FotoOrden.objects.create(orden=orden, numero=numero, url=url, archivo=archivo)
+        if foto.archivo_id != archivo.pk:
+            foto.url = url
+            foto.archivo = archivo
+            foto.save()
+        return foto
+    foto = orden.fotos.filter(archivo=archivo).first()
+    return foto or FotoOrden.objects.create(orden=orden, url=url, archivo=archivo)
+
+
+def _datos_foto(foto: FotoOrden) -> dict:
+    return {'id': foto.pk, 'numero': foto.numero, 'url': foto.url}
+
+
+class SolicitudInvalida(Exception):
+    pass
+
+
+def _leer_solicitud(request: HttpRequest):
+    try:
+        datos = json.loads(request.body)
+        tipo = datos.get('tipo')
+        tamano = int(datos.get('tamano'))
+        sha256 = (datos.get('sha256') or '').lower()
+        numero = int(datos['numero']) if datos.get('numero') else None
+    except (ValueError, TypeError, AttributeError):
+        raise SolicitudInvalida('Se esperaba {"tamano", "tipo", "sha256", "numero"}')
+    if tipo not in EXTENSIONES:
+        raise SolicitudInvalida('Tipo de imagen no soportado')
+    if not 0 < tamano <= _ajuste('FOTOS_TAMANO_MAXIMO', 25 * 1024 * 1024):
+        raise SolicitudInvalida('Tamaño inválido')
+    if sha256 and not FORMATO_SHA256.match(sha256):
+        raise SolicitudInvalida('sha256 inválido')
+    if numero is not None and not 1 <= numero <= 10:
+        raise SolicitudInvalida('Número de foto inválido')
+    return tipo, tamano, sha256, numero
+
+
+@require_POST
+def crear_subida(request: HttpRequest, pk: int) -> JsonResponse:
+    if not _autorizado(request):
+        return _error('No autorizado', 403)
+    orden = get_object_or_404(OrdenServicio, pk=pk, sucursal=request.sucursal)
+    try:
+        tipo, tamano, sha256, numero = _leer_solicitud(request)
+    except SolicitudInvalida as exc:
+        return _error(str(exc), 400)
+
+    almacen = destino()
+    if almacen.directo and not sha256:
+        return _error('Este destino requiere el sha256 del archivo', 400)
+    if sha256:
+        archivo = ArchivoFoto.objects.filter(sha256=sha256, tamano=tamano).first()
+        if archivo is not None:
+            foto = registrar_foto(orden, archivo, request.build_absolute_uri(almacen.url(archivo.ruta)), numero)
+            metricas.incrementar('wraplab_fotos_subidas_total', resultado='duplicado')
+            return JsonResponse({'estado': 'duplicado', 'foto': _datos_foto(foto)})
+
+    subida = SubidaFoto.objects.create(
+        orden=orden,
+        numero=numero,
+        tipo=tipo,
+        tamano=tamano,
+        sha256=sha256,
+        expira_en=timezone.now() + datetime.timedelta(seconds=_ajuste('FOTOS_TICKET_TTL', 3600)),
+    )
+    return JsonResponse({
+        'estado': 'pendiente',
+        'subida': str(subida.pk),
+        'ticket': almacen.ticket(request, subida),
+        'confirmar': reverse('confirmar_subida', kwargs={'pk': subida.pk}),
+    }, status=201)
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'HEAD', 'PUT'])
+def recibir_parte(request: HttpRequest, token: str) -> HttpResponse:
+    """Receptor de ``DestinoLocal``: el ticket firmado es la autorización, no la sesión.
+
+    El cuerpo se lee fuera de toda transacción: un cliente lento no retiene una
+    conexión ni un bloqueo. ``recibido`` avanza con una actualización
+    condicionada a que nadie más lo haya movido mientras tanto.
+    """
+    try:
+        pk, base = leer_ticket(token)
+    except signing.BadSignature:
+        return _error('Ticket inválido o vencido', 403)
+
+    subidas = SubidaFoto.objects.using(base)
+    subida = subidas.filter(pk=pk).first()
+    if subida is None or subida.estado != SubidaFoto.Estado.PENDIENTE or subida.expira_en < timezone.now():
+        return _error('La subida ya no está disponible', 410)
+    if request.method != 'PUT':
+        return JsonResponse({'recibido': subida.recibido, 'tamano': subida.tamano})
+
+    rango = CONTENT_RANGE.match(request.headers.get('Content-Range', f'bytes 0-{subida.tamano - 1}/{subida.tamano}'))
+    if rango is None:
+        return _error('Content-Range inválido', 400)
+    inicio, fin, total = (int(x) for x in rango.groups())
+    largo = fin - inicio + 1
+    if total != subida.tamano or fin >= total or largo <= 0:
+        return _error('Content-Range no corresponde a la subida', 400)
+    if largo > _ajuste('FOTOS_TAMANO_PARTE', 4 * 1024 * 1024):
+        return _error('Parte demasiado grande', 413)
+    if inicio != subida.recibido:
+        # El cliente debe continuar desde lo que ya se recibió.
+        return _error('Fuera de orden', 409, recibido=subida.recibido)
+    if int(request.headers.get('Content-Length') or largo) != largo:
+        return _error('Content-Length no corresponde a Content-Range', 400)
+
+    escritos = destino().escribir(subida, inicio, request)
+    if escritos != largo:
+        return _error('Parte incompleta', 400, recibido=subida.recibido)
+    avanzo = subidas.filter(pk=pk, estado=SubidaFoto.Estado.PENDIENTE, recibido=inicio).update(recibido=fin + 1)
+    if not avanzo:
+        # Otra solicitud con la misma parte (p. ej. un reintento) ganó; se reporta lo que quedó.
+        subida.refresh_from_db(fields=['recibido'])
+        return _error('Fuera de orden', 409, recibido=subida.recibido)
+    return JsonResponse({'recibido': fin + 1, 'tamano': subida.tamano})
+
+
+@require_POST
+def confirmar_subida(request: HttpRequest, pk) -> JsonResponse:
+    if not _autorizado(request):
+        return _error('No autorizado', 403)
+    almacen = destino()
+    with sucursales.atomica():
+        subida = get_object_or_404(
+            SubidaFoto.objects.select_for_update(of=('self',)).select_related('orden'),
+            pk=pk, orden__sucursal=request.sucursal,
+        )
+        if subida.estado == SubidaFoto.Estado.COMPLETA:
+            # Reintento de una confirmación que ya se aplicó.
+            foto = subida.orden.fotos.filter(archivo=subida.archivo).first()
+            return JsonResponse({'estado': 'completa', 'foto': _datos_foto(foto) if foto else None})
+        if subida.estado == SubidaFoto.Estado.DESCARTADA:
+            return _error('La subida fue descartada', 410)
+        # Un destino directo no pasa por ``recibir_parte``: solo el objeto dice si llegó.
+        if subida.recibido != subida.tamano and not almacen.directo:
+            return _error('La subida está incompleta', 409, recibido=subida.recibido)
+
+        verificado = almacen.verificar(subida)
+        if verificado is None:
+            return _error('La subida está incompleta', 409, recibido=0)
+        sha256, tamano = verificado
+        if tamano != subida.tamano or (subida.sha256 and sha256 != subida.sha256):
+            almacen.descartar(subida)
+            subida.estado = SubidaFoto.Estado.DESCARTADA
+            subida.save(update_fields=['estado'])
+            metricas.incrementar('wraplab_fotos_subidas_total', resultado='corrupta')
+            return _error('El contenido no coincide con el hash declarado', 400)
+
+        archivo = ArchivoFoto.objects.filter(sha256=sha256).first()
+        resultado = 'duplicado' if archivo else 'nueva'
+        if archivo is None:
+            ruta = almacen.publicar(subida, sha256)
+            archivo, _ = ArchivoFoto.objects.get_or_create(
+                sha256=sha256, defaults={'ruta': ruta, 'tamano': tamano, 'tipo': subida.tipo},
+            )
+        else:
+            almacen.descartar(subida)
+        subida.archivo = archivo
+        subida.estado = SubidaFoto.Estado.COMPLETA
+        subida.save(update_fields=['archivo', 'estado'])
+        foto = registrar_foto(subida.orden, archivo, request.build_absolute_uri(almacen.url(archivo.ruta)), subida.numero)
+    metricas.incrementar('wraplab_fotos_subidas_total', resultado=resultado)
+    return JsonResponse({'estado': 'completa', 'foto': _datos_foto(foto)})
+
+
+@require_GET
+def ver_foto(request: HttpRequest, ruta: str) -> FileResponse:
+    """Contenido publicado por un destino con ``storage`` local (``DestinoLocal``)."""
+    storage = getattr(destino(), 'storage', None)
+    if storage is None:
+        raise Http404
+    try:
+        archivo = storage.open(ruta)
+    except (FileNotFoundError, IsADirectoryError, SuspiciousFileOperation):
+        raise Http404
+    tipo = mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+    respuesta = FileResponse(archivo, content_type=tipo)
+    patch_cache_control(respuesta, public=True, max_age=_ajuste('FOTOS_MAX_AGE', 31536000), immutable=True)
+    return respuesta
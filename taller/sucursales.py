@@ -0,0 +1,134 @@
+"""Sucursal activa y, opcionalmente, la base de datos de cada sucursal.
+
+Cada solicitud del personal corre con una sucursal activa (ver
+``middleware.SucursalMiddleware``); las órdenes y citas nuevas se asignan a
+ella y el dashboard solo consulta las suyas. ``activar`` sirve igual para
+comandos y pruebas::
+
+    with sucursales.activar(sucursales.por_clave('norte')):
+        enviar_pendientes()
+
+Si una sucursal tiene ``base_datos`` distinta de ``default`` y
+``taller.routers.SucursalRouter`` está en ``DATABASE_ROUTERS``, sus datos
+viven en esa base. Sus folios llevan ``prefijo_folio`` para que el
+seguimiento público sepa en qué base buscar sin consultar las demás.
+
+Las sucursales se leen de la base ``default`` y se guardan en memoria del
+proceso ``SUCURSALES_TTL`` segundos.
+"""
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+_activa = contextvars.ContextVar('sucursal_activa', default=None)
+
+
+class _Estado:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.por_pk = None
+        self.cargado_en = 0.0
+
+
+_estado = _Estado()
+
+
+def _ajuste(nombre: str, default):
+    return getattr(settings, nombre, default)
+
+
+def _sucursales() -> dict:
+    with _estado.lock:
+        if _estado.por_pk is None or time.monotonic() - _estado.cargado_en > _ajuste('SUCURSALES_TTL', 60):
+            from .models import Sucursal
+
+            _estado.por_pk = {s.pk: s for s in Sucursal.objects.using(DEFAULT_DB_ALIAS).all()}
+            _estado.cargado_en = time.monotonic()
+        return _estado.por_pk
+
+
+def invalidar() -> None:
+    with _estado.lock:
+        _estado.por_pk = None
+
+
+def todas() -> list:
+    return [s for s in _sucursales().values() if s.activa]
+
+
+def por_pk(pk):
+    return _sucursales().get(pk)
+
+
+def por_clave(clave: str):
+    return next((s for s in _sucursales().values() if s.clave == clave), None)
+
+
+def principal():
+    """Sucursal de los datos sin sucursal explícita (``SUCURSAL_PRINCIPAL``)."""
+    clave = _ajuste('SUCURSAL_PRINCIPAL', 'matriz')
+    sucursal = por_clave(clave)
+    if sucursal is None:
+        from .models import Sucursal
+
+        sucursal, _ = Sucursal.objects.using(DEFAULT_DB_ALIAS).get_or_create(
+            clave=clave, defaults={'nombre': clave.title()},
+        )
+        invalidar()
+    return sucursal
+
+
+def activa():
+    return _activa.get()
+
+
+@contextmanager
+def activar(sucursal):
+    token = _activa.set(sucursal)
+    try:
+        yield sucursal
+    finally:
+        _activa.reset(token)
+
+
+def base_activa() -> str:
+    sucursal = _activa.get()
+    return sucursal.base_datos if sucursal is not None else DEFAULT_DB_ALIAS
+
+
+def bases() -> list:
+    """Alias de base de datos con sucursales; ``default`` siempre primero."""
+    otras = sorted({s.base_datos for s in todas()} - {DEFAULT_DB_ALIAS})
+    return [DEFAULT_DB_ALIAS, *otras]
+
+
+def prefijos() -> dict:
+    """``{prefijo_folio: base_datos}`` de las sucursales con prefijo."""
+    return {s.prefijo_folio: s.base_datos for s in _sucursales().values() if s.prefijo_folio}
+
+
+def base_de_folio(folio: str) -> str:
+    for prefijo, base in prefijos().items():
+        if folio.startswith(prefijo):
+            return base
+    return DEFAULT_DB_ALIAS
+
+
+def atomica():
+    """``transaction.atomic`` sobre la base de la sucursal activa."""
+    return transaction.atomic(using=base_activa())
+
+
+def transaccional(funcion):
+    """Como ``@transaction.atomic``, pero la base se elige al llamar, no al decorar."""
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        with atomica():
+            return funcion(*args, **kwargs)
+    return envoltura
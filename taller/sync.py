@@ -0,0 +1,200 @@
+"""Sincronización por deltas para las tabletas del taller.
+
+El cliente hace una primera descarga sin ``desde`` (instantánea de las órdenes
+activas) y después pide solo los cambios posteriores al ``token`` recibido; el
+token es el ``id`` del último evento del outbox (``RegistroCambio``) entregado.
+Los avances capturados sin conexión se suben en lote; cada uno lleva un
+``id_cliente`` (UUID) para que reintentar el mismo lote no duplique nada.
+"""
+import json
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Max
+from django.http import HttpRequest, HttpResponse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET, require_POST
+
+from . import outbox, sucursales
+from .api import normalizar, serializar
+from .forms import AvanceForm
+from .models import Avance, FotoOrden, OrdenServicio, RegistroCambio
+from .presupuestos import presupuesto
+
+
+LIMITE_CAMBIOS = 1000
+
+
+def _json(datos, status: int = 200) -> HttpResponse:
+    return HttpResponse(serializar(datos), status=status, content_type='application/json')
+
+
+def _autorizado(request: HttpRequest) -> bool:
+    return request.user.is_authenticated and request.user.is_superuser
+
+
+def datos_orden(orden: OrdenServicio) -> dict:
+    return {
+        'id': orden.pk,
+        'folio': orden.folio,
+        'cliente_nombre': orden.cliente_nombre,
+        'vehiculo_marca': orden.vehiculo_marca,
+        'vehiculo_modelo': orden.vehiculo_modelo,
+        'vehiculo_matricula': orden.vehiculo_matricula,
+        'vehiculo_anio': orden.vehiculo_anio,
+        'vehiculo_color': orden.vehiculo_color,
+        'servicio': orden.servicio,
+        'estatus': orden.estatus,
+        'costo_total': normalizar(orden.costo_total),
+        'monto_pagado': normalizar(orden.monto_pagado),
+        'testigos': orden.testigos,
+        'notas': orden.notas,
+        'actualizado_en': normalizar(orden.actualizado_en),
+    }
+
+
+def datos_avance(avance: Avance) -> dict:
+    return {
+        'id': avance.pk,
+        'orden': avance.orden_id,
+        'estatus': avance.estatus,
+        'nota': avance.nota,
+        'id_cliente': str(avance.id_cliente) if avance.id_cliente else None,
+        'creado_en': normalizar(avance.creado_en),
+    }
+
+
+def datos_foto(foto: FotoOrden) -> dict:
+    return {'id': foto.pk, 'orden': foto.orden_id, 'numero': foto.numero, 'url': foto.url}
+
+
+_SERIALIZADORES = {
+    RegistroCambio.Modelo.ORDEN: ('ordenes', OrdenServicio, datos_orden),
+    RegistroCambio.Modelo.AVANCE: ('avances', Avance, datos_avance),
+    RegistroCambio.Modelo.FOTO: ('fotos', FotoOrden, datos_foto),
+}
+
+
+def _token_actual() -> int:
+    return RegistroCambio.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+
+
+def _token_minimo() -> int:
+    """Token más antiguo que todavía tiene delta: antes de él la retención ya borró eventos."""
+    primero = RegistroCambio.objects.order_by('id').values_list('id', flat=True).first()
+    return primero - 1 if primero else 0
+
+
+def _instantanea(sucursal) -> dict:
+    # El token se toma antes de leer: lo que cambie durante la lectura llega en el siguiente delta.
+    token = _token_actual()
+    ordenes = list(
+        OrdenServicio.objects.filter(sucursal=sucursal).exclude(estatus=OrdenServicio.Estatus.TRABAJO_TERMINADO)
+    )
+    ids = [o.pk for o in ordenes]
+    return {
+        'ordenes': [datos_orden(o) for o in ordenes],
+        'avances': [datos_avance(a) for a in Avance.objects.filter(orden_id__in=ids)],
+        'fotos': [datos_foto(f) for f in FotoOrden.objects.filter(orden_id__in=ids)],
+        'eliminados': {'ordenes': [], 'avances': [], 'fotos': []},
+        'token': str(token),
+        'mas': False,
+        'instantanea': True,
+    }
+
+
+def _delta(desde: int, limite: int, sucursal) -> dict:
+    # Un hueco vigente detiene el lote: el token no puede rebasar un id sin confirmar.
+    registros = outbox.hasta_hueco(desde, outbox.leer(desde, limite + 1))
+    mas = len(registros) > limite
+    registros = registros[:limite]
+
+    # Por objeto solo importa la última operación dentro del lote.
+    ultimas = {}
+    for registro in registros:
+        ultimas[(registro.modelo, registro.objeto_id)] = registro.operacion
+
+    respuesta = {'eliminados': {}}
+    for modelo, (nombre, clase, serializador) in _SERIALIZADORES.items():
+        guardados = [pk for (m, pk), op in ultimas.items() if m == modelo and op == RegistroCambio.Operacion.GUARDADO]
+        eliminados = [pk for (m, pk), op in ultimas.items() if m == modelo and op == RegistroCambio.Operacion.ELIMINADO]
+        # Un guardado cuyo objeto ya no existe se reporta cuando llegue su eliminación.
+        # El outbox es de toda la base; solo se entregan los objetos de la sucursal.
+        objetos = clase.objects.filter(pk__in=guardados, sucursal=sucursal).order_by('pk')
+        respuesta[nombre] = [serializador(obj) for obj in objetos]
+        respuesta['eliminados'][nombre] = eliminados
+    respuesta['token'] = str(registros[-1].id if registros else desde)
+    respuesta['mas'] = mas
+    respuesta['instantanea'] = False
+    return respuesta
+
+
+@require_GET
+@gzip_page
+@presupuesto(consultas=8, ms=200)
+def cambios(request: HttpRequest) -> HttpResponse:
+    if not _autorizado(request):
+        return _json({'error': 'No autorizado'}, 403)
+    try:
+        limite = min(max(int(request.GET.get('limit', 500)), 1), LIMITE_CAMBIOS)
+        desde = request.GET.get('desde')
+        desde = int(desde) if desde else None
+    except ValueError:
+        return _json({'error': 'Parámetros inválidos'}, 400)
+    if desde is None or desde < _token_minimo():
+        return _json(_instantanea(request.sucursal))
+    return _json(_delta(desde, limite, request.sucursal))
+
+
+def _aplicar_avance(item: dict, sucursal) -> dict:
+    try:
+        id_cliente = uuid.UUID(str(item.get('id_cliente')))
+    except ValueError:
+        return {'id_cliente': item.get('id_cliente'), 'resultado': 'invalido', 'errores': {'id_cliente': ['UUID inválido']}}
+    base = {'id_cliente': str(id_cliente)}
+    try:
+        orden_id = int(item.get('orden'))
+    except (TypeError, ValueError):
+        return {**base, 'resultado': 'invalido', 'errores': {'orden': ['Id de orden inválido']}}
+
+    existente = Avance.objects.filter(id_cliente=id_cliente).values_list('pk', flat=True).first()
+    if existente:
+        return {**base, 'resultado': 'duplicado', 'avance': existente}
+
+    try:
+        with sucursales.atomica():
+            orden = OrdenServicio.objects.select_for_update().filter(pk=orden_id, sucursal=sucursal).first()
+            if orden is None:
+                return {**base, 'resultado': 'invalido', 'errores': {'orden': ['Orden inexistente']}}
+            previo = item.get('estatus_previo')
+            if previo and previo != orden.estatus:
+                return {**base, 'resultado': 'conflicto', 'estatus_actual': orden.estatus}
+            form = AvanceForm({'estatus': item.get('estatus'), 'nota': item.get('nota')}, orden=orden)
+            if not form.is_valid():
+                return {**base, 'resultado': 'invalido', 'errores': {k: list(v) for k, v in form.errors.items()}}
+            avance = form.save(commit=False)
+            avance.id_cliente = id_cliente
+            orden.registrar_avance(avance)
+    except IntegrityError:
+        # Un envío concurrente ganó la carrera por el mismo id_cliente.
+        existente = Avance.objects.filter(id_cliente=id_cliente).values_list('pk', flat=True).first()
+        return {**base, 'resultado': 'duplicado', 'avance': existente}
+    return {**base, 'resultado': 'aplicado', 'avance': avance.pk}
+
+
+@require_POST
+def subir_avances(request: HttpRequest) -> HttpResponse:
+    """Aplica un lote de avances; el resultado de cada uno es aplicado, duplicado, conflicto o invalido."""
+    if not _autorizado(request):
+        return _json({'error': 'No autorizado'}, 403)
+    try:
+        avances = json.loads(request.body)['avances']
+        if not isinstance(avances, list) or not all(isinstance(a, dict) for a in avances):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return _json({'error': 'Se esperaba {"avances": [...]}'}, 400)
+    if len(avances) > getattr(settings, 'SYNC_LOTE_MAXIMO', 100):
+        return _json({'error': 'Lote demasiado grande'}, 400)
+    resultados = [_aplicar_avance(item, request.sucursal) for item in avances]
+    return _json({'resultados': resultados})
@@ -1,19 +1,35 @@
 from django.contrib.auth import views as auth_views
 from django.urls import path
 
-from . import views
+from . import api, documentos, qr, salud, subidas, sync, views
 
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('healthz', salud.healthz, name='healthz'),
+    path('readyz', salud.readyz, name='readyz'),
     path('seguimiento/', views.folio_lookup, name='folio_lookup'),
     path('seguimiento/<str:folio>/', views.seguimiento_detalle, name='seguimiento_detalle'),
+    path('seguimiento/<str:folio>/qr-<slug:firma>.<str:formato>', qr.codigo_qr, name='seguimiento_qr'),
+    path('seguimiento/<str:folio>/qr.<str:formato>', qr.codigo_qr, name='seguimiento_qr_estable'),
+    path('api/v1/seguimiento/<str:folio>/', api.seguimiento, name='api_seguimiento'),
+    path('api/v1/ordenes/', api.ordenes, name='api_ordenes'),
+    path('api/v1/sync/cambios/', sync.cambios, name='sync_cambios'),
+    path('api/v1/sync/avances/', sync.subir_avances, name='sync_avances'),
     path('login/', views.SuperuserLoginView.as_view(), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/sucursal/', views.cambiar_sucursal, name='cambiar_sucursal'),
     path('dashboard/nuevo/', views.orden_nueva, name='orden_nueva'),
     path('dashboard/<int:pk>/', views.orden_detalle, name='orden_detalle'),
     path('dashboard/<int:pk>/editar/', views.orden_editar, name='orden_editar'),
+    path('dashboard/<int:pk>/documentos/<str:tipo>.<str:formato>', documentos.ver_documento, name='documento_orden'),
+    path('dashboard/<int:pk>/fotos/subidas/', subidas.crear_subida, name='crear_subida'),
+    path('dashboard/subidas/<uuid:pk>/confirmar/', subidas.confirmar_subida, name='confirmar_subida'),
+    path('subidas/<str:token>/', subidas.recibir_parte, name='subida_parte'),
+    path('dashboard/autocompletar/clientes/', views.autocompletar_clientes, name='autocompletar_clientes'),
+    path('dashboard/autocompletar/vehiculos/', views.autocompletar_vehiculos, name='autocompletar_vehiculos'),
+    path('dashboard/metricas/', views.metricas_view, name='metricas'),
     path('dashboard/citas/nueva/', views.cita_nueva, name='cita_nueva'),
     path('dashboard/citas/<int:pk>/editar/', views.cita_editar, name='cita_editar'),
     path('dashboard/citas/<int:pk>/eliminar/', views.cita_eliminar, name='cita_eliminar'),
@@ -1,16 +1,24 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import forms as auth_forms
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth.views import LoginView
-from django.db.models import Q
-from django.http import HttpRequest, HttpResponse
+from django.db.models import Count, Prefetch, Q
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.urls import reverse
 
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from . import catalogo, metricas, qr, sucursales
 
+from .folios import orden_por_folio, resolver_folio
 from .forms import AvanceForm, CitaForm, OrdenServicioForm, CostosForm, FotoOrdenForm
-from .models import Avance, Cita, OrdenServicio, FotoOrden
+from .middleware import SucursalMiddleware
+from .models import Cita, Cliente, Documento, OrdenServicio, FotoOrden, Vehiculo
+from .normalizacion import clave_nombre, normalizar_matricula
+from .presupuestos import presupuesto
 
 
 def index(request: HttpRequest) -> HttpResponse:
@@ -21,11 +29,14 @@ def folio_lookup(request: HttpRequest) -> HttpResponse:
     folio = (request.GET.get('folio') or '').strip().upper()
     if not folio:
         return render(request, 'taller/seguimiento.html')
+    if resolver_folio(folio) is None:
+        raise Http404('Folio no encontrado')
     return redirect('seguimiento_detalle', folio=folio)
 
 
+@presupuesto(consultas=5, ms=150)
 def seguimiento_detalle(request: HttpRequest, folio: str) -> HttpResponse:
-    orden = get_object_or_404(OrdenServicio, folio=folio.upper())
+    orden = orden_por_folio(folio)
     avances = orden.avances.all()
     fotos = orden.fotos.all()
     
@@ -88,9 +99,10 @@ def _superuser_required(user) -> bool:
 
 
 @user_passes_test(_superuser_required)
+@presupuesto(consultas=6, ms=250)
 def dashboard(request: HttpRequest) -> HttpResponse:
     q = (request.GET.get('q') or '').strip()
-    qs = OrdenServicio.objects.all().order_by('-actualizado_en')
+    qs = OrdenServicio.objects.filter(sucursal=request.sucursal).order_by('-actualizado_en')
     if q:
         qs = qs.filter(
             Q(folio__icontains=q)
@@ -101,20 +113,39 @@ def dashboard(request: HttpRequest) -> HttpResponse:
             | Q(cliente_nombre__icontains=q)
         )
     
+    testigos = [t for t in (request.GET.get('testigos') or '').split(',') if t]
+    testigos_modo = request.GET.get('testigos_modo') or 'alguno'
+    if testigos:
+        qs = qs.con_testigos(testigos, todos=testigos_modo == 'todos')
+
     activas = qs.exclude(estatus=OrdenServicio.Estatus.TRABAJO_TERMINADO)
     entregadas = qs.filter(estatus=OrdenServicio.Estatus.TRABAJO_TERMINADO)
     
     # Citas
-    citas_proximas = Cita.objects.filter(fecha__gte=timezone.now(), completada=False).order_by('fecha')
+    citas_proximas = Cita.objects.filter(
+        sucursal=request.sucursal, completada=False, fecha__gte=timezone.now(),
+    ).order_by('fecha')
     
     return render(request, 'taller/dashboard.html', {
         'activas': activas, 
         'entregadas': entregadas, 
         'citas_proximas': citas_proximas,
-        'q': q
+        'sucursales': sucursales.todas(),
+        'q': q,
+        'testigos': ','.join(testigos),
+        'testigos_modo': testigos_modo,
     })
 
 
+@user_passes_test(_superuser_required)
+def cambiar_sucursal(request: HttpRequest) -> HttpResponse:
+    sucursal = sucursales.por_clave(request.POST.get('sucursal', ''))
+    if request.method == 'POST' and sucursal is not None and sucursal.activa:
+        request.session[SucursalMiddleware.CLAVE_SESION] = sucursal.pk
+        messages.success(request, f'Sucursal: {sucursal.nombre}.')
+    return redirect('dashboard')
+
+
 @user_passes_test(_superuser_required)
 def orden_nueva(request: HttpRequest) -> HttpResponse:
     if request.method == 'POST':
@@ -130,7 +161,7 @@ def orden_nueva(request: HttpRequest) -> HttpResponse:
 
 @user_passes_test(_superuser_required)
 def orden_editar(request: HttpRequest, pk: int) -> HttpResponse:
-    orden = get_object_or_404(OrdenServicio, pk=pk)
+    orden = get_object_or_404(OrdenServicio, pk=pk, sucursal=request.sucursal)
     if request.method == 'POST':
         form = OrdenServicioForm(request.POST, instance=orden)
         if form.is_valid():
@@ -143,8 +174,9 @@ def orden_editar(request: HttpRequest, pk: int) -> HttpResponse:
 
 
 @user_passes_test(_superuser_required)
+@presupuesto(consultas=10, ms=300)
 def orden_detalle(request: HttpRequest, pk: int) -> HttpResponse:
-    orden = get_object_or_404(OrdenServicio, pk=pk)
+    orden = get_object_or_404(OrdenServicio, pk=pk, sucursal=request.sucursal)
     
     form = AvanceForm(initial={'estatus': orden.estatus}, orden=orden)
     costos_form = CostosForm(instance=orden)
@@ -154,11 +186,7 @@ def orden_detalle(request: HttpRequest, pk: int) -> HttpResponse:
         if 'submit_avance' in request.POST:
             form = AvanceForm(request.POST, orden=orden)
             if form.is_valid():
-                avance: Avance = form.save(commit=False)
-                avance.orden = orden
-                avance.save()
-                orden.estatus = avance.estatus
-                orden.save(update_fields=['estatus', 'actualizado_en'])
+                orden.registrar_avance(form.save(commit=False))
                 messages.success(request, 'Avance registrado.')
                 return redirect('orden_detalle', pk=orden.pk)
         
@@ -178,6 +206,7 @@ def orden_detalle(request: HttpRequest, pk: int) -> HttpResponse:
 
     avances = orden.avances.all()
     fotos = orden.fotos.all()
+    historial = orden.vehiculo.historial().exclude(pk=orden.pk)[:10] if orden.vehiculo_id else []
     
     return render(
         request,
@@ -189,14 +218,72 @@ def orden_detalle(request: HttpRequest, pk: int) -> HttpResponse:
             'fotos_form': fotos_form,
             'avances': avances, 
             'fotos': fotos,
-            'cliente_url': _cliente_url(request, orden)
+            'historial': historial,
+            'tipos_documento': Documento.Tipo.choices,
+            'cliente_url': request.build_absolute_uri(reverse('seguimiento_detalle', kwargs={'folio': orden.folio})),
+            'qr_svg': qr.url(orden.folio, 'svg'),
+            'qr_png': qr.url(orden.folio, 'png'),
         },
     )
 
 
-def _cliente_url(request: HttpRequest, orden: OrdenServicio) -> str:
-    path = reverse('seguimiento_detalle', kwargs={'folio': orden.folio})
-    return request.build_absolute_uri(path)
+def metricas_view(request: HttpRequest) -> HttpResponse:
+    token = getattr(settings, 'METRICAS_TOKEN', '')
+    autorizacion = request.headers.get('Authorization', '')
+    if not (token and constant_time_compare(autorizacion, f'Bearer {token}')) and not _superuser_required(request.user):
+        return HttpResponse(status=403)
+    return HttpResponse(metricas.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@user_passes_test(_superuser_required)
+def autocompletar_clientes(request: HttpRequest) -> JsonResponse:
+    """Clientes cuyo nombre, teléfono o placa empieza con ``q``, con sus vehículos."""
+    q = (request.GET.get('q') or '').strip()
+    if len(q) < 2:
+        return JsonResponse({'resultados': []})
+    filtro = Q(clave_nombre__startswith=clave_nombre(q))
+    digitos = ''.join(c for c in q if c.isdigit())
+    if len(digitos) >= 4:
+        filtro |= Q(telefono__startswith=digitos)
+    placa = normalizar_matricula(q)
+    if placa:
+        filtro |= Q(vehiculos__matricula_normalizada__startswith=placa)
+    clientes = (
+        Cliente.objects.filter(filtro).distinct()
+        .prefetch_related(Prefetch('vehiculos', queryset=Vehiculo.objects.annotate(servicios=Count('ordenes'))))[:10]
+    )
+    return JsonResponse({'resultados': [
+        {
+            'id': c.pk,
+            'nombre': c.nombre,
+            'telefono': c.telefono,
+            'email': c.email,
+            'vehiculos': [
+                {
+                    'matricula': v.matricula,
+                    'marca': v.marca,
+                    'modelo': v.modelo,
+                    'anio': v.anio,
+                    'color': v.color,
+                    'servicios': v.servicios,
+                }
+                for v in c.vehiculos.all()
+            ],
+        }
+        for c in clientes
+    ]})
+
+
+@user_passes_test(_superuser_required)
+def autocompletar_vehiculos(request: HttpRequest) -> JsonResponse:
+    """Marcas que empiezan con ``q``; con ``marca``, modelos de esa marca. Se responde desde memoria."""
+    q = request.GET.get('q') or ''
+    marca = request.GET.get('marca')
+    if marca:
+        resultados = catalogo.catalogo().sugerir_modelos(marca, q)
+    else:
+        resultados = catalogo.catalogo().sugerir_marcas(q)
+    return JsonResponse({'resultados': resultados})
 
 
 @user_passes_test(_superuser_required)
@@ -214,7 +301,7 @@ def cita_nueva(request: HttpRequest) -> HttpResponse:
 
 @user_passes_test(_superuser_required)
 def cita_editar(request: HttpRequest, pk: int) -> HttpResponse:
-    cita = get_object_or_404(Cita, pk=pk)
+    cita = get_object_or_404(Cita, pk=pk, sucursal=request.sucursal)
     if request.method == 'POST':
         form = CitaForm(request.POST, instance=cita)
         if form.is_valid():
@@ -228,7 +315,7 @@ def cita_editar(request: HttpRequest, pk: int) -> HttpResponse:
 
 @user_passes_test(_superuser_required)
 def cita_eliminar(request: HttpRequest, pk: int) -> HttpResponse:
-    cita = get_object_or_404(Cita, pk=pk)
+    cita = get_object_or_404(Cita, pk=pk, sucursal=request.sucursal)
     if request.method == 'POST':
         cita.delete()
         messages.success(request, 'Cita eliminada.')
@@ -20,7 +20,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
 import os
+import tempfile
+
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = 'RENDER' not in os.environ
@@ -45,11 +48,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'taller.middleware.LimiteSeguimientoMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'taller.middleware.RenovarSesionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'taller.middleware.SucursalMiddleware',
+    'taller.middleware.PerfiladorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -85,6 +92,183 @@ DATABASES = {
     )
 }
 
+# Sucursales (taller/sucursales.py). Una sucursal puede tener sus datos en otra
+# base: SUCURSALES_DATABASES="norte=postgres://...;sur=postgres://..." agrega
+# esos alias y ``Sucursal.base_datos`` apunta a uno de ellos.
+for _par in filter(None, os.environ.get('SUCURSALES_DATABASES', '').split(';')):
+    _alias, _url = _par.split('=', 1)
+    DATABASES[_alias.strip()] = dj_database_url.parse(_url.strip(), conn_max_age=600)
+DATABASE_ROUTERS = ['taller.routers.SucursalRouter']
+SUCURSAL_PRINCIPAL = 'matriz'
+SUCURSALES_TTL = 60
+
+
+# Caches
+# ``default`` es memoria local de cada worker; ``compartida`` es un directorio
+# común para los workers del mismo host (ver taller/folios.py). ``limites``
+# guarda solo las cubetas del límite de solicitudes, para que un barrido de
+# folios no las desaloje de ``default`` (300 entradas) y reinicie los límites.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'compartida': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_COMPARTIDA_DIR', os.path.join(tempfile.gettempdir(), 'wraplab-cache')),
+    },
+    'limites': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'limites',
+        # Dos cubetas (IP y prefijo) de unos 100 bytes por cliente: ~5 MB por worker.
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+
+FOLIO_CACHE_LOCAL = 'default'
+FOLIO_CACHE_COMPARTIDA = 'compartida'
+FOLIO_CACHE_TTL = 300
+FOLIO_CACHE_TTL_NEGATIVO = 30
+FOLIO_BLOOM_TTL = 600
+
+# Respuestas serializadas de /api/v1/seguimiento/ (taller/api.py)
+API_CACHE = 'compartida'
+API_CACHE_TTL = 300
+API_MAX_AGE = 10
+
+# Calentamiento al arrancar (taller/arranque.py): seguimiento precargado de las
+# órdenes activas más recientes de cada base. /readyz: taller/salud.py.
+ARRANQUE_ORDENES_ACTIVAS = 200
+
+# Sesiones y usuario del dashboard sin consultas por solicitud: la sesión se lee
+# de la caché (con escritura también en la base de datos) y el usuario de
+# ``USUARIOS_CACHE`` (taller/autenticacion.py). La sesión solo se escribe si
+# cambia; ``SESION_RENOVAR_CADA`` extiende su expiración mientras se use.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'compartida'
+SESSION_SAVE_EVERY_REQUEST = False
+SESION_RENOVAR_CADA = 3600
+AUTHENTICATION_BACKENDS = ['taller.autenticacion.ModelBackendCacheado']
+USUARIOS_CACHE = 'compartida'
+USUARIOS_CACHE_TTL = 300
+
+# Catálogo de marcas/modelos en memoria (taller/catalogo.py)
+CATALOGO_CACHE = 'compartida'
+CATALOGO_REVISION = 5
+CATALOGO_TTL = 3600
+
+# Subida de fotos (taller/subidas.py). Con FOTOS_S3_URL el navegador sube
+# directo al bucket (``DestinoS3``, URLs prefirmadas) y los bytes no pasan por
+# gunicorn. Sin él, ``DestinoLocal`` recibe las partes, guarda en disco y sirve
+# desde FOTOS_URL; en Render los directorios de medios están en el disco
+# persistente (ver render.yaml).
+FOTOS_S3_URL = os.environ.get('FOTOS_S3_URL', '')  # p. ej. https://mi-bucket.s3.us-east-1.amazonaws.com
+FOTOS_S3_URL_PUBLICA = os.environ.get('FOTOS_S3_URL_PUBLICA', '')  # CDN; por defecto FOTOS_S3_URL
+FOTOS_S3_REGION = os.environ.get('FOTOS_S3_REGION', 'us-east-1')
+FOTOS_S3_ACCESS_KEY = os.environ.get('FOTOS_S3_ACCESS_KEY', '')
+FOTOS_S3_SECRET_KEY = os.environ.get('FOTOS_S3_SECRET_KEY', '')
+FOTOS_DESTINO = os.environ.get(
+    'FOTOS_DESTINO',
+    'taller.almacenamiento.DestinoS3' if FOTOS_S3_URL else 'taller.almacenamiento.DestinoLocal',
+)
+FOTOS_DIR = os.environ.get('FOTOS_DIR', BASE_DIR / 'media' / 'fotos')
+FOTOS_URL = '/media/fotos/'
+FOTOS_MAX_AGE = 365 * 24 * 3600
+FOTOS_SUBIDAS_DIR = os.environ.get('FOTOS_SUBIDAS_DIR', BASE_DIR / 'media' / 'subidas')
+FOTOS_TICKET_TTL = 3600
+FOTOS_TAMANO_PARTE = 4 * 1024 * 1024
+FOTOS_TAMANO_MAXIMO = 25 * 1024 * 1024
+
+# Orden de trabajo y recibo imprimibles (taller/documentos.py). Los genera
+# ``manage.py generar_documentos --seguir``; el PDF requiere WeasyPrint.
+DOCUMENTOS_DIR = os.environ.get('DOCUMENTOS_DIR', BASE_DIR / 'media' / 'documentos')
+DOCUMENTOS_RESERVA = 300
+DOCUMENTOS_MAX_INTENTOS = 3
+
+# Códigos QR del enlace de seguimiento (taller/qr.py): se generan una vez por
+# folio. La URL con huella se sirve con caché pública de un año; la URL sin
+# huella, solo QR_MAX_AGE_ESTABLE segundos.
+QR_DIR = os.environ.get('QR_DIR', BASE_DIR / 'media' / 'qr')
+QR_MAX_AGE = 365 * 24 * 3600
+QR_MAX_AGE_ESTABLE = 300
+
+# Notificaciones al cliente (taller/notificaciones.py): canal -> backend.
+# SMS/WhatsApp necesitan un backend del proveedor; en desarrollo se escriben en consola.
+NOTIFICACIONES_BACKENDS = {'email': 'taller.notificaciones.BackendCorreo'}
+if DEBUG:
+    NOTIFICACIONES_BACKENDS['sms'] = 'taller.notificaciones.BackendArchivo'
+    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+NOTIFICACIONES_VENTANA = 120
+NOTIFICACIONES_MAX_INTENTOS = 6
+NOTIFICACIONES_REINTENTO_BASE = 30
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'The Wrap Lab <no-reply@wraplab.mx>')
+# URL pública del sitio para los enlaces que no salen de una solicitud (QR,
+# documentos, notificaciones). En Render el servicio web la toma de
+# RENDER_EXTERNAL_URL; fuera de desarrollo es obligatoria.
+SITIO_URL = (
+    os.environ.get('SITIO_URL')
+    or os.environ.get('RENDER_EXTERNAL_URL')
+    or ('http://localhost:8000' if DEBUG else '')
+)
+if not SITIO_URL:
+    raise ImproperlyConfigured('Define SITIO_URL: los enlaces de seguimiento apuntarían a localhost.')
+
+# Outbox de cambios (taller/outbox.py) y sincronización de tabletas (taller/sync.py)
+# Segundos que se espera a que se confirme un id faltante del outbox.
+OUTBOX_ESPERA_HUECOS = 600
+SYNC_LOTE_MAXIMO = 100
+
+
+# Retención de datos (taller/retencion.py): días que se conserva cada cosa una
+# vez que dejó de usarse; ``None`` desactiva la política. Se aplica con
+# ``manage.py podar`` una vez al día.
+RETENCION = {
+    'sesiones': 0,  # ya expiradas
+    'subidas': 7,  # desde que expiró el ticket
+    'fotos_reemplazadas': 7,
+    'archivos_huerfanos': 7,
+    'avances': 730,  # de órdenes terminadas; se conserva el último
+    'notificaciones': 180,  # enviadas o fallidas
+    'documentos': 30,  # versiones anteriores y fallidos
+    'outbox': 30,  # ya leídos por todos los consumidores
+}
+RETENCION_LOTE = 500
+RETENCION_PAUSA = 0.1
+
+
+# Límite de solicitudes a /seguimiento/ (taller/middleware.py)
+# Cubetas de tokens: (capacidad, tokens recargados por segundo).
+
+LIMITE_CACHE = 'limites'
+LIMITE_POR_IP = (30, 0.5)
+LIMITE_POR_PREFIJO = (120, 2)
+LIMITE_PREFIJO_FOLIO = 2
+LIMITE_RUTAS = [
+    r'^/seguimiento/(?:(?P<folio>[^/]+)/)?$',
+    r'^/seguimiento/(?P<folio>[^/]+)/qr(?:-[\w-]+)?\.(?:svg|png)$',
+    r'^/api/v1/seguimiento/(?P<folio>[^/]+)/$',
+]
+# Render antepone un proxy que agrega la IP del cliente a X-Forwarded-For.
+LIMITE_PROXIES_CONFIABLES = 1 if 'RENDER' in os.environ else 0
+
+# Presupuesto de consultas y tiempo por vista (taller/presupuestos.py). En
+# producción ``PRESUPUESTOS_MODO=registro`` registra los excesos; las pruebas
+# corren con ``error`` y fallan si una vista se pasa de consultas.
+PRESUPUESTOS_MODO = os.environ.get('PRESUPUESTOS_MODO') or None
+TEST_RUNNER = 'taller.pruebas.EjecutorPresupuestos'
+
+# Perfilador por muestreo (taller/perfilador.py). Apagado salvo PERFILADOR=1;
+# encendido perfila 1 de cada PERFILADOR_MUESTREO solicitudes, o las de staff
+# que envíen el encabezado ``X-Perfilar``.
+PERFILADOR_ACTIVO = os.environ.get('PERFILADOR') == '1'
+PERFILADOR_MUESTREO = int(os.environ.get('PERFILADOR_MUESTREO', 100))
+PERFILADOR_INTERVALO = 0.005
+PERFILADOR_DIR = os.environ.get('PERFILADOR_DIR', os.path.join(tempfile.gettempdir(), 'wraplab-perfiles'))
+PERFILADOR_MAXIMO = 200
+
+# Token para que el monitoreo lea /dashboard/metricas/ sin sesión.
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
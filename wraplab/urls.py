@@ -20,9 +20,13 @@ from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
 
+from taller import subidas
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('robots.txt', TemplateView.as_view(template_name="robots.txt", content_type="text/plain")),
+    # Fotos de DestinoLocal; con un destino en la nube las URLs son del proveedor.
+    path(f'{settings.FOTOS_URL.strip("/")}/<path:ruta>', subidas.ver_foto, name='foto_archivo'),
     path('', include('taller.urls')),
 ]
 